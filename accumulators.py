@@ -0,0 +1,223 @@
+import numpy as np
+import pandas as pd
+
+from local_backend import LocalComm
+from quantile_sketch import DEFAULT_ERROR, build_sketch, empty_sketch, merge_sketches
+
+# Estados que puede declarar una regla. Cada uno ocupa un tramo del buffer
+# único y se combina con su propia operación dentro del mismo Allreduce.
+KINDS = ("nulls", "count", "sum", "sumsq", "min", "max", "hist", "sketch")
+
+
+# ========================
+# Allreduce con una operación de mezcla propia
+# ========================
+
+class _Done:
+    """Request ya completado (backend local, sin colectivas no bloqueantes)."""
+
+    def __init__(self, result):
+        self._result = result
+
+    def wait(self):
+        return self._result
+
+
+class _Pending:
+    def __init__(self, request, result, op, dtype):
+        self._request = request
+        self._result = result
+        self._op = op
+        self._dtype = dtype
+
+    def wait(self):
+        if self._request is not None:
+            self._request.Wait()
+            self._op.Free()
+            self._dtype.Free()
+            self._request = None
+        return self._result
+
+
+def _merge_collective(comm, buffer, merge, blocking):
+    if isinstance(comm, LocalComm):
+        return _Done(comm.allreduce(buffer, op=lambda a, b: merge(a, b.copy(), None)))
+
+    from mpi4py import MPI
+
+    def _op(inbuf, inoutbuf, datatype):
+        b = np.frombuffer(inoutbuf, dtype=np.float64)
+        merge(np.frombuffer(inbuf, dtype=np.float64), b, b)
+
+    dtype = MPI.DOUBLE.Create_contiguous(len(buffer)).Commit()
+    op = MPI.Op.Create(_op, commute=True)
+    result = np.empty_like(buffer)
+    if blocking:
+        try:
+            comm.Allreduce([buffer, 1, dtype], [result, 1, dtype], op=op)
+        finally:
+            op.Free()
+            dtype.Free()
+        return _Done(result)
+    request = comm.Iallreduce([buffer, 1, dtype], [result, 1, dtype], op=op)
+    return _Pending(request, result, op, dtype)
+
+
+def iallreduce_merge(comm, buffer, merge):
+    """
+    Iallreduce de un buffer float64 con `merge(a, b, out=b)` como operación MPI.
+
+    El buffer viaja como un único elemento de un tipo contiguo derivado para
+    que MPI no lo segmente al mezclar. Devuelve un objeto con wait() -> resultado.
+    Con LocalComm la reducción es inmediata.
+    """
+    return _merge_collective(comm, buffer, merge, blocking=False)
+
+
+def allreduce_merge(comm, buffer, merge):
+    """Versión bloqueante (Allreduce) de iallreduce_merge."""
+    return _merge_collective(comm, buffer, merge, blocking=True).wait()
+
+
+# ========================
+# Estado fusionado por columna
+# ========================
+
+class FusedStats:
+    """
+    Estado mergeable de todas las columnas en un solo arreglo float64.
+
+    `needs` es {columna: {estado: opciones}} (ver KINDS); from_config lo
+    genera a partir de cleaning_config. update() acumula lote a lote y
+    iallreduce() combina todo con una única colectiva: sumas/conteos se
+    suman, min/max se comparan y los sketches se mezclan.
+    """
+
+    def __init__(self, needs):
+        self.needs = needs
+        self.layout = {}
+        parts, size = [], 0
+        for column, kinds in needs.items():
+            for kind, options in kinds.items():
+                initial = _initial(kind, options)
+                self.layout[(column, kind)] = (size, size + len(initial))
+                parts.append(initial)
+                size += len(initial)
+        self.buffer = np.concatenate(parts) if parts else np.zeros(0)
+
+    @classmethod
+    def from_config(cls, config, exact_quantiles=True):
+        """
+        Estado que necesita cada regla: faltantes para toda columna; conteo y
+        suma para la media; sketch para medianas/fences aproximados (o
+        siempre, con exact_quantiles=False como en modo streaming). Las
+        medianas exactas usan además la selección distribuida (order_stats).
+        """
+        needs = {}
+        for column, rules in config.items():
+            kinds = needs.setdefault(column, {})
+            kinds["nulls"] = None
+            ctype = rules.get("type")
+            sketch = {"error": rules.get("error", DEFAULT_ERROR)}
+            if ctype == "missing_impute":
+                kinds["count"] = None
+                strategy = rules.get("strategy", "median")
+                if strategy == "mean":
+                    kinds["sum"] = None
+                elif strategy == "median" and not exact_quantiles:
+                    kinds["sketch"] = sketch
+            elif ctype == "outlier_capping" and rules.get("method", "iqr_fence") == "iqr_fence":
+                kinds["count"] = None
+                if rules.get("approx", False) or not exact_quantiles:
+                    kinds["sketch"] = sketch
+        return cls(needs)
+
+    def _segment(self, column, kind):
+        lo, hi = self.layout[(column, kind)]
+        return self.buffer[lo:hi]
+
+    def update(self, df):
+        """Acumula un chunk/lote; las columnas ausentes no cambian el estado."""
+        for column, kinds in self.needs.items():
+            if column not in df.columns:
+                continue
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+            valid = values[~np.isnan(values)]
+            for kind, options in kinds.items():
+                segment = self._segment(column, kind)
+                if kind == "nulls":
+                    segment[0] += int(df[column].isna().sum())
+                elif kind == "count":
+                    segment[0] += len(valid)
+                elif kind == "sum":
+                    segment[0] += valid.sum()
+                elif kind == "sumsq":
+                    segment[0] += np.square(valid).sum()
+                elif kind == "min" and len(valid):
+                    segment[0] = min(segment[0], valid.min())
+                elif kind == "max" and len(valid):
+                    segment[0] = max(segment[0], valid.max())
+                elif kind == "hist":
+                    segment += np.histogram(valid, bins=options["bins"], range=options["range"])[0]
+                elif kind == "sketch":
+                    segment[:] = merge_sketches(segment, build_sketch(valid, options["error"]))
+        return self
+
+    def merge(self, a, b, out=None):
+        """Combina dos buffers con este layout; out=None escribe sobre b."""
+        out = b if out is None else out
+        for (column, kind), (lo, hi) in self.layout.items():
+            if kind == "min":
+                np.minimum(a[lo:hi], b[lo:hi], out=out[lo:hi])
+            elif kind == "max":
+                np.maximum(a[lo:hi], b[lo:hi], out=out[lo:hi])
+            elif kind == "sketch":
+                merge_sketches(a[lo:hi], b[lo:hi], out=out[lo:hi])
+            else:
+                np.add(a[lo:hi], b[lo:hi], out=out[lo:hi])
+        return out
+
+    def iallreduce(self, comm):
+        """
+        Inicia la combinación global (una sola colectiva) y devuelve un objeto
+        con wait() -> FusedStats global. Permite solapar la reducción con
+        otro trabajo (p. ej. el shuffle de deduplicación).
+        """
+        pending = iallreduce_merge(comm, self.buffer, self.merge)
+        return _Merged(self.needs, pending)
+
+    def allreduce(self, comm):
+        merged = FusedStats(self.needs)
+        merged.buffer = allreduce_merge(comm, self.buffer, self.merge)
+        return merged
+
+    def value(self, column, kind, default=None):
+        if (column, kind) not in self.layout:
+            return default
+        segment = self._segment(column, kind)
+        return segment if kind in ("hist", "sketch") else segment[0].item()
+
+
+class _Merged:
+    def __init__(self, needs, pending):
+        self._needs = needs
+        self._pending = pending
+
+    def wait(self):
+        merged = FusedStats(self._needs)
+        merged.buffer = self._pending.wait()
+        return merged
+
+
+def _initial(kind, options):
+    if kind == "min":
+        return np.array([np.inf])
+    if kind == "max":
+        return np.array([-np.inf])
+    if kind == "hist":
+        return np.zeros(options["bins"])
+    if kind == "sketch":
+        return empty_sketch(options["error"])
+    if kind in KINDS:
+        return np.zeros(1)
+    raise ValueError(f"unknown accumulator state: {kind}")
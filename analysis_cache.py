@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+CACHE_VERSION = 1
+
+# Tamaño máximo del directorio de caché; al superarlo se eliminan las
+# entradas usadas hace más tiempo
+DEFAULT_CACHE_BYTES = 256 << 20
+
+# Bloques de hash fijos: la huella del archivo no depende del número de ranks
+_BLOCK_BYTES = 16 << 20
+
+# Reglas cuyo resultado depende de estadísticas globales; el resto (texto,
+# diccionarios) se puede cambiar sin invalidar el análisis
+_STATS_RULES = ("missing_impute", "outlier_capping")
+
+
+class AnalysisCache(NamedTuple):
+    directory: str
+    key: str
+    max_bytes: int
+
+
+def _hash_blocks(input_file, blocks):
+    digests = []
+    with open(input_file, "rb") as f:
+        for block in blocks:
+            f.seek(block * _BLOCK_BYTES)
+            digests.append((block, hashlib.blake2b(f.read(_BLOCK_BYTES), digest_size=16).digest()))
+    return digests
+
+
+def input_fingerprint(comm, input_file):
+    """
+    Huella del contenido del archivo: blake2b de bloques fijos repartidos
+    entre ranks (round-robin) y combinados en orden. Con comm=None se hashea
+    todo en este proceso; el resultado es el mismo.
+    """
+    n_blocks = max(1, -(-os.path.getsize(input_file) // _BLOCK_BYTES))
+    if comm is None:
+        parts = [_hash_blocks(input_file, range(n_blocks))]
+    else:
+        parts = comm.allgather(_hash_blocks(input_file, range(comm.Get_rank(), n_blocks, comm.Get_size())))
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(os.path.getsize(input_file)).encode())
+    for _, digest in sorted(d for part in parts for d in part):
+        h.update(digest)
+    return h.hexdigest()
+
+
+def open_cache(comm, directory, input_file, cleaning_config, schema, max_bytes=DEFAULT_CACHE_BYTES):
+    """
+    Clave de caché = huella del archivo + hash de lo que cambia el análisis:
+    reglas con estadísticas (imputación, outliers) y el schema (tipos y
+    normalización de ids, que cambian las huellas de deduplicación).
+    """
+    relevant = {column: rules for column, rules in cleaning_config.items() if rules.get("type") in _STATS_RULES}
+    blob = json.dumps([CACHE_VERSION, relevant, schema], sort_keys=True, default=str)
+    config_digest = hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+    return AnalysisCache(directory, f"{input_fingerprint(comm, input_file)}-{config_digest}", max_bytes)
+
+
+def _entry_path(cache):
+    return os.path.join(cache.directory, f"{cache.key}.npz")
+
+
+class CachedAnalysis(NamedTuple):
+    stats: dict
+    missing: int
+    duplicates: int
+    bitmap: np.ndarray
+
+    def duplicate_mask(self, row_numbers):
+        """Máscara de duplicados (bool) de las filas globales `row_numbers`."""
+        rows = np.asarray(row_numbers, dtype=np.int64)
+        return ((self.bitmap[rows >> 3] >> (7 - (rows & 7)).astype(np.uint8)) & 1).astype(bool)
+
+
+def load_analysis(comm, cache):
+    """Entrada de la caché (CachedAnalysis) o None si no está. Rank 0 la lee y la difunde."""
+    entry = None
+    if comm.Get_rank() == 0:
+        path = _entry_path(cache)
+        if os.path.exists(path):
+            with np.load(path) as data:
+                meta = json.loads(str(data["meta"]))
+                entry = CachedAnalysis(meta["stats"], meta["missing"], meta["duplicates"], data["duplicates"])
+            # Marca de uso para el desalojo LRU
+            os.utime(path)
+    return comm.bcast(entry, root=0)
+
+
+def store_analysis(comm, cache, stats, missing, duplicate_mask, row_numbers):
+    """
+    Guarda stats, faltantes y el bitmap de duplicados por fila global. Cada
+    rank aporta solo las filas duplicadas; rank 0 arma el bitmap, escribe la
+    entrada de forma atómica y desaloja lo más viejo si se pasa del tamaño.
+    """
+    dup_rows = np.asarray(row_numbers, dtype=np.int64)[duplicate_mask]
+    total_rows = comm.allreduce(len(duplicate_mask))
+    parts = comm.gather(dup_rows, root=0)
+    if comm.Get_rank() != 0:
+        return
+
+    mask = np.zeros(total_rows, dtype=bool)
+    mask[np.concatenate(parts)] = True
+    bitmap = np.packbits(mask)
+    stats = {k: [float(x) for x in v] if isinstance(v, (tuple, list)) else float(v) for k, v in stats.items()}
+    meta = json.dumps({"stats": stats, "missing": int(missing), "duplicates": int(mask.sum()), "rows": total_rows})
+
+    os.makedirs(cache.directory, exist_ok=True)
+    path = _entry_path(cache)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, duplicates=bitmap, meta=np.array(meta))
+    if os.path.getsize(tmp) > cache.max_bytes:
+        os.remove(tmp)
+        return
+    os.replace(tmp, path)
+    evict(cache.directory, cache.max_bytes)
+
+
+def evict(directory, max_bytes):
+    """Elimina las entradas con uso más antiguo hasta que el directorio quepa en `max_bytes`."""
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(".npz") and not name.endswith(".tmp.npz"):
+            st = os.stat(os.path.join(directory, name))
+            entries.append((st.st_mtime, st.st_size, name))
+    total = sum(size for _, size, _ in entries)
+    for _, size, name in sorted(entries):
+        if total <= max_bytes:
+            break
+        os.remove(os.path.join(directory, name))
+        total -= size
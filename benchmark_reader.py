@@ -0,0 +1,106 @@
+import argparse
+import csv
+import json
+import os
+import time
+
+import pandas as pd
+
+from mmap_reader import read_fixed_range
+from partitioned_reader import partition_range
+from schema import apply_schema, read_csv_dtypes
+
+
+def read_dictreader(input_file):
+    """Lector de clean_sequential.py: una lista de dicts de texto."""
+    with open(input_file, "r", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def read_pandas(input_file, schema=None):
+    """pd.read_csv genérico; con schema, los mismos tipos que usan los loaders MPI."""
+    if schema is None:
+        return pd.read_csv(input_file)
+    return apply_schema(pd.read_csv(input_file, dtype=read_csv_dtypes(schema)), schema)
+
+
+def read_mmap(input_file, schema=None, ranges=1):
+    """Tokenizer mmap sobre `ranges` rangos de bytes (como los ranks de read_partition)."""
+    parts = []
+    for i in range(ranges):
+        header, start, end = partition_range(input_file, i, ranges)
+        parts.append(read_fixed_range(input_file, start, end, header, schema=schema))
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts, ignore_index=True)
+
+
+def best_of(func, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def check_equal(expected, actual):
+    """El tokenizer debe reproducir a pandas (floats comparados contra float_precision='round_trip')."""
+    try:
+        pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected.reset_index(drop=True),
+                                      check_categorical=False)
+        return "ok"
+    except AssertionError as e:
+        return f"MISMATCH: {str(e).splitlines()[0]}"
+
+
+def benchmark(input_file, schema, repeat=3, ranges=4):
+    size_mb = os.path.getsize(input_file) / 1e6
+    cases = [
+        ("csv.DictReader", lambda: read_dictreader(input_file)),
+        ("pd.read_csv", lambda: read_pandas(input_file)),
+        ("pd.read_csv + schema", lambda: read_pandas(input_file, schema)),
+        ("mmap", lambda: read_mmap(input_file)),
+        ("mmap + schema", lambda: read_mmap(input_file, schema)),
+        (f"mmap + schema ({ranges} ranges)", lambda: read_mmap(input_file, schema, ranges)),
+    ]
+
+    print("=" * 60)
+    print(f"READER BENCHMARK: {input_file} ({size_mb:,.1f} MB, best of {repeat})")
+    print("=" * 60)
+    results = []
+    for name, func in cases:
+        seconds, data = best_of(func, repeat)
+        rows = len(data)
+        results.append({"file": input_file, "reader": name, "seconds": seconds, "rows": rows,
+                        "rows_per_s": rows / seconds, "mb_per_s": size_mb / seconds})
+        print(f"  {name:<28} {seconds:8.3f}s {rows / seconds:>14,.0f} rows/s {size_mb / seconds:>8.1f} MB/s")
+        del data
+
+    expected = pd.read_csv(input_file, float_precision="round_trip")
+    print(f"\n  mmap vs pandas:          {check_equal(expected, read_mmap(input_file))}")
+    expected = apply_schema(pd.read_csv(input_file, dtype=read_csv_dtypes(schema), float_precision="round_trip"),
+                            schema)
+    print(f"  mmap vs pandas (schema): {check_equal(expected, read_mmap(input_file, schema, ranges))}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark: mmap fixed-schema reader vs pd.read_csv vs csv.DictReader")
+    parser.add_argument("input_files", nargs="+")
+    parser.add_argument("--metadata", default="metadata.json", help="metadata.json with the \"schema\" section")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--ranges", type=int, default=4, help="byte ranges for the partitioned mmap read")
+    parser.add_argument("--json", default=None, help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.metadata, "r", encoding="utf-8") as f:
+        schema = json.load(f).get("schema", {})
+
+    results = []
+    for input_file in args.input_files:
+        results.extend(benchmark(input_file, schema, args.repeat, args.ranges))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
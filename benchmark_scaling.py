@@ -0,0 +1,274 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+import re
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+ENGINES = ("sequential", "mpi", "mpi2")
+MODES = ("strong", "weak")
+GENERATORS = ("parallel", "pandas")
+
+# Contadores que imprimen los tres limpiadores; deben coincidir entre
+# motores para un mismo archivo (las reglas de limpieza difieren, así que las
+# filas finales no se comparan entre motores)
+_COUNTERS = {
+    "input_rows": re.compile(r"Original rows:\s+([\d,]+)"),
+    "missing": re.compile(r"Missing values:\s+([\d,]+)"),
+    "duplicates": re.compile(r"Duplicates:\s+([\d,]+)"),
+    "final_rows": re.compile(r"Final rows:\s+([\d,]+)"),
+}
+_REPORTED = re.compile(r"COMPLETED IN ([\d.]+) SECONDS")
+_LOADED = re.compile(r"Loaded in ([\d.]+)s")
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# ========================
+# Datasets
+# ========================
+
+def dataset_path(data_dir, rows):
+    return os.path.join(data_dir, f"dirty_{rows}.csv")
+
+
+def ensure_dataset(data_dir, rows, generator="parallel", workers=None):
+    """Genera (una sola vez) el dataset de `rows` filas base con uno de los generadores del repo."""
+    path = dataset_path(data_dir, rows)
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    if generator == "parallel":
+        command = [sys.executable, os.path.join(_HERE, "generate_dirty_parallel.py"), str(rows), path]
+        if workers:
+            command += ["--workers", str(workers)]
+    else:
+        command = [sys.executable, "-c",
+                   f"from generate_dirty_data2 import generate_dirty_dataset; "
+                   f"generate_dirty_dataset({rows}, {path!r})"]
+    subprocess.run(command, check=True, cwd=_HERE, stdout=subprocess.DEVNULL)
+    return path
+
+
+# ========================
+# Corridas
+# ========================
+
+def engine_command(engine, ranks, input_file, output_file, metadata_file, mpirun, extra_args=()):
+    python = [sys.executable]
+    if engine == "sequential":
+        return python + [os.path.join(_HERE, "clean_sequential.py"), input_file, "--output", output_file]
+    launcher = shlex.split(mpirun) + ["-np", str(ranks)]
+    if engine == "mpi":
+        script = [os.path.join(_HERE, "clean_mpi.py"), input_file, "--output", output_file, "--metadata", metadata_file]
+    else:
+        script = [os.path.join(_HERE, "clean_mpi2.py"), input_file, metadata_file, "--output", output_file]
+    return launcher + python + script + list(extra_args)
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def run_once(command):
+    """(segundos de pared, stdout); falla con el final de stderr si el proceso falla."""
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, cwd=_HERE)
+    seconds = time.perf_counter() - start
+    if result.returncode != 0:
+        tail = (result.stderr or result.stdout).strip().splitlines()[-3:]
+        raise RuntimeError(f"{shlex.join(command)} exited with {result.returncode}: {' | '.join(tail)}")
+    return seconds, result.stdout
+
+
+def parse_output(stdout):
+    out = {}
+    for name, pattern in _COUNTERS.items():
+        found = pattern.findall(stdout)
+        if found:
+            out[name] = int(found[-1].replace(",", ""))
+    reported = _REPORTED.findall(stdout)
+    loaded = _LOADED.findall(stdout)
+    out["reported_seconds"] = float(reported[-1]) if reported else None
+    out["load_seconds"] = float(loaded[0]) if loaded else None
+    return out
+
+
+def measure(engine, ranks, input_file, output_file, metadata_file, mpirun, warmup, repeat, extra_args=()):
+    """Corre `warmup` veces sin medir y `repeat` veces midiendo; devuelve el registro de la corrida."""
+    command = engine_command(engine, ranks, input_file, output_file, metadata_file, mpirun, extra_args)
+    for _ in range(warmup):
+        run_once(command)
+    times, parsed = [], {}
+    for _ in range(repeat):
+        seconds, stdout = run_once(command)
+        times.append(seconds)
+        parsed = parse_output(stdout)
+    record = {
+        "engine": engine,
+        "ranks": ranks,
+        "input": os.path.basename(input_file),
+        "seconds": statistics.median(times),
+        "min_seconds": min(times),
+        "times": times,
+        "output_digest": file_digest(output_file),
+    }
+    record.update(parsed)
+    os.remove(output_file)
+    return record
+
+
+# ========================
+# Suite
+# ========================
+
+def _cases(modes, engines, sizes, weak_rows, ranks_grid):
+    """(modo, filas base, motor, ranks); el secuencial corre una vez por tamaño (1 proceso)."""
+    for mode in modes:
+        if mode == "strong":
+            grid = [(rows, ranks) for rows in sizes for ranks in ranks_grid]
+        else:
+            grid = [(weak_rows * ranks, ranks) for ranks in ranks_grid]
+        seen = set()
+        for rows, ranks in grid:
+            for engine in engines:
+                if engine == "sequential":
+                    if rows in seen:
+                        continue
+                    seen.add(rows)
+                    yield mode, rows, engine, 1
+                else:
+                    yield mode, rows, engine, ranks
+
+
+def run_suite(engines, modes, sizes, weak_rows, ranks_grid, metadata_file, data_dir, mpirun="mpirun", warmup=1,
+              repeat=3, generator="parallel", mpi2_args=()):
+    results = []
+    for mode, rows, engine, ranks in _cases(modes, engines, sizes, weak_rows, ranks_grid):
+        input_file = ensure_dataset(data_dir, rows, generator)
+        output_file = os.path.join(data_dir, f"out_{engine}_{mode}_{rows}_{ranks}.csv")
+        label = f"{mode:<6} {engine:<10} rows={rows:>12,} ranks={ranks:>3}"
+        try:
+            record = measure(engine, ranks, input_file, output_file, metadata_file, mpirun, warmup, repeat,
+                             mpi2_args if engine == "mpi2" else ())
+        except (RuntimeError, OSError) as e:
+            record = {"engine": engine, "ranks": ranks, "input": os.path.basename(input_file), "error": str(e)}
+            print(f"  {label}  FAILED: {e}")
+        else:
+            print(f"  {label}  {record['seconds']:8.3f}s (min {record['min_seconds']:.3f}s)")
+        record.update({"mode": mode, "rows": rows})
+        results.append(record)
+    check_outputs(results)
+    add_scaling(results)
+    return results
+
+
+def check_outputs(results):
+    """
+    Con el mismo motor y archivo la salida debe ser idéntica byte a byte para
+    cualquier número de ranks. Entre motores se comparan los contadores
+    comunes (filas de entrada, faltantes, duplicados).
+    """
+    reference, counters = {}, {}
+    for r in results:
+        if "error" in r:
+            continue
+        key = (r["engine"], r["input"])
+        expected = reference.setdefault(key, (r["ranks"], r["output_digest"]))
+        r["output_check"] = "ok" if r["output_digest"] == expected[1] else f"DIFFERS from {expected[0]} ranks"
+
+        mine = {name: r.get(name) for name in ("input_rows", "missing", "duplicates")}
+        other = counters.setdefault(r["input"], (r["engine"], mine))
+        r["counter_check"] = "ok" if mine == other[1] else f"MISMATCH vs {other[0]}: {mine} != {other[1]}"
+
+
+def add_scaling(results):
+    """
+    Fuerte: speedup = T(motor, menos ranks) / T(N) y eficiencia = speedup * ranks_base / N;
+    también el speedup contra el secuencial del mismo archivo. Débil (filas
+    proporcionales a los ranks): eficiencia = T(ranks base) / T(N).
+    """
+    ok = [r for r in results if "error" not in r]
+    for r in ok:
+        if r["engine"] == "sequential":
+            continue
+        peers = [p for p in ok if p["mode"] == r["mode"] and p["engine"] == r["engine"]]
+        if r["mode"] == "strong":
+            peers = [p for p in peers if p["rows"] == r["rows"]]
+        base = min(peers, key=lambda p: p["ranks"])
+        if r["mode"] == "strong":
+            r["speedup"] = base["seconds"] / r["seconds"]
+            r["efficiency"] = r["speedup"] * base["ranks"] / r["ranks"]
+            seq = [p for p in ok if p["engine"] == "sequential" and p["rows"] == r["rows"]]
+            if seq:
+                r["speedup_vs_sequential"] = seq[0]["seconds"] / r["seconds"]
+        else:
+            r["efficiency"] = base["seconds"] / r["seconds"]
+
+
+def print_summary(results):
+    print("\n" + "=" * 60)
+    print("SCALING SUMMARY (median wall time)")
+    print("=" * 60)
+    print(f"  {'mode':<6} {'engine':<10} {'rows':>12} {'ranks':>5} {'seconds':>9} {'speedup':>8} "
+          f"{'vs seq':>7} {'eff':>6}  check")
+    for r in results:
+        if "error" in r:
+            print(f"  {r['mode']:<6} {r['engine']:<10} {r['rows']:>12,} {r['ranks']:>5}  FAILED")
+            continue
+        speedup = f"{r['speedup']:.2f}x" if "speedup" in r else "-"
+        vs_seq = f"{r['speedup_vs_sequential']:.2f}x" if "speedup_vs_sequential" in r else "-"
+        eff = f"{r['efficiency']:.0%}" if "efficiency" in r else "-"
+        check = r["output_check"] if r["counter_check"] == "ok" else r["counter_check"]
+        print(f"  {r['mode']:<6} {r['engine']:<10} {r['rows']:>12,} {r['ranks']:>5} {r['seconds']:>8.3f}s "
+              f"{speedup:>8} {vs_seq:>7} {eff:>6}  {check}")
+
+
+def write_results(results, json_file=None, csv_file=None):
+    if json_file:
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=4)
+    if csv_file:
+        fields = []
+        for r in results:
+            fields.extend(k for k in r if k not in fields and k != "times")
+        with open(csv_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(results)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Strong/weak scaling benchmark: clean_sequential vs clean_mpi vs clean_mpi2")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    parser.add_argument("--ranks", nargs="+", type=int, default=[1, 2, 4], help="rank counts for the MPI cleaners")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100_000, 1_000_000],
+                        help="strong scaling: base rows of each dataset")
+    parser.add_argument("--weak-rows", type=int, default=250_000, help="weak scaling: base rows per rank")
+    parser.add_argument("--metadata", default="metadata.json")
+    parser.add_argument("--data-dir", default="bench_data", help="generated datasets and temporary outputs")
+    parser.add_argument("--generator", choices=GENERATORS, default="parallel",
+                        help="parallel: generate_dirty_parallel.py; pandas: generate_dirty_data2.py")
+    parser.add_argument("--mpirun", default="mpirun", help="launcher command, e.g. \"mpirun --oversubscribe\"")
+    parser.add_argument("--mpi2-args", default="", help="extra clean_mpi2.py flags, e.g. \"--engine mmap\"")
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", default="scaling_results.json")
+    parser.add_argument("--csv", default="scaling_results.csv")
+    args = parser.parse_args()
+
+    results = run_suite(args.engines, args.modes, args.sizes, args.weak_rows, args.ranks,
+                        os.path.abspath(args.metadata), os.path.abspath(args.data_dir), args.mpirun, args.warmup,
+                        args.repeat, args.generator, shlex.split(args.mpi2_args))
+    print_summary(results)
+    write_results(results, args.json, args.csv)
@@ -1,14 +1,43 @@
 from mpi4py import MPI
-import pandas as pd
 import numpy as np
 import time
-import sys
+import argparse
+import json
+
+from partitioned_reader import read_partition, read_schema_range
+from fingerprint import chunk_fingerprints
+from distributed_dedup import global_duplicate_mask
+from order_stats import distributed_median, distributed_quantiles, iqr_fences
+from output_writer import write_output, write_csv_ordered
+from columnar_output import FORMATS, resolve_output
+from schema import read_csv_dtypes, impute_value, column_memory, report_memory
+from mmap_reader import read_fixed_range
+from accumulators import FusedStats
+from node_shared import read_node_shared, node_duplicate_mask
+from task_scheduler import SCHEDULES, DEFAULT_TASK_BYTES, read_dynamic
+from profiling import PROFILERS, start_profiler, write_profile
+from instrumentation import enable, span, count_rows, note, write_report
 
 comm = MPI.COMM_WORLD
 rank = comm.Get_rank()
 size = comm.Get_size()
 
-def clean (input_file):
+def load_metadata(metadata_file):
+    """Secciones "schema" (tipos compactos) y "output" de metadata.json; vacías si no se indica archivo."""
+    if metadata_file is None:
+        return {}, {}
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        metadata = json.load(f)
+    return metadata.get('schema', {}), metadata.get('output', {})
+
+def clean (input_file, output_file=None, output_mode='collective', output_format=None, metadata_file=None,
+           engine='pandas', node_shared=False, schedule='static', task_bytes=DEFAULT_TASK_BYTES):
+    schema, output_config = comm.bcast(load_metadata(metadata_file) if rank == 0 else None, root=0)
+    output_file, output_format = resolve_output(output_config, output_file, output_format)
+    note(output_file=output_file, format=output_format)
+    if schedule == 'dynamic' and (node_shared or output_format != 'csv' or output_mode != 'collective'):
+        raise ValueError('--schedule dynamic only supports a single csv output without --node-shared')
+
     if rank == 0:
         print("="*60)
         print(f"CLEANSTREAM (Parallel with {size} workers)")
@@ -16,140 +45,160 @@ def clean (input_file):
         start_time = time.time()
     
     if rank == 0:
-        print(" Loading and distributing data...")
+        print(" Loading partitions (byte ranges per rank)...")
         load_start = time.time()
-        df = pd.read_csv(input_file)
-        print(f"  Original rows: {len(df):,}")
-        
-        # Particionar
-        chunk_size = len(df) // size
-        chunks = []
-        for i in range(size):
-            start_idx = i * chunk_size
-            end_idx = start_idx + chunk_size if i < size - 1 else len(df)
-            chunks.append(df.iloc[start_idx:end_idx].copy())
-        
-        print(f"   Divided in {size} chunks of ~{chunk_size:,} rows")
-        print(f"   Distributed in {time.time()-load_start:.2f}s")
-    else:
-        chunks = None
     
-    # Scatter chunks
-    my_chunk = comm.scatter(chunks, root=0)
+    # Cada rank lee solo su rango de bytes (sin scatter desde rank 0); con
+    # node_shared, un lector por nodo y ventanas MPI compartidas
+    if engine == 'mmap':
+        reader, kwargs = read_fixed_range, {'schema': schema}
+    else:
+        reader, kwargs = read_schema_range, {'schema': schema, 'dtype': read_csv_dtypes(schema)}
+    node, layout = None, None
+    with span('load'):
+        if schedule == 'dynamic':
+            my_chunk, layout = read_dynamic(comm, input_file, reader=reader, task_bytes=task_bytes, **kwargs)
+        elif node_shared:
+            my_chunk, node = read_node_shared(comm, input_file, reader=reader, **kwargs)
+        else:
+            my_chunk = read_partition(comm, input_file, reader=reader, **kwargs)
+    count_rows(len(my_chunk))
+    total_rows = comm.reduce(len(my_chunk), op=MPI.SUM, root=0)
     
     if rank == 0:
-        print(f"\n Analyzing in parallel ({size} workers)...")
-    
-    # Contar missing values
-    local_missing = my_chunk['age'].isna().sum()
-    total_missing = comm.reduce(local_missing, op=MPI.SUM, root=0)
+        note(input_rows=total_rows)
+        print(f"  Original rows: {total_rows:,}")
+        if layout is None:
+            print(f"   Divided in {size} byte ranges of ~{total_rows // size:,} rows")
+        print(f"   Loaded in {time.time()-load_start:.2f}s")
     
-    # Detectar duplicados locales (hash-based)
-    local_hashes = {}
-    for idx, row in my_chunk.iterrows():
-        row_hash = hash(tuple(row))
-        if row_hash not in local_hashes:
-            local_hashes[row_hash] = []
-        local_hashes[row_hash].append(idx)
+    report_memory(comm, column_memory(my_chunk), len(my_chunk))
     
-    all_hashes = comm.gather(local_hashes, root=0)
-    
-    # Calcular mediana global
-    local_sum = my_chunk['age'].sum()
-    local_count = my_chunk['age'].count()
-    global_sum = comm.reduce(local_sum, op=MPI.SUM, root=0)
-    global_count = comm.reduce(local_count, op=MPI.SUM, root=0)
+    if rank == 0:
+        print(f"\n Analyzing in parallel ({size} workers)...")
     
-    # Calcular estadísticas para outliers
-    local_values = my_chunk['salary'].dropna().values
-    all_values = comm.gather(local_values, root=0)
+    # Faltantes y conteos en un solo buffer; el Iallreduce se solapa con la deduplicación
+    with span('stats'):
+        pending = FusedStats({'age': {'nulls': None, 'count': None}, 'salary': {'count': None}}).update(my_chunk).iallreduce(comm)
+    
+    # Detectar duplicados globales (hash-based, shuffle por rank dueño)
+    with span('fingerprint'):
+        fingerprints = chunk_fingerprints(my_chunk)
+    with span('dedup'):
+        if node is None:
+            duplicate_mask = global_duplicate_mask(comm, fingerprints, my_chunk.index.to_numpy())
+        else:
+            duplicate_mask = node_duplicate_mask(node, fingerprints, my_chunk.index.to_numpy())
+        total_duplicates = comm.reduce(int(duplicate_mask.sum()), op=MPI.SUM, root=0)
+    
+    with span('stats'):
+        totals = pending.wait()
+        total_missing = int(totals.value('age', 'nulls'))
+    
+        # Calcular mediana global exacta y límites de outliers (selección distribuida)
+        median_age = distributed_median(comm, my_chunk['age'].to_numpy(dtype=np.float64), int(totals.value('age', 'count')))
+        Q1, Q3 = distributed_quantiles(comm, my_chunk['salary'].to_numpy(dtype=np.float64), [0.25, 0.75],
+                                       int(totals.value('salary', 'count')))
+        salary_lower, salary_upper = iqr_fences(Q1, Q3, 1.5)
     
     if rank == 0:
-        # Consolidar duplicados
-        global_hashes = {}
-        for worker_hashes in all_hashes:
-            for h, indices in worker_hashes.items():
-                if h not in global_hashes:
-                    global_hashes[h] = []
-                global_hashes[h].extend(indices)
-        
-        duplicate_indices = set()
-        for h, indices in global_hashes.items():
-            if len(indices) > 1:
-                duplicate_indices.update(indices[1:])
-        
-        duplicate_indices = list(duplicate_indices)
-        
-        # Calcular mediana y límites de outliers
-        median_age = global_sum / global_count
-        all_salary_values = np.concatenate(all_values)
-        Q1 = np.percentile(all_salary_values, 25)
-        Q3 = np.percentile(all_salary_values, 75)
-        IQR = Q3 - Q1
-        salary_lower = Q1 - 1.5 * IQR
-        salary_upper = Q3 + 1.5 * IQR
-        
+        note(missing=total_missing, duplicates=total_duplicates)
         print(f"   Completed analysis")
         print(f"   Missing values: {total_missing:,}")
-        print(f"   Duplicates: {len(duplicate_indices):,}")
-    else:
-        median_age = None
-        duplicate_indices = None
-        salary_lower = None
-        salary_upper = None
-    
-    # Broadcast decisiones
-    median_age = comm.bcast(median_age, root=0)
-    duplicate_indices = comm.bcast(duplicate_indices, root=0)
-    salary_lower = comm.bcast(salary_lower, root=0)
-    salary_upper = comm.bcast(salary_upper, root=0)
+        print(f"   Duplicates: {total_duplicates:,}")
     
 
     if rank == 0:
         print(f"\n Cleaning in parallel ({size} workers)...")
     
     # Cada worker limpia su chunk
-    my_chunk['age'].fillna(median_age, inplace=True)
-    my_chunk = my_chunk[~my_chunk.index.isin(duplicate_indices)]
-    
-    # Normalizar
-    my_chunk['name'] = my_chunk['name'].str.lower().str.strip()
-    my_chunk['email'] = my_chunk['email'].str.lower()
-    my_chunk['country'] = my_chunk['country'].replace({
-        'Gutemala': 'Guatemala',
-        'GT': 'Guatemala',
-        'guatemala': 'Guatemala',
-        'USA': 'Estados Unidos',
-        'US': 'Estados Unidos',
-        'Gringolandia': 'Estados Unidos',
-        'Mejico': 'Mexico'
-    })
-    
-    # Corregir outliers
-    my_chunk.loc[my_chunk['salary'] < salary_lower, 'salary'] = salary_lower
-    my_chunk.loc[my_chunk['salary'] > salary_upper, 'salary'] = salary_upper
+    with span('clean'):
+        my_chunk['age'] = my_chunk['age'].fillna(impute_value(my_chunk['age'], median_age))
+        my_chunk = my_chunk[~duplicate_mask]
+    
+        # Normalizar
+        my_chunk['name'] = my_chunk['name'].str.lower().str.strip()
+        my_chunk['email'] = my_chunk['email'].str.lower()
+        country_map = {
+            'Gutemala': 'Guatemala',
+            'GT': 'Guatemala',
+            'guatemala': 'Guatemala',
+            'USA': 'Estados Unidos',
+            'US': 'Estados Unidos',
+            'Gringolandia': 'Estados Unidos',
+            'Mejico': 'Mexico'
+        }
+        # map (no replace): con schema "category" se aplica una vez por categoría
+        my_chunk['country'] = my_chunk['country'].map(lambda c: country_map.get(c, c))
+    
+        # Corregir outliers
+        my_chunk.loc[my_chunk['salary'] < salary_lower, 'salary'] = salary_lower
+        my_chunk.loc[my_chunk['salary'] > salary_upper, 'salary'] = salary_upper
     
 
-    clean_chunks = comm.gather(my_chunk, root=0)
-    
     if rank == 0:
         print(f"   Cleaning completed")
-        print("\n Consolidating results...")
-        
-        final_df = pd.concat(clean_chunks, ignore_index=True)
-        final_df.to_csv('clean_cleanstream.csv', index=False)
-        
+        print(f"\n Writing results ({output_format}, {output_mode})...")
+    
+    # Cada rank escribe sus filas en su offset (sin gather a rank 0)
+    with span('write'):
+        if layout is None:
+            write_output(comm, my_chunk, output_file, mode=output_mode, fmt=output_format)
+        else:
+            write_csv_ordered(comm, my_chunk, layout.row_ranges, output_file)
+    final_rows = comm.reduce(len(my_chunk), op=MPI.SUM, root=0)
+    del my_chunk
+    if node is not None:
+        node.frame.free()
+    
+    if rank == 0:
         elapsed = time.time() - start_time
         
         print("\n" + "="*60)
         print(f" COMPLETED IN {elapsed:.2f} SECONDS")
         print("="*60)
-        print(f"Final rows: {len(final_df):,}")
+        print(f"Final rows: {final_rows:,}")
         print(f"Speedup: {size}x workers")
         print("="*60)
+        note(final_rows=final_rows, elapsed=elapsed)
         
         return elapsed
 
 if __name__ == '__main__':
-    input_file = sys.argv[1] if len(sys.argv) > 1 else 'dirty_data.csv'
-    clean(input_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='CleanStream (MPI)')
+    parser.add_argument('input_file', nargs='?', default='dirty_data.csv')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--format', choices=FORMATS, default=None,
+                        help='output sink (default: "output" section of --metadata, else csv)')
+    parser.add_argument('--shards', action='store_true',
+                        help='write one CSV per rank plus a manifest instead of a single file')
+    parser.add_argument('--metadata', default=None,
+                        help='metadata.json whose "schema" section sets compact column dtypes and "output" section the sink')
+    parser.add_argument('--engine', choices=['pandas', 'mmap'], default='pandas',
+                        help='CSV reader: generic pd.read_csv or the memory-mapped fixed-schema tokenizer')
+    parser.add_argument('--node-shared', action='store_true',
+                        help='load one copy per node into MPI shared windows; only node leaders exchange across nodes')
+    parser.add_argument('--schedule', choices=SCHEDULES, default='static',
+                        help='static: one byte range per rank; dynamic: ranks pull small byte-range tasks on demand')
+    parser.add_argument('--task-bytes', type=int, default=DEFAULT_TASK_BYTES,
+                        help='target task size for --schedule dynamic')
+    parser.add_argument('--profile', choices=PROFILERS, nargs='?', const='sample', default=None,
+                        help='profile every rank (sample: low-overhead stack sampling; cprofile: deterministic) and '
+                             'write a merged hotspot table plus collapsed stacks / merged pstats')
+    parser.add_argument('--profile-out', default='profile', metavar='PREFIX',
+                        help='--profile: output prefix (PREFIX_hotspots.txt, PREFIX.collapsed or PREFIX.pstats)')
+    parser.add_argument('--report', default=None, metavar='JSON',
+                        help='write a structured run report: per-rank phase times, bytes per collective, '
+                             'peak RSS, rows/s and load imbalance (max/mean) per phase')
+    args = parser.parse_args()
+    if args.report:
+        # Tiempos por fase y rank, bytes por colectiva y pico de RSS -> un JSON al final
+        comm = enable(comm)
+    profiler = start_profiler(args.profile) if args.profile else None
+    clean(args.input_file, args.output, 'shards' if args.shards else 'collective', args.format, args.metadata,
+          args.engine, args.node_shared, args.schedule, args.task_bytes)
+    if profiler is not None:
+        write_profile(comm, profiler.stop(), args.profile_out)
+    if args.report:
+        write_report(comm, args.report, input_file=args.input_file, backend='mpi', mode=args.schedule,
+                     engine=args.engine)
\ No newline at end of file
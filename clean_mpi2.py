@@ -1,214 +1,426 @@
-from mpi4py import MPI
 import pandas as pd
 import numpy as np
+from pandas.api.types import is_numeric_dtype
 import time
-import sys
+import argparse
 import json
-import re
-
-comm = MPI.COMM_WORLD
-rank = comm.Get_rank()
-size = comm.Get_size()
+import os
+
+from partitioned_reader import read_partition, read_schema_range, partition_range, iter_byte_range_batches, common_dtypes
+from order_stats import distributed_median, distributed_quantiles, iqr_fences
+from fingerprint import chunk_fingerprints
+from distributed_dedup import global_duplicate_mask, incremental_duplicate_mask
+from output_writer import write_output, write_csv_collective, write_csv_ordered, format_csv, shard_path, write_manifest, concat_parts_collective
+from stream_stats import StreamingStats, stats_from_totals
+from accumulators import FusedStats
+from cleaning_plan import compile_plan, execute_plan, dictionary_columns
+from columnar_output import FORMATS, resolve_output
+from schema import read_csv_dtypes, apply_schema, column_memory, report_memory
+from mmap_reader import read_fixed_range, iter_fixed_batches
+from local_backend import SharedFrame, row_range, run_local
+from node_shared import read_node_shared, node_duplicate_mask
+from task_scheduler import SCHEDULES, DEFAULT_TASK_BYTES, read_dynamic
+from pipeline import DEFAULT_DEPTH, run_pipeline, report_stages
+from analysis_cache import DEFAULT_CACHE_BYTES, open_cache, load_analysis, store_analysis
+from profiling import PROFILERS, start_profiler, write_profile
+from instrumentation import enable, span, count_rows, note, record_stages, write_report
+from incremental_state import (DEFAULT_MAX_DRIFT, config_hash, load_state, load_totals, load_seen, save_state,
+                               build_state, complete_end, stat_drift)
+
+# Filas por lote en modo streaming
+DEFAULT_BATCH_ROWS = 500_000
+
+# Lectores de CSV: pd.read_csv genérico o el tokenizer mmap de esquema fijo
+ENGINES = ("pandas", "mmap")
+
+# mpi: un proceso por rank con mpirun; local: pool de procesos en un nodo con
+# las columnas en memoria compartida (local_backend.py)
+BACKENDS = ("mpi", "local")
+
+
+def apply_cleaning_rules(df, config, dictionaries, stats, plan=None):
+    """
+    Aplica las reglas de limpieza según la configuración JSON.
+    Si se pasa un plan ya compilado (compile_plan) no se reinterpreta el JSON.
+    """
+    if plan is None:
+        plan = compile_plan(config, dictionaries)
+    return execute_plan(df, plan, stats)
 
 
-def is_valid_email(email):
-    """Valida si un string tiene formato de correo electrónico."""
-    pattern = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
-    return bool(re.match(pattern, str(email)))
+def normalize_ids(df):
+    """
+    Normaliza `id` (quita el sufijo _dup) para que las copias coincidan al deduplicar.
+    Si el schema ya la parseó a un tipo numérico no hay nada que hacer.
+    """
+    if "id" in df.columns and not is_numeric_dtype(df["id"].dtype):
+        df["id"] = (
+            df["id"]
+            .astype(str)
+            .str.replace(r"_dup$", "", regex=True)
+            .str.strip()
+            .str.lower()
+        )
+    return df
 
 
-def apply_cleaning_rules(df, config, dictionaries, stats):
+def compute_stats(comm, df, config, totals=None):
     """
-    Aplica las reglas de limpieza según la configuración JSON.
+    Calcula las estadísticas globales que requieren las reglas de limpieza.
+    Todas las llamadas son colectivas: cada rank obtiene el mismo resultado.
+
+    `totals` es el FusedStats global (conteos, sumas y sketches de todas las
+    columnas en una sola colectiva); si no se pasa se calcula aquí. Solo las
+    medianas y cuartiles exactos necesitan rondas extra (selección distribuida).
     """
+    if totals is None:
+        totals = FusedStats.from_config(config).update(df).allreduce(comm)
+    stats, _ = stats_from_totals(config, totals)
+
     for column, rules in config.items():
-        if column not in df.columns:
+        ctype = rules.get("type")
+        n = int(totals.value(column, "count", 0))
+        if n == 0 or totals.value(column, "sketch") is not None:
             continue
+        if column in df.columns:
+            values = pd.to_numeric(df[column], errors="coerce").to_numpy(dtype=np.float64)
+        else:
+            values = np.array([], dtype=np.float64)
 
-        ctype = rules.get("type")
+        if ctype == "missing_impute" and rules.get("strategy", "median") == "median":
+            stats[f"{column}_median"] = distributed_median(comm, values, n)
+        elif ctype == "outlier_capping" and rules.get("method", "iqr_fence") == "iqr_fence":
+            q1, q3 = distributed_quantiles(comm, values, [0.25, 0.75], n)
+            stats[f"{column}_bounds"] = iqr_fences(q1, q3, rules.get("cap_value", 1.5))
 
-        # --- 1. Missing value imputation ---
-        if ctype == "missing_impute":
-            strategy = rules.get("strategy", "median")
-            if strategy == "median":
-                df[column].fillna(stats.get(f"{column}_median", df[column].median()), inplace=True)
-            elif strategy == "mean":
-                df[column].fillna(stats.get(f"{column}_mean", df[column].mean()), inplace=True)
-
-        # --- 2. String normalization / transformation ---
-        elif ctype in ["string_normalize", "string_transform"]:
-            ops = rules.get("operation", [])
-            for op in ops:
-                if op == "lower":
-                    df[column] = df[column].astype(str).str.lower()
-                elif op == "strip":
-                    df[column] = df[column].astype(str).str.strip()
-
-            # Validación (por ejemplo, email)
-            if rules.get("validation", False) and column == "email":
-                df = df[df[column].apply(is_valid_email)]
-
-        # --- 3. Dictionary replace ---
-        elif ctype == "dictionary_replace":
-            dict_name = rules.get("dictionary_name")
-            if dict_name in dictionaries:
-                mapping = dictionaries[dict_name]
-                replace_map = {}
-                for k, vals in mapping.items():
-                    for v in vals:
-                        replace_map[v.lower()] = k
-                df.loc[:, column] = df[column].astype(str).str.strip().str.lower().replace(replace_map)
-
-        # --- 4. Outlier capping ---
-        elif ctype == "outlier_capping":
-            method = rules.get("method", "iqr_fence")
-            cap_value = rules.get("cap_value", 1.5)
-            if method == "iqr_fence" and f"{column}_bounds" in stats:
-                lower, upper = stats[f"{column}_bounds"]
-                df.loc[df[column] < lower, column] = lower
-                df.loc[df[column] > upper, column] = upper
+    return stats
 
-    return df
 
+def report_completion(comm, start_time, final_rows):
+    if comm.Get_rank() == 0:
+        elapsed = time.time() - start_time
+        note(final_rows=final_rows, elapsed=elapsed)
 
-def clean(input_file, metadata_file="metadata.json"):
-    if rank == 0:
+        print("\n" + "="*60)
+        print(f" COMPLETED IN {elapsed:.2f} SECONDS")
         print("="*60)
-        print(f"CLEANSTREAM (Parallel with {size} workers)")
+        print(f"Final rows: {final_rows:,}")
+        print(f"Speedup: {comm.Get_size()}x workers")
         print("="*60)
-        start_time = time.time()
+
+        return elapsed
+
+
+def iter_batches(input_file, start, end, batch_rows, header, schema, string_dtypes, engine="pandas"):
+    """Lotes del rango [start, end) ya convertidos a los tipos del schema."""
+    if engine == "mmap":
+        yield from iter_fixed_batches(input_file, start, end, batch_rows, header, schema=schema, dtype=string_dtypes)
+        return
+    dtypes_in = read_csv_dtypes(schema, string_dtypes)
+    for batch in iter_byte_range_batches(input_file, start, end, batch_rows, header, dtype=dtypes_in):
+        yield apply_schema(batch, schema)
+
+
+def clean_streaming(comm, input_file, cleaning_config, dictionaries, plan, schema, output_file, output_mode, batch_rows,
+                    start_time, engine="pandas", pipeline_depth=0):
+    """
+    Modo streaming en dos pasadas con memoria acotada por el tamaño del lote.
+
+    Pasada 1: lee el rango de bytes del rank por lotes y acumula solo lo que
+    necesitan las reglas (faltantes, sumas, sketches de cuantiles) más las
+    huellas de deduplicación. Pasada 2: vuelve a leer los lotes, aplica las
+    reglas y los escribe de forma incremental a un archivo parcial por rank.
+
+    Con pipeline_depth > 0 la lectura y la escritura corren en hilos que se
+    solapan con la limpieza (pipeline.run_pipeline); hay hasta
+    ~2 * pipeline_depth lotes extra en memoria.
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    header, start, end = partition_range(input_file, rank, size)
+    string_dtypes = {column: "category" for column in dictionary_columns(plan)}
 
     # ========================
-    # Cargar configuración
+    # Pasada 1: estadísticas y huellas
     # ========================
     if rank == 0:
-        with open(metadata_file, "r", encoding="utf-8") as f:
-            metadata = json.load(f)
-        cleaning_config = metadata.get("cleaning_config", {})
-        dictionaries = metadata.get("dictionaries", {})
-    else:
-        cleaning_config = None
-        dictionaries = None
+        print(f" Streaming pass 1 (batches of {batch_rows:,} rows)...")
+
+    accumulator = StreamingStats(cleaning_config)
+    parts = []
+    dtypes = {}
+    peak = {"usage": {}, "rows": 0}
+
+    def analyze(batch):
+        if len(batch) >= peak["rows"]:
+            peak["usage"], peak["rows"] = column_memory(batch), len(batch)
+        for column in batch.columns:
+            dtypes.setdefault(column, set()).add(batch[column].dtype)
+        normalize_ids(batch)
+        accumulator.update(batch)
+        parts.append(chunk_fingerprints(batch))
+
+    with span("pass1"):
+        batches = iter_batches(input_file, start, end, batch_rows, header, schema, string_dtypes, engine)
+        timings = run_pipeline(batches, analyze, depth=pipeline_depth)
+    record_stages("pass1", timings)
+    report_stages(comm, timings, label="pass 1")
+    n_local = sum(len(f) for f in parts)
+    count_rows(n_local)
+    peak_usage, peak_rows = peak["usage"], peak["rows"]
+
+    # Tipos comunes entre lotes y ranks (salida homogénea)
+    casts = common_dtypes(comm, dtypes)
+    offset = comm.exscan(n_local) or 0
+    total_rows = comm.reduce(n_local, root=0)
+
+    fingerprints = np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+    parts.clear()
+    with span("dedup"):
+        duplicate_mask = global_duplicate_mask(comm, fingerprints, offset + np.arange(n_local))
+    del fingerprints
+    total_duplicates = comm.reduce(int(duplicate_mask.sum()), root=0)
+
+    with span("stats"):
+        stats, nulls = accumulator.finalize(comm)
+
+    if rank == 0:
+        note(input_rows=total_rows, missing=nulls.get("age", 0), duplicates=total_duplicates)
+        print(f"  Original rows: {total_rows:,}")
+        print(f"   Missing values: {nulls.get('age', 0):,}")
+        print(f"   Duplicates: {total_duplicates:,}")
 
-    cleaning_config = comm.bcast(cleaning_config, root=0)
-    dictionaries = comm.bcast(dictionaries, root=0)
+    report_memory(comm, peak_usage, peak_rows, label="largest batch")
 
     # ========================
-    # Cargar y distribuir
+    # Pasada 2: limpieza y escritura incremental
     # ========================
     if rank == 0:
-        print(" Loading and distributing data...")
-        load_start = time.time()
-        df = pd.read_csv(input_file)
-        print(f"  Original rows: {len(df):,}")
-
-        # Particionar
-        chunk_size = len(df) // size
-        chunks = []
-        for i in range(size):
-            start_idx = i * chunk_size
-            end_idx = start_idx + chunk_size if i < size - 1 else len(df)
-            chunks.append(df.iloc[start_idx:end_idx].copy())
-
-        print(f"   Divided in {size} chunks of ~{chunk_size:,} rows")
-        print(f"   Distributed in {time.time()-load_start:.2f}s")
-    else:
-        chunks = None
+        print("\n Streaming pass 2 (clean + write)...")
+
+    part_path = f"{output_file}.part{rank}" if output_mode != "shards" \
+        else shard_path(os.path.splitext(output_file)[0], rank)
+    progress = {"position": 0, "rows": 0}
+
+    def clean_batch(batch):
+        position = progress["position"]
+        if casts:
+            batch = batch.astype(casts)
+        batch.index = pd.RangeIndex(offset + position, offset + position + len(batch))
+        keep = ~duplicate_mask[position:position + len(batch)]
+        progress["position"] += len(batch)
+
+        batch = normalize_ids(batch)[keep]
+        batch = apply_cleaning_rules(batch, cleaning_config, dictionaries, stats, plan=plan)
+        progress["rows"] += len(batch)
+        # El formateo queda en la etapa de limpieza: la de escritura es solo I/O
+        return format_csv(batch, header=False)
+
+    with span("pass2"), open(part_path, "wb") as out:
+        if rank == 0 or output_mode == "shards":
+            out.write(header)
+        batches = iter_batches(input_file, start, end, batch_rows, header, schema, string_dtypes, engine)
+        timings = run_pipeline(batches, clean_batch, out.write, depth=pipeline_depth)
+    record_stages("pass2", timings)
+    report_stages(comm, timings, label="pass 2")
+    local_rows = progress["rows"]
+
+    with span("write"):
+        if output_mode == "shards":
+            write_manifest(comm, os.path.splitext(output_file)[0], part_path, local_rows, os.path.getsize(part_path))
+        else:
+            concat_parts_collective(comm, part_path, output_file)
 
-    my_chunk = comm.scatter(chunks, root=0)
+    final_rows = comm.reduce(local_rows, root=0)
+    return report_completion(comm, start_time, final_rows)
 
-    if rank == 0:
-        print(f"\n Analyzing in parallel ({size} workers)...")
 
-    if "id" in my_chunk.columns:
-        my_chunk["id"] = (
-            my_chunk["id"]
-            .astype(str)
-            .str.replace(r"_dup$", "", regex=True)
-            .str.strip()
-            .str.lower()
-        )
+def range_reader(engine, schema, plan):
+    """
+    (lector de rangos de bytes, kwargs) con los tipos compactos del schema.
+    Las columnas de texto del plan se cargan como categóricas: las reglas
+    corren una vez por valor único.
+    """
+    string_dtypes = {column: "category" for column in dictionary_columns(plan)}
+    if engine == "mmap":
+        return read_fixed_range, {"schema": schema, "dtype": string_dtypes}
+    return read_schema_range, {"schema": schema, "dtype": read_csv_dtypes(schema, string_dtypes)}
 
 
+def clean_incremental(comm, input_file, cleaning_config, dictionaries, plan, schema, output_file, state_dir,
+                      max_drift, start_time, engine="pandas"):
+    """
+    Modo incremental para entradas que solo crecen por el final.
+
+    El directorio de estado guarda el offset ya procesado, los totales
+    mergeables (conteos, sumas, sketches de cuantiles), el índice de huellas
+    de deduplicación (un shard por rank dueño) y las estadísticas aplicadas a
+    la salida. Cada corrida lee solo las líneas completas agregadas, las
+    deduplica contra el índice, las limpia con las estadísticas ya aplicadas
+    y las agrega al CSV. Si la mediana o los fences globales se alejan más de
+    `max_drift` de los aplicados (o el estado no describe el archivo actual)
+    se recalcula todo desde cero.
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    digest = config_hash(cleaning_config, dictionaries, schema)
+    if rank == 0:
+        state, reason = load_state(state_dir, input_file, output_file, digest)
+        loaded = (state, reason, complete_end(input_file))
+    else:
+        loaded = None
+    state, reason, end = comm.bcast(loaded, root=0)
+
+    while True:
+        full = state is None
+        if rank == 0:
+            if full:
+                print(f" Full run ({reason})...")
+            else:
+                print(f" Incremental run: bytes [{state['offset']:,}, {end:,}) after {state['rows']:,} rows...")
+
+        # ========================
+        # Leer solo el tramo nuevo
+        # ========================
+        rows_before = 0 if full else state["rows"]
+        reader, kwargs = range_reader(engine, schema, plan)
+        header, start, stop = partition_range(input_file, rank, size, None if full else state["offset"], end)
+        with span("load"):
+            chunk = reader(input_file, start, stop, header=header, **kwargs)
+        casts = common_dtypes(comm, {c: [chunk[c].dtype] for c in chunk.columns})
+        if casts:
+            chunk = chunk.astype(casts)
+        offset = rows_before + (comm.exscan(len(chunk)) or 0)
+        chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+        new_rows = comm.allreduce(len(chunk))
+        normalize_ids(chunk)
+
+        # Totales mergeables: los guardados entran una sola vez (en rank 0)
+        with span("stats"):
+            fused = FusedStats.from_config(cleaning_config, exact_quantiles=False).update(chunk)
+            if not full and rank == 0:
+                fused.merge(load_totals(state_dir), fused.buffer)
+            totals = fused.allreduce(comm)
+            current, nulls = stats_from_totals(cleaning_config, totals)
+
+        if full:
+            break
+        drift = {k: d for k, d in stat_drift(state["applied_stats"], current).items() if d > max_drift}
+        if not drift:
+            break
+        state = None
+        reason = ", ".join(f"{k} drifted {d:.1%}" for k, d in drift.items()) + f" > {max_drift:.1%}"
+
     # ========================
-    # Duplicados y estadísticas
+    # Deduplicar contra el índice y limpiar con las estadísticas aplicadas
     # ========================
-    local_missing = 0
-    local_stats = {}
-    if "age" in my_chunk.columns:
-        local_missing = my_chunk["age"].isna().sum()
-
-    total_missing = comm.reduce(local_missing, op=MPI.SUM, root=0)
-
-    # Duplicados locales (hash)
-    local_hashes = {}
-    for idx, row in my_chunk.iterrows():
-        row_hash = hash(tuple(row))
-        if row_hash not in local_hashes:
-            local_hashes[row_hash] = []
-        local_hashes[row_hash].append(idx)
-
-    all_hashes = comm.gather(local_hashes, root=0)
-
-    # Estadísticas para imputación y outliers
-    if "age" in my_chunk.columns:
-        local_sum = my_chunk["age"].sum()
-        local_count = my_chunk["age"].count()
+    count_rows(len(chunk))
+    with span("fingerprint"):
+        fingerprints = chunk_fingerprints(chunk)
+    with span("dedup"):
+        seen = np.empty(0, dtype=np.uint64) if full else load_seen(comm, state_dir, state["ranks"])
+        duplicate_mask, seen = incremental_duplicate_mask(comm, fingerprints, chunk.index.to_numpy(), seen)
+    total_duplicates = comm.reduce(int(duplicate_mask.sum()), root=0)
+    # Las estadísticas quedan fijas (las de la última corrida completa) hasta que derivan
+    if full:
+        applied = {k: [float(x) for x in v] if isinstance(v, (tuple, list)) else float(v) for k, v in current.items()}
     else:
-        local_sum = local_count = 0
+        applied = state["applied_stats"]
 
-    global_sum = comm.reduce(local_sum, op=MPI.SUM, root=0)
-    global_count = comm.reduce(local_count, op=MPI.SUM, root=0)
+    if rank == 0:
+        note(input_rows=new_rows, missing=nulls.get("age", 0), duplicates=total_duplicates, full_run=full)
+        print(f"  New rows: {new_rows:,} (total {rows_before + new_rows:,})")
+        print(f"   Missing values: {nulls.get('age', 0):,}")
+        print(f"   Duplicates: {total_duplicates:,}")
+
+    with span("clean"):
+        chunk = apply_cleaning_rules(chunk[~duplicate_mask], cleaning_config, dictionaries, applied, plan=plan)
+    with span("write"):
+        write_csv_collective(comm, chunk, output_file, append=not full)
+    final_rows = (0 if full else state["output_rows"]) + comm.allreduce(len(chunk))
+
+    previous_ranks = 0 if full else state["ranks"]
+    new_state = None
+    if rank == 0:
+        new_state = build_state(input_file, output_file, digest, end, rows_before + new_rows, final_rows,
+                                applied, size)
+    with span("save_state"):
+        save_state(comm, state_dir, new_state, totals.buffer, seen, previous_ranks)
 
-    if "salary" in my_chunk.columns:
-        local_values = my_chunk["salary"].dropna().values
-    else:
-        local_values = np.array([])
+    return report_completion(comm, start_time, final_rows if rank == 0 else None)
 
-    all_values = comm.gather(local_values, root=0)
 
-    # ========================
-    # Consolidar estadísticas
-    # ========================
-    if rank == 0:
-        stats = {}
-        if global_count > 0:
-            stats["age_median"] = global_sum / global_count
-
-        if len(all_values) > 0 and len(np.concatenate(all_values)) > 0:
-            all_salary_values = np.concatenate(all_values)
-            Q1 = np.percentile(all_salary_values, 25)
-            Q3 = np.percentile(all_salary_values, 75)
-            IQR = Q3 - Q1
-            salary_lower = Q1 - 1.5 * IQR
-            salary_upper = Q3 + 1.5 * IQR
-            stats["salary_bounds"] = (salary_lower, salary_upper)
-        else:
-            stats["salary_bounds"] = (None, None)
+def read_metadata(metadata_file):
+    """cleaning_config, dictionaries, output, schema y el plan compilado de metadata.json."""
+    with open(metadata_file, "r", encoding="utf-8") as f:
+        metadata = json.load(f)
+    cleaning_config = metadata.get("cleaning_config", {})
+    dictionaries = metadata.get("dictionaries", {})
+    # Plan de limpieza compilado una sola vez (y difundido a todos los ranks);
+    # los índices de búsqueda aproximada se guardan junto a metadata.json
+    plan = compile_plan(cleaning_config, dictionaries, os.path.dirname(os.path.abspath(metadata_file)))
+    return cleaning_config, dictionaries, metadata.get("output", {}), metadata.get("schema", {}), plan
 
-        # Consolidar duplicados globales
-        global_hashes = {}
-        for worker_hashes in all_hashes:
-            for h, indices in worker_hashes.items():
-                if h not in global_hashes:
-                    global_hashes[h] = []
-                global_hashes[h].extend(indices)
 
-        duplicate_indices = set()
-        for h, indices in global_hashes.items():
-            if len(indices) > 1:
-                duplicate_indices.update(indices[1:])
+def clean_loaded(comm, my_chunk, cleaning_config, dictionaries, plan, output_file, output_mode, output_format,
+                 start_time, node=None, layout=None, cache=None):
+    """
+    Análisis, limpieza y escritura de un chunk ya cargado (índice = número de
+    fila global). Común a ambos backends: solo usa colectivas de `comm`.
+    Con `node` (node_shared.NodePartition) la deduplicación pasa por los líderes de nodo;
+    con `layout` (task_scheduler.TaskLayout) la escritura respeta el orden de las tareas.
+    Con `cache` (analysis_cache.AnalysisCache) el análisis se reutiliza si ya está guardado.
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    count_rows(len(my_chunk))
+    report_memory(comm, column_memory(my_chunk), len(my_chunk))
 
-        duplicate_indices = list(duplicate_indices)
+    if rank == 0:
+        print(f"\n Analyzing in parallel ({size} workers)...")
 
-        print(f"   Missing values: {total_missing:,}")
-        print(f"   Duplicates: {len(duplicate_indices):,}")
+    normalize_ids(my_chunk)
+
+    # Con la caché, un análisis ya hecho para el mismo contenido y las mismas
+    # reglas estadísticas salta directo a la limpieza
+    with span("cache_lookup"):
+        cached = load_analysis(comm, cache) if cache is not None else None
+    if cached is not None:
+        if rank == 0:
+            print(f"   Analysis cache hit ({cache.key})")
+        stats, total_missing, total_duplicates = cached.stats, cached.missing, cached.duplicates
+        duplicate_mask = cached.duplicate_mask(my_chunk.index.to_numpy())
     else:
-        stats = None
-        duplicate_indices = None
+        # ========================
+        # Duplicados y estadísticas
+        # ========================
+        # Conteos, sumas y sketches de todas las reglas en un solo buffer; la
+        # reducción (Iallreduce) se solapa con el shuffle de deduplicación
+        with span("accumulate"):
+            pending = FusedStats.from_config(cleaning_config).update(my_chunk).iallreduce(comm)
+
+        # Huellas de fila estables (vectorizadas por columna)
+        with span("fingerprint"):
+            fingerprints = chunk_fingerprints(my_chunk)
+
+        # Duplicados globales: shuffle de huellas a su rank dueño (Alltoallv)
+        with span("dedup"):
+            if node is None:
+                duplicate_mask = global_duplicate_mask(comm, fingerprints, my_chunk.index.to_numpy())
+            else:
+                duplicate_mask = node_duplicate_mask(node, fingerprints, my_chunk.index.to_numpy())
+        total_duplicates = comm.reduce(int(duplicate_mask.sum()), root=0)
+
+        # Estadísticas para imputación y outliers (colectivas, sin gather de columnas)
+        with span("stats"):
+            totals = pending.wait()
+            total_missing = int(totals.value("age", "nulls", 0))
+            stats = compute_stats(comm, my_chunk, cleaning_config, totals)
+        if cache is not None:
+            with span("cache_store"):
+                store_analysis(comm, cache, stats, total_missing, duplicate_mask, my_chunk.index.to_numpy())
 
-    stats = comm.bcast(stats, root=0)
-    duplicate_indices = comm.bcast(duplicate_indices, root=0)
+    if rank == 0:
+        print(f"   Missing values: {total_missing:,}")
+        print(f"   Duplicates: {total_duplicates:,}")
+        note(missing=total_missing, duplicates=total_duplicates)
 
     # ========================
     # Limpieza paralela
@@ -216,37 +428,259 @@ def clean(input_file, metadata_file="metadata.json"):
     if rank == 0:
         print(f"\n Cleaning in parallel ({size} workers)...")
 
-    # Eliminar duplicados
-    my_chunk = my_chunk[~my_chunk.index.isin(duplicate_indices)]
-
-    # Aplicar reglas JSON
-    my_chunk = apply_cleaning_rules(my_chunk, cleaning_config, dictionaries, stats)
+    with span("clean"):
+        # Eliminar duplicados
+        my_chunk = my_chunk[~duplicate_mask]
 
-    clean_chunks = comm.gather(my_chunk, root=0)
+        # Aplicar reglas JSON
+        my_chunk = apply_cleaning_rules(my_chunk, cleaning_config, dictionaries, stats, plan=plan)
 
     # ========================
-    # Consolidar resultado
+    # Escritura paralela del resultado
     # ========================
     if rank == 0:
         print("   Cleaning completed")
-        print("\n Consolidating results...")
+        print(f"\n Writing results ({output_format}, {output_mode}) to {output_file}...")
 
-        final_df = pd.concat(clean_chunks, ignore_index=True)
-        final_df.to_csv("clean_cleanstream.csv", index=False)
-
-        elapsed = time.time() - start_time
-
-        print("\n" + "="*60)
-        print(f" COMPLETED IN {elapsed:.2f} SECONDS")
+    with span("write"):
+        if layout is None:
+            write_output(comm, my_chunk, output_file, mode=output_mode, fmt=output_format)
+        else:
+            write_csv_ordered(comm, my_chunk, layout.row_ranges, output_file)
+    final_rows = comm.reduce(len(my_chunk), root=0)
+
+    return report_completion(comm, start_time, final_rows)
+
+
+def clean(input_file, metadata_file="metadata.json", output_file=None, output_mode="collective", output_format=None,
+          stream=False, batch_rows=DEFAULT_BATCH_ROWS, engine="pandas", backend="mpi", workers=None, node_shared=False,
+          schedule="static", task_bytes=DEFAULT_TASK_BYTES, pipeline_depth=0, state_dir=None,
+          max_drift=DEFAULT_MAX_DRIFT, cache_dir=None, cache_bytes=DEFAULT_CACHE_BYTES, report_file=None,
+          profile=None, profile_out="profile"):
+    if backend == "local":
+        if stream or state_dir:
+            raise ValueError("--stream and --state-dir are only supported by the mpi backend")
+        return clean_local(input_file, metadata_file, output_file, output_mode, output_format, engine, workers,
+                           cache_dir, cache_bytes, report_file, profile, profile_out)
+
+    from mpi4py import MPI
+
+    comm = MPI.COMM_WORLD
+    if report_file:
+        # Tiempos por fase y rank, bytes por colectiva y pico de RSS -> un JSON al final
+        comm = enable(comm)
+    # Perfil de funciones por rank (muestreo o cProfile), combinado en rank 0 al final
+    profiler = start_profiler(profile) if profile else None
+    rank, size = comm.Get_rank(), comm.Get_size()
+
+    start_time = None
+    if rank == 0:
         print("="*60)
-        print(f"Final rows: {len(final_df):,}")
-        print(f"Speedup: {size}x workers")
+        print(f"CLEANSTREAM (Parallel with {size} workers)")
         print("="*60)
+        start_time = time.time()
 
-        return elapsed
+    # ========================
+    # Cargar configuración
+    # ========================
+    loaded = read_metadata(metadata_file) if rank == 0 else None
+    cleaning_config, dictionaries, output_config, schema, plan = comm.bcast(loaded, root=0)
+    output_file, output_format = resolve_output(output_config, output_file, output_format)
+
+    if schedule == "dynamic" and (stream or node_shared or output_format != "csv" or output_mode != "collective"):
+        raise ValueError("--schedule dynamic only supports a single csv output without --stream/--node-shared")
+
+    if cache_dir and (stream or state_dir):
+        raise ValueError("--cache-dir is not supported with --stream/--state-dir")
+
+    if state_dir:
+        if stream or node_shared or schedule == "dynamic" or output_format != "csv" or output_mode != "collective":
+            raise ValueError("--state-dir only supports a single csv output without --stream/--node-shared/--schedule dynamic")
+        elapsed = clean_incremental(comm, input_file, cleaning_config, dictionaries, plan, schema, output_file,
+                                    state_dir, max_drift, start_time, engine)
+    elif stream:
+        if output_format != "csv":
+            raise ValueError("--stream only supports csv output")
+        elapsed = clean_streaming(comm, input_file, cleaning_config, dictionaries, plan, schema, output_file,
+                                  output_mode, batch_rows, start_time, engine, pipeline_depth)
+    else:
+        elapsed = clean_in_memory(comm, input_file, cleaning_config, dictionaries, plan, schema, output_file,
+                                  output_mode, output_format, start_time, engine, node_shared, schedule, task_bytes,
+                                  cache_dir, cache_bytes)
+
+    if profiler is not None:
+        write_profile(comm, profiler.stop(), profile_out)
+    if report_file:
+        write_report(comm, report_file, input_file=input_file, output_file=output_file, backend="mpi",
+                     mode="incremental" if state_dir else "stream" if stream else schedule, engine=engine)
+    return elapsed
+
+
+def clean_in_memory(comm, input_file, cleaning_config, dictionaries, plan, schema, output_file, output_mode,
+                    output_format, start_time, engine="pandas", node_shared=False, schedule="static",
+                    task_bytes=DEFAULT_TASK_BYTES, cache_dir=None, cache_bytes=DEFAULT_CACHE_BYTES):
+    """Carga en memoria (rangos de bytes, ventanas compartidas por nodo o tareas dinámicas) y limpia."""
+    rank, size = comm.Get_rank(), comm.Get_size()
+
+    # ========================
+    # Cargar y distribuir
+    # ========================
+    if rank == 0:
+        if schedule == "dynamic":
+            where = "dynamic byte-range tasks"
+        else:
+            where = "one shared copy per node" if node_shared else "byte ranges per rank"
+        print(f" Loading partitions ({where}, {engine} reader)...")
+        load_start = time.time()
+
+    # Cada rank lee solo su rango de bytes (sin scatter desde rank 0) con los
+    # tipos compactos del schema. Columnas de texto del plan como categóricas:
+    # las reglas corren una vez por valor único
+    reader, kwargs = range_reader(engine, schema, plan)
+    if cache_dir:
+        with span("cache_key"):
+            cache = open_cache(comm, cache_dir, input_file, cleaning_config, schema, cache_bytes)
+    else:
+        cache = None
+    node, layout = None, None
+    with span("load"):
+        if schedule == "dynamic":
+            # Tareas pequeñas repartidas bajo demanda (contador atómico RMA)
+            my_chunk, layout = read_dynamic(comm, input_file, reader=reader, task_bytes=task_bytes, **kwargs)
+        elif node_shared:
+            # Un lector por nodo; los ranks del nodo trabajan sobre vistas de ventanas MPI compartidas
+            my_chunk, node = read_node_shared(comm, input_file, reader=reader, **kwargs)
+        else:
+            my_chunk = read_partition(comm, input_file, reader=reader, **kwargs)
+    total_rows = comm.reduce(len(my_chunk), root=0)
+
+    if rank == 0:
+        note(input_rows=total_rows)
+        print(f"  Original rows: {total_rows:,}")
+        if layout is None:
+            print(f"   Divided in {size} byte ranges of ~{total_rows // size:,} rows")
+        print(f"   Loaded in {time.time()-load_start:.2f}s")
+
+    elapsed = clean_loaded(comm, my_chunk, cleaning_config, dictionaries, plan, output_file, output_mode,
+                           output_format, start_time, node=node, layout=layout, cache=cache)
+    if node is not None:
+        del my_chunk
+        node.frame.free()
+    return elapsed
+
+
+def _local_worker(comm, shared, report, profile, *args):
+    if report:
+        comm = enable(comm)
+    profiler = start_profiler(profile[0]) if profile else None
+    lo, hi = row_range(shared.rows, comm.Get_rank(), comm.Get_size())
+    clean_loaded(comm, shared.view(lo, hi), *args)
+    if profiler is not None:
+        write_profile(comm, profiler.stop(), profile[1])
+    if report:
+        report_file, meta = report
+        write_report(comm, report_file, **meta)
+
+
+def clean_local(input_file, metadata_file="metadata.json", output_file=None, output_mode="collective",
+                output_format=None, engine="pandas", workers=None, cache_dir=None, cache_bytes=DEFAULT_CACHE_BYTES,
+                report_file=None, profile=None, profile_out="profile"):
+    """
+    Backend de un solo nodo sin MPI. El proceso principal lee el archivo una
+    vez, copia las columnas a memoria compartida y lanza `workers` procesos
+    que trabajan sobre rangos de filas disjuntos (vistas sin copia). Las
+    reducciones (dedup, medianas, cuantiles, escritura) son las mismas que en
+    MPI, sobre local_backend.LocalComm.
+    """
+    workers = workers or os.cpu_count() or 1
+    print("="*60)
+    print(f"CLEANSTREAM (Shared memory with {workers} workers)")
+    print("="*60)
+    start_time = time.time()
+
+    cleaning_config, dictionaries, output_config, schema, plan = read_metadata(metadata_file)
+    output_file, output_format = resolve_output(output_config, output_file, output_format)
+
+    print(f" Loading into shared memory ({engine} reader)...")
+    string_dtypes = {column: "category" for column in dictionary_columns(plan)}
+    if engine == "mmap":
+        header, start, end = partition_range(input_file, 0, 1)
+        df = read_fixed_range(input_file, start, end, header, schema=schema, dtype=string_dtypes)
+    else:
+        df = apply_schema(pd.read_csv(input_file, dtype=read_csv_dtypes(schema, string_dtypes)), schema)
+    shared = SharedFrame(df)
+    print(f"  Original rows: {len(df):,}")
+    print(f"   Divided in {workers} row ranges of ~{len(df) // workers:,} rows")
+    load_seconds = time.time() - start_time
+    print(f"   Loaded in {load_seconds:.2f}s")
+    del df
+    cache = open_cache(None, cache_dir, input_file, cleaning_config, schema, cache_bytes) if cache_dir else None
+
+    try:
+        # La carga corre en el proceso principal: va al reporte como un solo número
+        report = None
+        if report_file:
+            report = (report_file, {"input_file": input_file, "output_file": output_file, "backend": "local",
+                                    "engine": engine, "input_rows": shared.rows, "load_seconds": load_seconds})
+        run_local(_local_worker, workers, shared, report, (profile, profile_out) if profile else None,
+                  cleaning_config, dictionaries, plan, output_file, output_mode, output_format, start_time, None,
+                  None, cache)
+    finally:
+        shared.unlink()
+    return time.time() - start_time
 
 
 if __name__ == "__main__":
-    input_file = sys.argv[1] if len(sys.argv) > 1 else "dirty_data.csv"
-    metadata_file = sys.argv[2] if len(sys.argv) > 2 else "metadata.json"
-    clean(input_file, metadata_file)
+    parser = argparse.ArgumentParser(description="CleanStream (MPI)")
+    parser.add_argument("input_file", nargs="?", default="dirty_data.csv")
+    parser.add_argument("metadata_file", nargs="?", default="metadata.json")
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="output format (overrides \"output\": {\"format\"} in metadata.json)")
+    parser.add_argument("--shards", action="store_true",
+                        help="write one CSV per rank plus a manifest instead of a single file")
+    parser.add_argument("--stream", action="store_true",
+                        help="two-pass streaming mode with memory bounded by --batch-rows")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--engine", choices=ENGINES, default="pandas",
+                        help="CSV reader: generic pd.read_csv or the memory-mapped fixed-schema tokenizer")
+    parser.add_argument("--backend", choices=BACKENDS, default="mpi",
+                        help="mpi (run under mpirun) or local (single-node process pool over shared memory)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes for --backend local (default: CPU count)")
+    parser.add_argument("--node-shared", action="store_true",
+                        help="mpi backend: load one copy per node into MPI shared windows; "
+                             "only node leaders exchange fingerprints across nodes")
+    parser.add_argument("--schedule", choices=SCHEDULES, default="static",
+                        help="static: one byte range per rank; dynamic: ranks pull small byte-range tasks on demand")
+    parser.add_argument("--task-bytes", type=int, default=DEFAULT_TASK_BYTES,
+                        help="target task size for --schedule dynamic")
+    parser.add_argument("--pipeline", type=int, nargs="?", const=DEFAULT_DEPTH, default=0, metavar="DEPTH",
+                        help="--stream: overlap read / clean / write in threads with DEPTH batches between stages "
+                             f"(default {DEFAULT_DEPTH}, double buffering)")
+    parser.add_argument("--state-dir", default=None,
+                        help="incremental mode: keep processed offset, mergeable stats and the dedup index here; "
+                             "later runs only clean the rows appended since (single csv output)")
+    parser.add_argument("--max-drift", type=float, default=DEFAULT_MAX_DRIFT,
+                        help="--state-dir: relative change of a median or IQR fence that forces a full recompute "
+                             f"(default {DEFAULT_MAX_DRIFT})")
+    parser.add_argument("--cache-dir", default=None,
+                        help="reuse missing counts, medians/fences and duplicates for an unchanged input and "
+                             "unchanged statistics rules (string rules may change freely)")
+    parser.add_argument("--cache-bytes", type=int, default=DEFAULT_CACHE_BYTES,
+                        help="--cache-dir: evict least recently used entries above this size")
+    parser.add_argument("--report", default=None, metavar="JSON",
+                        help="write a structured run report: per-rank phase times, bytes per collective, "
+                             "peak RSS, rows/s and load imbalance (max/mean) per phase")
+    parser.add_argument("--profile", choices=PROFILERS, nargs="?", const="sample", default=None,
+                        help="profile every rank (sample: low-overhead stack sampling; cprofile: deterministic) and "
+                             "write a merged hotspot table plus collapsed stacks / merged pstats")
+    parser.add_argument("--profile-out", default="profile", metavar="PREFIX",
+                        help="--profile: output prefix (PREFIX_hotspots.txt, PREFIX.collapsed or PREFIX.pstats)")
+    args = parser.parse_args()
+    clean(args.input_file, args.metadata_file, args.output, "shards" if args.shards else "collective", args.format,
+          stream=args.stream, batch_rows=args.batch_rows, engine=args.engine, backend=args.backend,
+          workers=args.workers, node_shared=args.node_shared,
+          schedule=args.schedule, task_bytes=args.task_bytes, pipeline_depth=args.pipeline,
+          state_dir=args.state_dir, max_drift=args.max_drift, cache_dir=args.cache_dir, cache_bytes=args.cache_bytes,
+          report_file=args.report, profile=args.profile, profile_out=args.profile_out)
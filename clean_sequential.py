@@ -1,8 +1,19 @@
 import csv
+import json
 import time
-import sys
+import argparse
 
-def clean_sequential(input_file):
+from dedup import find_duplicates, DEFAULT_MAX_ENTRIES
+
+def load_output_config(metadata_file):
+    """Sección "output" de metadata.json; vacía si no se indica archivo."""
+    if metadata_file is None:
+        return {}
+    with open(metadata_file, 'r', encoding='utf-8') as f:
+        return json.load(f).get('output', {})
+
+def clean_sequential(input_file, key_columns=None, max_index_entries=DEFAULT_MAX_ENTRIES,
+                     output_file=None, output_format='csv'):
     print("="*60)
     print("SEQUENTIAL VERSION")
     print("="*60)
@@ -55,25 +66,9 @@ def clean_sequential(input_file):
     salary_lower = Q1 - 1.5 * IQR
     salary_upper = Q3 + 1.5 * IQR
     
-    # Detectar duplicados 
+    # Detectar duplicados (índice de huellas, una sola pasada)
     print("\n Finding duplicates...")
-    duplicate_indices = set()
-    for i in range(len(rows)):
-        if i % 10000 == 0 and i > 0:
-            print(f"  Checked {i:,} rows for duplicates...")
-        
-        if i in duplicate_indices:
-            continue
-        
-        for j in range(i+1, len(rows)):
-            is_duplicate = True
-            for key in rows[i].keys():
-                if rows[i][key] != rows[j][key]:
-                    is_duplicate = False
-                    break
-            
-            if is_duplicate:
-                duplicate_indices.add(j)
+    duplicate_indices = find_duplicates(rows, key_columns, max_entries=max_index_entries)
     
     print(f"\n  Analysis completed in {time.time()-analysis_start:.2f}s")
     print(f"  Missing values: {missing_count:,}")
@@ -128,11 +123,18 @@ def clean_sequential(input_file):
     
     print("\n Saving results...")
     
-    with open('clean_sequential.csv', 'w', newline='', encoding='utf-8') as f:
-        if cleaned_rows:
-            writer = csv.DictWriter(f, fieldnames=cleaned_rows[0].keys())
-            writer.writeheader()
-            writer.writerows(cleaned_rows)
+    if output_format == 'csv':
+        with open(output_file or 'clean_sequential.csv', 'w', newline='', encoding='utf-8') as f:
+            if cleaned_rows:
+                writer = csv.DictWriter(f, fieldnames=cleaned_rows[0].keys())
+                writer.writeheader()
+                writer.writerows(cleaned_rows)
+    else:
+        # Sinks columnares (requieren pandas; la ruta CSV sigue siendo Python puro)
+        from columnar_output import write_columnar, default_output_path, rows_to_frame
+        output_file = output_file or default_output_path('clean_sequential.csv', output_format)
+        write_columnar(rows_to_frame(cleaned_rows), output_file, output_format)
+        print(f"  Wrote {output_format} output to {output_file}")
     
     elapsed = time.time() - start_time
     
@@ -147,5 +149,17 @@ def clean_sequential(input_file):
     return elapsed
 
 if __name__ == '__main__':
-    input_file = sys.argv[1] if len(sys.argv) > 1 else 'dirty_data.csv'
-    clean_sequential(input_file)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Sequential cleaner (baseline)')
+    parser.add_argument('input_file', nargs='?', default='dirty_data.csv')
+    parser.add_argument('key_columns', nargs='?', default=None,
+                        help='comma-separated columns used to detect duplicates (default: all)')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--format', choices=('csv', 'parquet', 'arrow', 'npy'), default=None,
+                        help='output sink (default: "output" section of --metadata, else csv)')
+    parser.add_argument('--metadata', default=None, help='metadata.json whose "output" section sets the sink')
+    args = parser.parse_args()
+    key_columns = args.key_columns.split(',') if args.key_columns else None
+    # La bandera de CLI tiene prioridad sobre "output" en metadata.json
+    output_config = load_output_config(args.metadata)
+    clean_sequential(args.input_file, key_columns, output_file=args.output or output_config.get('path'),
+                     output_format=args.format or output_config.get('format', 'csv'))
\ No newline at end of file
@@ -0,0 +1,227 @@
+import re
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from schema import impute_value
+from instrumentation import span
+from fuzzy_index import DEFAULT_MIN_LENGTH, load_or_build_index
+
+EMAIL_PATTERN = r"^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$"
+EMAIL_RE = re.compile(EMAIL_PATTERN)
+
+# Operaciones de texto soportadas por string_normalize / string_transform
+STRING_OPS = {
+    "lower": str.lower,
+    "strip": str.strip,
+}
+
+
+class ImputeStep(NamedTuple):
+    column: str
+    strategy: str
+
+
+class StringStep(NamedTuple):
+    column: str
+    funcs: tuple
+    validator: object
+
+
+class DictionaryStep(NamedTuple):
+    column: str
+    lookup: dict
+    # FuzzyIndex para los valores sin coincidencia exacta (None = solo exacta)
+    fuzzy: object = None
+
+
+class CappingStep(NamedTuple):
+    column: str
+    method: str
+
+
+class CleaningPlan(NamedTuple):
+    """Plan de ejecución inmutable: una tupla de pasos en el orden de cleaning_config."""
+    steps: tuple
+
+
+# Nombre de cada paso en el reporte de instrumentación (fase "rule.<columna>.<nombre>")
+_STEP_NAMES = {ImputeStep: "missing_impute", StringStep: "string", DictionaryStep: "dictionary_replace",
+               CappingStep: "outlier_capping"}
+
+
+def build_replace_map(mapping):
+    """variante (minúsculas) -> valor canónico, igual que antes en apply_cleaning_rules."""
+    replace_map = {}
+    for canonical, variants in mapping.items():
+        for variant in variants:
+            replace_map[variant.lower()] = canonical
+    return replace_map
+
+
+def compile_plan(config, dictionaries, index_dir=None):
+    """
+    Traduce cleaning_config + dictionaries a un CleaningPlan una sola vez:
+    operaciones de texto fusionadas por columna, regex precompiladas y tablas
+    de reemplazo ya construidas. El plan es serializable (se hace bcast).
+
+    dictionary_replace con "max_distance" > 0 agrega búsqueda aproximada
+    para lo que no coincide exacto: índice invertido de bigramas con filtro
+    por conteo y verificación con Myers/Hyyrö (fuzzy_index.py); el índice se
+    guarda en `index_dir` (el directorio de metadata.json).
+    """
+    steps = []
+    for column, rules in config.items():
+        ctype = rules.get("type")
+
+        if ctype == "missing_impute":
+            steps.append(ImputeStep(column, rules.get("strategy", "median")))
+
+        elif ctype in ("string_normalize", "string_transform"):
+            funcs = tuple(STRING_OPS[op] for op in rules.get("operation", []) if op in STRING_OPS)
+            validator = EMAIL_RE if rules.get("validation", False) and column == "email" else None
+            steps.append(StringStep(column, funcs, validator))
+
+        elif ctype == "dictionary_replace":
+            dict_name = rules.get("dictionary_name")
+            if dict_name in dictionaries:
+                lookup = build_replace_map(dictionaries[dict_name])
+                fuzzy = None
+                if rules.get("max_distance", 0) > 0:
+                    fuzzy = load_or_build_index(dict_name, dictionaries[dict_name], lookup, rules["max_distance"],
+                                                rules.get("min_length", DEFAULT_MIN_LENGTH), index_dir)
+                steps.append(DictionaryStep(column, lookup, fuzzy))
+
+        elif ctype == "outlier_capping":
+            steps.append(CappingStep(column, rules.get("method", "iqr_fence")))
+
+    return CleaningPlan(tuple(steps))
+
+
+def _is_missing(value):
+    return value is None or value != value
+
+
+def _fused(value, funcs):
+    if _is_missing(value):
+        return value
+    value = value if type(value) is str else str(value)
+    for func in funcs:
+        value = func(value)
+    return value
+
+
+def _string_pass(values, funcs, validator):
+    """Una sola pasada: transforma y (opcionalmente) valida cada valor (aquí, cada único)."""
+    out = [_fused(v, funcs) for v in values]
+    if validator is None:
+        return out, None
+    match = validator.match
+    valid = np.fromiter((type(v) is str and match(v) is not None for v in out), dtype=bool, count=len(out))
+    return out, valid
+
+
+_NORMALIZE_KEY = (str.strip, str.lower)
+_MISSING_TEXT = "nan"
+
+
+def _lookup_pass(values, lookup, fuzzy=None):
+    """Reemplazo por valor único: primero la tabla exacta y, si hay índice, el canónico más cercano."""
+    out = []
+    for v in values:
+        v = _fused(v, _NORMALIZE_KEY)
+        if type(v) is str:
+            replacement = lookup.get(v)
+            if replacement is None and fuzzy is not None:
+                replacement = fuzzy.match(v)
+            v = v if replacement is None else replacement
+        out.append(v)
+    return out
+
+
+def dictionary_columns(plan):
+    """Columnas de texto del plan: se cargan como categóricas (códigos + únicos)."""
+    return [step.column for step in plan.steps if isinstance(step, (StringStep, DictionaryStep))]
+
+
+def _encode(series):
+    """(códigos int, únicos) de una columna; -1 marca faltantes."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories.to_numpy(dtype=object)
+    codes, uniques = pd.factorize(series.to_numpy(dtype=object))
+    return codes, np.asarray(uniques, dtype=object)
+
+
+def _missing_as_text(codes, uniques):
+    """Faltantes como el texto "nan" (lo que escribía astype(str) en la versión original)."""
+    missing = codes < 0
+    if not missing.any():
+        return codes, uniques
+    return np.where(missing, len(uniques), codes), np.append(uniques, _MISSING_TEXT)
+
+
+def _decode(codes, values):
+    """Re-codifica tras transformar los únicos (varios pueden colapsar en uno)."""
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0:
+        return pd.Categorical.from_codes(codes, categories=[])
+    categories, inverse = np.unique(values, return_inverse=True)
+    new_codes = np.where(codes >= 0, inverse[np.maximum(codes, 0)], -1)
+    return pd.Categorical.from_codes(new_codes, categories=categories)
+
+
+def execute_plan(df, plan, stats):
+    """
+    Ejecuta un CleaningPlan sobre un chunk; `stats` aporta medianas y fences globales.
+
+    Las reglas de texto corren una vez por valor único (codificación por
+    diccionario) y luego se re-mapean o filtran los códigos con numpy: el
+    costo es O(únicos) en Python y O(filas) solo en operaciones vectorizadas.
+    """
+    for step in plan.steps:
+        if step.column not in df.columns:
+            continue
+        with span(f"rule.{step.column}.{_STEP_NAMES[type(step)]}"):
+            df = _execute_step(df, step, stats)
+    return df
+
+
+def _execute_step(df, step, stats):
+    column = step.column
+
+    # --- 1. Missing value imputation ---
+    if isinstance(step, ImputeStep):
+        if step.strategy == "median":
+            fill = stats.get(f"{column}_median")
+            fill = df[column].median() if fill is None else fill
+        elif step.strategy == "mean":
+            fill = stats.get(f"{column}_mean")
+            fill = df[column].mean() if fill is None else fill
+        else:
+            return df
+        if not pd.isna(fill):
+            df[column] = df[column].fillna(impute_value(df[column], fill))
+
+    # --- 2. String normalization / transformation (+ validación) ---
+    elif isinstance(step, StringStep):
+        codes, uniques = _encode(df[column])
+        if step.funcs:
+            codes, uniques = _missing_as_text(codes, uniques)
+        values, valid = _string_pass(uniques, step.funcs, step.validator)
+        df[column] = _decode(codes, values)
+        if valid is not None:
+            # Faltantes (código -1 -> último elemento) no son emails válidos
+            df = df[np.append(valid, False)[codes]]
+
+    # --- 3. Dictionary replace ---
+    elif isinstance(step, DictionaryStep):
+        codes, uniques = _missing_as_text(*_encode(df[column]))
+        df[column] = _decode(codes, _lookup_pass(uniques, step.lookup, step.fuzzy))
+
+    # --- 4. Outlier capping ---
+    elif isinstance(step, CappingStep):
+        if step.method == "iqr_fence" and f"{column}_bounds" in stats:
+            lower, upper = stats[f"{column}_bounds"]
+            df[column] = df[column].clip(lower, upper)
+    return df
@@ -0,0 +1,318 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+
+FORMATS = ("csv", "parquet", "arrow", "npy")
+
+_EXTENSIONS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow", "npy": "_npy"}
+
+
+def default_output_path(output_file, fmt):
+    """Cambia la extensión de la salida por la del formato elegido."""
+    stem, _ = os.path.splitext(output_file)
+    return stem + _EXTENSIONS[fmt]
+
+
+def resolve_output(output_config, output_file, output_format, default_file="clean_cleanstream.csv"):
+    """Ruta y formato de salida: la bandera de CLI tiene prioridad sobre "output" en metadata.json."""
+    output_format = output_format or output_config.get("format", "csv")
+    output_file = output_file or output_config.get("path") or default_output_path(default_file, output_format)
+    return output_file, output_format
+
+
+def _rank(comm):
+    return 0 if comm is None else comm.Get_rank()
+
+
+def _size(comm):
+    return 1 if comm is None else comm.Get_size()
+
+
+def _allgather(comm, obj):
+    return [obj] if comm is None else comm.allgather(obj)
+
+
+def _barrier(comm):
+    if comm is not None:
+        comm.Barrier()
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet/Arrow output requires pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _is_dictionary_column(series):
+    return not (is_numeric_dtype(series.dtype) or is_bool_dtype(series.dtype))
+
+
+# ========================
+# Parquet / Arrow IPC
+# ========================
+
+def _to_arrow_table(df):
+    pa = _require_pyarrow()
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    # Columnas de texto como diccionario (códigos + valores únicos)
+    for i, name in enumerate(table.column_names):
+        column = table.column(i)
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            table = table.set_column(i, name, column.dictionary_encode())
+    return table
+
+
+def _part_path(output_path, comm, ext):
+    if comm is None or _size(comm) == 1:
+        return output_path
+    os.makedirs(output_path, exist_ok=True)
+    return os.path.join(output_path, f"part-{_rank(comm):05d}{ext}")
+
+
+def write_parquet(df, output_path, comm=None):
+    """
+    Escribe Parquet. Con varios ranks, `output_path` es un directorio de dataset
+    con un archivo part-NNNNN.parquet por rank (en orden de archivo).
+    """
+    pa = _require_pyarrow()
+    if comm is not None and _rank(comm) == 0 and _size(comm) > 1:
+        os.makedirs(output_path, exist_ok=True)
+    _barrier(comm)
+    path = _part_path(output_path, comm, ".parquet")
+    pa.parquet.write_table(_to_arrow_table(df), path)
+    return path
+
+
+def write_arrow(df, output_path, comm=None):
+    """
+    Escribe Arrow IPC (formato archivo), legible sin copia con pyarrow.memory_map.
+    Con varios ranks se escribe un part-NNNNN.arrow por rank en un directorio.
+    """
+    pa = _require_pyarrow()
+    if comm is not None and _rank(comm) == 0 and _size(comm) > 1:
+        os.makedirs(output_path, exist_ok=True)
+    _barrier(comm)
+    path = _part_path(output_path, comm, ".arrow")
+    table = _to_arrow_table(df)
+    with pa.OSFile(path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return path
+
+
+def write_arrow_batches(batches, output_path, fmt, comm=None):
+    """
+    Parquet (un row group por lote) o Arrow IPC (un record batch por lote)
+    escritos lote a lote con memoria acotada. Todos los lotes deben tener el
+    mismo esquema (mismas categorías en las columnas categóricas). Con varios
+    ranks, un part-NNNNN por rank en el directorio `output_path`.
+    """
+    pa = _require_pyarrow()
+    if comm is not None and _rank(comm) == 0 and _size(comm) > 1:
+        os.makedirs(output_path, exist_ok=True)
+    _barrier(comm)
+    path = _part_path(output_path, comm, ".parquet" if fmt == "parquet" else ".arrow")
+
+    writer, sink = None, None
+    try:
+        for batch in batches:
+            table = _to_arrow_table(batch)
+            if writer is None:
+                if fmt == "parquet":
+                    writer = pa.parquet.ParquetWriter(path, table.schema)
+                else:
+                    sink = pa.OSFile(path, "wb")
+                    writer = pa.ipc.new_file(sink, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+        if sink is not None:
+            sink.close()
+    return path
+
+
+# ========================
+# Paquete .npy mapeable en memoria
+# ========================
+
+def _numeric_array(series):
+    if series.hasnans and not np.issubdtype(series.dtype, np.floating):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return series.to_numpy()
+
+
+def _dictionary_values(series):
+    """
+    Valores únicos locales (como str) y una función que codifica la columna
+    contra el diccionario global. Las categóricas se remapean por categoría
+    (no por fila): códigos locales -> globales con un take de numpy.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.astype(str)
+        codes = series.cat.codes.to_numpy()
+        uniques = categories[np.unique(codes[codes >= 0])]
+
+        def encode(index):
+            mapping = index.get_indexer(categories)
+            return np.where(codes >= 0, mapping.take(codes, mode="clip"), -1).astype(np.int32)
+        return list(uniques), encode
+
+    missing = series.isna().to_numpy()
+    present = series[~missing].astype(str).to_numpy(dtype=object)
+
+    def encode(index):
+        data = np.full(len(series), -1, dtype=np.int32)
+        data[~missing] = index.get_indexer(present)
+        return data
+    return list(pd.unique(present)), encode
+
+
+def write_npy_bundle(df, output_dir, comm=None):
+    """
+    Escribe un directorio con un .npy por columna más bundle.json.
+
+    Las columnas numéricas se guardan tal cual; las de texto se codifican con un
+    diccionario global (`<col>.categories.npy`, ordenado) y códigos int32
+    (`<col>.codes.npy`, -1 = faltante). Cada rank escribe su tramo directamente
+    en su offset, sin reunir el resultado. Se carga con np.load(mmap_mode="r").
+    """
+    rank = _rank(comm)
+    n_local = len(df)
+    counts = _allgather(comm, n_local)
+    offset = sum(counts[:rank])
+    total = sum(counts)
+
+    if rank == 0:
+        os.makedirs(output_dir, exist_ok=True)
+    _barrier(comm)
+
+    columns = []
+    for column in df.columns:
+        series = df[column]
+        kinds = _allgather(comm, "dict" if _is_dictionary_column(series) else _numeric_array(series).dtype.str)
+
+        if "dict" in kinds:
+            local_uniques, encode = _dictionary_values(series)
+            categories = sorted(set().union(*_allgather(comm, local_uniques)))
+            data = encode(pd.Index(categories))
+            if rank == 0:
+                np.save(os.path.join(output_dir, f"{column}.categories.npy"),
+                        np.array(categories, dtype=str))
+            name = f"{column}.codes.npy"
+            columns.append({"name": column, "encoding": "dictionary", "codes": name,
+                            "categories": f"{column}.categories.npy"})
+        else:
+            dtype = np.result_type(*[np.dtype(k) for k in kinds])
+            data = _numeric_array(series).astype(dtype, copy=False)
+            name = f"{column}.npy"
+            columns.append({"name": column, "encoding": "plain", "data": name, "dtype": dtype.str})
+
+        path = os.path.join(output_dir, name)
+        if rank == 0:
+            np.lib.format.open_memmap(path, mode="w+", dtype=data.dtype, shape=(total,)).flush()
+        _barrier(comm)
+        if n_local:
+            target = np.load(path, mmap_mode="r+")
+            target[offset:offset + n_local] = data
+            target.flush()
+            del target
+
+    _barrier(comm)
+    if rank == 0:
+        with open(os.path.join(output_dir, "bundle.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": total, "columns": columns}, f, indent=4)
+    return output_dir
+
+
+def write_npy_batches(batches, output_dir, prototype, total, offset, comm=None):
+    """
+    Paquete .npy escrito lote a lote cuando el total de filas y el offset de
+    cada rank se conocen de antemano. `prototype` (DataFrame vacío) fija los
+    tipos: columnas categóricas con categorías fijas -> códigos int32, el
+    resto tal cual. Cada lote se copia a su tramo [offset, offset + filas).
+    """
+    rank = _rank(comm)
+    columns, paths = [], {}
+    for column in prototype.columns:
+        dtype = prototype[column].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            name = f"{column}.codes.npy"
+            columns.append({"name": column, "encoding": "dictionary", "codes": name,
+                            "categories": f"{column}.categories.npy"})
+            paths[column] = (name, np.dtype(np.int32))
+        else:
+            name = f"{column}.npy"
+            columns.append({"name": column, "encoding": "plain", "data": name, "dtype": dtype.str})
+            paths[column] = (name, dtype)
+
+    if rank == 0:
+        os.makedirs(output_dir, exist_ok=True)
+        for column, (name, dtype) in paths.items():
+            np.lib.format.open_memmap(os.path.join(output_dir, name), mode="w+", dtype=dtype, shape=(total,)).flush()
+            if isinstance(prototype[column].dtype, pd.CategoricalDtype):
+                categories = prototype[column].cat.categories.to_numpy(dtype=str)
+                np.save(os.path.join(output_dir, f"{column}.categories.npy"), categories)
+    _barrier(comm)
+
+    targets = {c: np.load(os.path.join(output_dir, name), mmap_mode="r+") for c, (name, _) in paths.items()}
+    for batch in batches:
+        for column, target in targets.items():
+            series = batch[column]
+            data = series.cat.codes.to_numpy(dtype=np.int32) if isinstance(series.dtype, pd.CategoricalDtype) \
+                else series.to_numpy()
+            target[offset:offset + len(batch)] = data
+        offset += len(batch)
+    for target in targets.values():
+        target.flush()
+    del targets
+
+    _barrier(comm)
+    if rank == 0:
+        with open(os.path.join(output_dir, "bundle.json"), "w", encoding="utf-8") as f:
+            json.dump({"rows": total, "columns": columns}, f, indent=4)
+    return output_dir
+
+
+def read_npy_bundle(output_dir):
+    """Carga un paquete .npy sin copia (mmap) como dict columna -> arreglo o Categorical."""
+    with open(os.path.join(output_dir, "bundle.json"), "r", encoding="utf-8") as f:
+        bundle = json.load(f)
+    out = {}
+    for col in bundle["columns"]:
+        if col["encoding"] == "dictionary":
+            codes = np.load(os.path.join(output_dir, col["codes"]), mmap_mode="r")
+            categories = np.load(os.path.join(output_dir, col["categories"]))
+            out[col["name"]] = pd.Categorical.from_codes(codes, categories)
+        else:
+            out[col["name"]] = np.load(os.path.join(output_dir, col["data"]), mmap_mode="r")
+    return out
+
+
+def rows_to_frame(rows):
+    """Convierte filas dict de texto (csv.DictReader) a DataFrame con columnas numéricas tipadas."""
+    df = pd.DataFrame(rows)
+    for column in df.columns:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (ValueError, TypeError):
+            pass
+    return df
+
+
+def write_columnar(df, output_path, fmt, comm=None):
+    """Despacha al sink columnar elegido."""
+    if fmt == "parquet":
+        return write_parquet(df, output_path, comm)
+    if fmt == "arrow":
+        return write_arrow(df, output_path, comm)
+    if fmt == "npy":
+        return write_npy_bundle(df, output_path, comm)
+    raise ValueError(f"Unknown columnar format: {fmt}")
@@ -0,0 +1,110 @@
+import hashlib
+import heapq
+import os
+import struct
+import tempfile
+from array import array
+
+# Máximo de huellas en memoria antes de volcar un run ordenado a disco
+DEFAULT_MAX_ENTRIES = 5_000_000
+
+_PAIR = struct.Struct("<Qq")
+_FIELD_SEP = "\x1f"
+
+
+def row_fingerprint(row, key_columns=None):
+    """Calcula una huella estable de 64 bits para una fila (dict) o sus columnas clave."""
+    if key_columns is None:
+        values = row.values()
+    else:
+        values = (row[k] for k in key_columns)
+    data = _FIELD_SEP.join("" if v is None else str(v) for v in values)
+    digest = hashlib.blake2b(data.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+class FingerprintIndex:
+    """
+    Índice de huellas "primera vez vista" con derrame a disco.
+
+    Mientras el índice cabe en el presupuesto, cada fila se resuelve en memoria
+    en una sola pasada. Al superarlo, el contenido se escribe como un run ordenado
+    por (huella, fila) y se empieza un índice nuevo; al final los runs se mezclan
+    (k-way merge) para decidir la primera aparición global de cada huella.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, tmp_dir=None):
+        self.max_entries = max_entries
+        self.tmp_dir = tmp_dir
+        self._first = {}
+        self._duplicates = array("q")
+        self._runs = []
+
+    def add(self, fingerprint, row_idx):
+        """Registra una fila. Las filas deben agregarse en orden creciente de índice."""
+        if fingerprint in self._first:
+            self._duplicates.append(row_idx)
+            return
+        self._first[fingerprint] = row_idx
+        if len(self._first) >= self.max_entries:
+            self._spill()
+
+    def _spill(self):
+        fd, path = tempfile.mkstemp(prefix="dedup_run_", suffix=".bin", dir=self.tmp_dir)
+        with os.fdopen(fd, "wb") as f:
+            for fp in sorted(self._first):
+                f.write(_PAIR.pack(fp, self._first[fp]))
+        self._runs.append(path)
+        self._first = {}
+
+    @staticmethod
+    def _read_run(path, block_pairs=65536):
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(_PAIR.size * block_pairs)
+                if not block:
+                    break
+                yield from _PAIR.iter_unpack(block)
+
+    def duplicates(self):
+        """Devuelve los índices de filas duplicadas (todas menos la primera aparición), ordenados."""
+        if not self._runs:
+            return sorted(self._duplicates)
+
+        if self._first:
+            self._spill()
+
+        # Mezclar runs: dentro de cada huella, la fila con menor índice es la original
+        found = array("q", self._duplicates)
+        prev_fp = None
+        for fp, row_idx in heapq.merge(*(self._read_run(p) for p in self._runs)):
+            if fp == prev_fp:
+                found.append(row_idx)
+            prev_fp = fp
+        self.close()
+        return sorted(found)
+
+    def close(self):
+        for path in self._runs:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._runs = []
+
+    def __len__(self):
+        return len(self._first)
+
+
+def find_duplicates(rows, key_columns=None, max_entries=DEFAULT_MAX_ENTRIES, tmp_dir=None):
+    """
+    Detecta filas duplicadas en una pasada (O(n) esperado en memoria,
+    O(n log n) con runs en disco). Devuelve un set con los índices a eliminar.
+    """
+    index = FingerprintIndex(max_entries=max_entries, tmp_dir=tmp_dir)
+    try:
+        for i, row in enumerate(rows):
+            index.add(row_fingerprint(row, key_columns), i)
+        return set(index.duplicates())
+    finally:
+        index.close()
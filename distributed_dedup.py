@@ -0,0 +1,93 @@
+import numpy as np
+
+
+def _displacements(counts):
+    displs = np.zeros_like(counts)
+    np.cumsum(counts[:-1], out=displs[1:])
+    return displs
+
+
+def _exchange(comm, sendbuf, send_counts, recv_counts):
+    """Alltoallv sobre buffers numpy contiguos (sin pickle)."""
+    recvbuf = np.empty(int(recv_counts.sum()), dtype=sendbuf.dtype)
+    comm.Alltoallv(
+        [sendbuf, (send_counts, _displacements(send_counts))],
+        [recvbuf, (recv_counts, _displacements(recv_counts))],
+    )
+    return recvbuf
+
+
+def resolve_first_occurrence(fingerprints, row_numbers):
+    """
+    Marca como duplicada toda fila cuya huella ya apareció en una fila anterior
+    (menor número de fila global). Devuelve un arreglo bool alineado a la entrada.
+    """
+    order = np.lexsort((row_numbers, fingerprints))
+    sorted_fps = fingerprints[order]
+    dup_sorted = np.zeros(len(order), dtype=bool)
+    dup_sorted[1:] = sorted_fps[1:] == sorted_fps[:-1]
+    dup = np.empty(len(order), dtype=bool)
+    dup[order] = dup_sorted
+    return dup
+
+
+def _shuffle_resolve(comm, fingerprints, row_numbers, resolve):
+    """
+    Envía cada huella de 64 bits a su rank dueño (`huella % size`) junto con
+    su número de fila global (Alltoallv); el dueño decide con
+    `resolve(huellas, filas) -> banderas` y las banderas vuelven por el
+    camino inverso. Devuelve la máscara alineada a las filas locales.
+    """
+    size = comm.Get_size()
+    fingerprints = np.ascontiguousarray(fingerprints, dtype=np.uint64)
+    row_numbers = np.ascontiguousarray(row_numbers, dtype=np.int64)
+
+    owner = (fingerprints % np.uint64(size)).astype(np.intp)
+    order = np.argsort(owner, kind="stable")
+    send_counts = np.bincount(owner, minlength=size).astype(np.int64)
+    recv_counts = np.empty(size, dtype=np.int64)
+    comm.Alltoall(send_counts, recv_counts)
+
+    recv_fps = _exchange(comm, fingerprints[order], send_counts, recv_counts)
+    recv_rows = _exchange(comm, row_numbers[order], send_counts, recv_counts)
+
+    # El dueño decide y devuelve las banderas por el camino inverso
+    flags = resolve(recv_fps, recv_rows).view(np.uint8)
+    back = _exchange(comm, flags, recv_counts, send_counts)
+
+    mask = np.empty(len(fingerprints), dtype=bool)
+    mask[order] = back.view(bool)
+    return mask
+
+
+def global_duplicate_mask(comm, fingerprints, row_numbers):
+    """
+    Deduplicación global particionada por hash.
+
+    Cada huella de 64 bits se envía a su rank dueño (`huella % size`) junto con
+    su número de fila global mediante Alltoallv. El dueño resuelve la primera
+    aparición y devuelve solo las banderas de descarte de las filas de cada rank.
+    Devuelve un arreglo bool alineado a las filas locales (True = eliminar).
+    """
+    return _shuffle_resolve(comm, fingerprints, row_numbers, resolve_first_occurrence)
+
+
+def incremental_duplicate_mask(comm, fingerprints, row_numbers, seen):
+    """
+    Como global_duplicate_mask, pero además descarta las huellas que ya están
+    en `seen` (índice ordenado de huellas de corridas anteriores cuyo dueño es
+    este rank). Devuelve (máscara, índice `seen` actualizado con las nuevas).
+    """
+    seen = np.asarray(seen, dtype=np.uint64)
+    added = []
+
+    def resolve(fps, rows):
+        dup = resolve_first_occurrence(fps, rows)
+        if len(seen):
+            pos = np.minimum(np.searchsorted(seen, fps), len(seen) - 1)
+            dup |= seen[pos] == fps
+        added.append(fps[~dup])
+        return dup
+
+    mask = _shuffle_resolve(comm, fingerprints, row_numbers, resolve)
+    return mask, np.union1d(seen, added[0])
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_bool_dtype, is_numeric_dtype
+from pandas.util import hash_array
+
+# Clave fija de SipHash: las huellas son idénticas en todos los procesos,
+# a diferencia de hash() de Python, que se aleatoriza por proceso para strings.
+HASH_KEY = "0123456789123456"
+
+_SEED = np.uint64(0x345678)
+_MULT = 1000003
+
+
+def column_hashes(series):
+    """
+    Hash uint64 vectorizado de una columna.
+
+    Las columnas numéricas se normalizan a float64 (42 y 42.0 producen la misma
+    huella aunque un rank haya inferido int64 y otro float64), y las de texto se
+    hashean por su representación str ("nan" para faltantes).
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories.to_numpy(dtype=object).astype(str)
+        table = hash_array(np.append(categories, "nan").astype(object), hash_key=HASH_KEY)
+        codes = series.cat.codes.to_numpy()
+        return table[np.where(codes < 0, len(categories), codes)]
+
+    if is_numeric_dtype(series.dtype) and not is_bool_dtype(series.dtype):
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        # -0.0 -> 0.0 y NaN canónico
+        values = np.where(np.isnan(values), np.nan, values + 0.0)
+        return hash_array(values, hash_key=HASH_KEY)
+
+    values = series.to_numpy(dtype=object)
+    values = np.where(pd.isna(values), "nan", values).astype(str).astype(object)
+    return hash_array(values, hash_key=HASH_KEY)
+
+
+def chunk_fingerprints(df, columns=None):
+    """
+    Huellas de 64 bits de todas las filas de un chunk, calculadas en bloque por
+    columnas. Devuelve un arreglo uint64 alineado a las filas del DataFrame.
+    """
+    columns = list(df.columns) if columns is None else list(columns)
+    out = np.full(len(df), _SEED, dtype=np.uint64)
+    mult = _MULT
+    for i, column in enumerate(columns):
+        out ^= column_hashes(df[column])
+        out *= np.uint64(mult)
+        mult = (mult + 82520 + 2 * (len(columns) - i)) & 0xFFFFFFFFFFFFFFFF
+    return out
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from typing import NamedTuple
+
+INDEX_VERSION = 1
+
+# Valores más cortos que esto solo se reemplazan por coincidencia exacta: con
+# distancia 2, "gt" quedaría a la misma distancia de casi cualquier sigla
+DEFAULT_MIN_LENGTH = 4
+
+
+def edit_distance(a, b):
+    """
+    Distancia de Levenshtein (inserción, borrado y sustitución cuestan 1).
+    Algoritmo bit-paralelo de Myers/Hyyrö: una columna de la matriz por
+    carácter de `b` con operaciones sobre enteros, O(len(b)) en Python.
+    """
+    if a == b:
+        return 0
+    if not a or not b:
+        return len(a) + len(b)
+    peq = {}
+    for i, c in enumerate(a):
+        peq[c] = peq.get(c, 0) | (1 << i)
+    high = 1 << (len(a) - 1)
+    mask = (1 << len(a)) - 1
+    pv, mv, score = mask, 0, len(a)
+    for c in b:
+        eq = peq.get(c, 0)
+        xv = eq | mv
+        xh = ((((eq & pv) + pv) & mask) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        ph = ((ph << 1) | 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+    return score
+
+
+def _bigrams(word):
+    """Bigramas distintos de la palabra con bordes ("^a", "ab", ..., "z$")."""
+    padded = f"^{word}$"
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+class FuzzyIndex(NamedTuple):
+    """
+    Índice invertido de bigramas sobre las claves normalizadas del
+    diccionario (variantes y nombres canónicos). Cada edición destruye a lo
+    sumo dos bigramas distintos, así que una palabra a distancia <= k
+    comparte al menos |bigramas(valor)| - 2k con el valor: solo esas
+    candidatas (y de longitud compatible) se verifican con edit_distance.
+    `memo` guarda el resultado de cada valor ya consultado en este proceso
+    (un valor que se repite en muchos chunks se busca una sola vez).
+    """
+    words: list
+    canonical: list
+    postings: dict
+    by_length: dict
+    max_distance: int
+    min_length: int
+    memo: dict
+
+    def _candidates(self, key):
+        k = self.max_distance
+        lengths = range(len(key) - k, len(key) + k + 1)
+        grams = _bigrams(key)
+        threshold = len(grams) - 2 * k
+        if threshold <= 0:
+            return [i for n in lengths for i in self.by_length.get(n, ())]
+        counts = Counter()
+        for gram in grams:
+            counts.update(self.postings.get(gram, ()))
+        return [i for i, shared in counts.items() if shared >= threshold and len(self.words[i]) in lengths]
+
+    def match(self, key):
+        """Valor canónico de `key` (ya normalizada) o None si no hay uno único a distancia <= max_distance."""
+        if key in self.memo:
+            return self.memo[key]
+        result = None
+        if len(key) >= self.min_length:
+            best, found = self.max_distance + 1, set()
+            for i in self._candidates(key):
+                d = edit_distance(key, self.words[i])
+                if d < best:
+                    best, found = d, set()
+                if d == best:
+                    found.add(self.canonical[i])
+            # Empate entre valores canónicos distintos: ambiguo, no se reemplaza
+            if best <= self.max_distance and len(found) == 1:
+                result = found.pop()
+        self.memo[key] = result
+        return result
+
+
+def _index_keys(replace_map, mapping):
+    """Claves del índice: las del reemplazo exacto más cada nombre canónico normalizado."""
+    keys = dict(replace_map)
+    for canonical in mapping:
+        keys.setdefault(canonical.strip().lower(), canonical)
+    # Orden fijo: el índice (y el archivo en disco) no dependen del orden del JSON
+    words = sorted(keys)
+    return words, [keys[w] for w in words]
+
+
+def _build_postings(words):
+    postings, by_length = {}, {}
+    for i, word in enumerate(words):
+        for gram in _bigrams(word):
+            postings.setdefault(gram, []).append(i)
+        by_length.setdefault(len(word), []).append(i)
+    return postings, by_length
+
+
+def _digest(mapping):
+    blob = json.dumps([INDEX_VERSION, mapping], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def index_path(index_dir, dict_name):
+    return os.path.join(index_dir, f"{dict_name}.fuzzy.json")
+
+
+def load_or_build_index(dict_name, mapping, replace_map, max_distance, min_length=DEFAULT_MIN_LENGTH,
+                        index_dir=None):
+    """
+    FuzzyIndex del diccionario `dict_name`. El índice no depende de la
+    distancia máxima, así que se guarda una vez en `<index_dir>/<nombre>.fuzzy.json`
+    (junto a metadata.json) con el hash del diccionario; si el diccionario
+    cambia se reconstruye. Sin index_dir se construye solo en memoria.
+    """
+    digest = _digest(mapping)
+    path = index_path(index_dir, dict_name) if index_dir is not None else None
+    if path is not None and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            stored = json.load(f)
+        if stored.get("digest") == digest:
+            # JSON solo tiene claves de texto
+            by_length = {int(n): ids for n, ids in stored["by_length"].items()}
+            return FuzzyIndex(stored["words"], stored["canonical"], stored["postings"], by_length, max_distance,
+                              min_length, {})
+
+    words, canonical = _index_keys(replace_map, mapping)
+    postings, by_length = _build_postings(words)
+    if path is not None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"digest": digest, "words": words, "canonical": canonical, "postings": postings,
+                       "by_length": by_length}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    return FuzzyIndex(words, canonical, postings, by_length, max_distance, min_length, {})
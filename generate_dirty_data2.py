@@ -54,6 +54,16 @@ if __name__ == '__main__':
                 "Estados Unidos": ["USA", "US", "Estados", "Gringolandia"],
                 "Mexico": ["MX", "Mejico"]
             }
+        },
+        "output": {"format": "csv"},
+        # Tipos compactos de almacenamiento (los respetan todos los loaders)
+        "schema": {
+            "id": {"dtype": "int64", "strip_suffix": "_dup"},
+            "name": {"dtype": "category"},
+            "age": {"dtype": "UInt8"},
+            "email": {"dtype": "category"},
+            "country": {"dtype": "category"},
+            "salary": {"dtype": "float32"}
         }
     }
     with open('metadata.json', 'w') as f:
@@ -0,0 +1,204 @@
+import argparse
+import json
+import math
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from columnar_output import FORMATS, write_arrow_batches, write_npy_batches
+from local_backend import row_range, run_local
+from output_writer import write_csv_rounds, write_csv_shard_batches
+
+DEFAULT_SEED = 16
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Mismas proporciones y pools que generate_dirty_data2.py; se pueden
+# sobrescribir con --config (JSON con cualquier subconjunto de estas claves)
+DEFAULT_CONFIG = {
+    "duplicate_rate": 0.10,
+    "outlier_rate": 0.01,
+    "missing_age_rate": 0.15,
+    "age_range": [18, 80],
+    "salary_mean": 50000.0,
+    "salary_std": 20000.0,
+    "outlier_values": [0, -5000, 5000000],
+    "names": ["Juan Perez", "MARIA LOPEZ", "pedro gomez", "Ana Silva", "   Carlos Ruiz   ", "Luis García"],
+    "emails": ["juan@gmail.com", "MARIA@YAHOO.COM", "pedro@", "ana@hotmail.com", "invalido-email"],
+    "countries": ["Guatemala", "Gutemala", "GT", "guatemala", "USA", "US", "Gringolandia", "Mexico", "Mejico"],
+}
+
+# Un flujo aleatorio independiente por atributo de la fila
+_NAME, _AGE, _EMAIL, _COUNTRY, _SALARY_U1, _SALARY_U2, _OUTLIER, _OUTLIER_VALUE, _PERMUTATION = range(9)
+
+
+# ========================
+# Aleatoriedad por fila (counter-based)
+# ========================
+
+def _mix(x):
+    """Finalizador de splitmix64 (uint64, con desborde modular)."""
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return x ^ (x >> np.uint64(31))
+
+
+def _uniform(seed, rows, stream):
+    """
+    Uniforme en (0, 1) que depende solo de (semilla, fila, flujo): cualquier
+    worker puede generar cualquier fila, así la salida no depende ni del
+    número de workers ni del tamaño de chunk.
+    """
+    with np.errstate(over="ignore"):
+        key = _mix(np.uint64(seed) * np.uint64(0x9E3779B97F4A7C15) + np.uint64(stream))
+        x = _mix(rows.astype(np.uint64) * np.uint64(0xD1B54A32D192ED03) ^ key)
+    return ((x >> np.uint64(11)).astype(np.float64) + 0.5) * 2.0 ** -53
+
+
+def _pick(u, pool):
+    return np.minimum((u * len(pool)).astype(np.int64), len(pool) - 1)
+
+
+def _categorical(codes, pool):
+    """Categórica con categorías ordenadas y únicas (el pool puede repetir valores)."""
+    categories = sorted(set(pool))
+    lookup = np.array([categories.index(v) for v in pool], dtype=np.int32)
+    return pd.Categorical.from_codes(lookup[codes], categories)
+
+
+def _duplicate_sources(k, n_rows, seed):
+    """
+    Fila base de la k-ésima copia: permutación afín (a*k + b) mod n_rows con
+    a coprimo con n_rows, así ninguna fila se duplica dos veces.
+    """
+    a = int(_mix(np.uint64(seed) + np.uint64(_PERMUTATION))) % n_rows or 1
+    while math.gcd(a, n_rows) != 1:
+        a += 1
+    b = int(_mix(np.uint64(seed) ^ np.uint64(_PERMUTATION))) % n_rows
+    return (np.uint64(a) * k.astype(np.uint64) + np.uint64(b)) % np.uint64(n_rows)
+
+
+def total_rows(n_rows, config):
+    return n_rows + int(n_rows * config["duplicate_rate"])
+
+
+def generate_chunk(start, stop, n_rows, seed=DEFAULT_SEED, config=DEFAULT_CONFIG):
+    """
+    Filas globales [start, stop) del dataset. Las primeras `n_rows` son filas
+    base; las siguientes son copias de filas base (como el pd.concat de
+    generate_dirty_data2.py). Los outliers de salary se deciden por fila
+    global, también en las copias.
+    """
+    rows = np.arange(start, stop, dtype=np.int64)
+    base = rows.copy()
+    copies = rows >= n_rows
+    if copies.any():
+        base[copies] = _duplicate_sources(rows[copies] - n_rows, n_rows, seed).astype(np.int64)
+
+    lo, hi = config["age_range"]
+    u = _uniform(seed, base, _AGE)
+    p = config["missing_age_rate"]
+    age = np.where(u < p, np.nan, lo + np.floor((u - p) / (1 - p) * (hi - lo)))
+
+    # Box-Muller con dos flujos independientes
+    u1, u2 = _uniform(seed, base, _SALARY_U1), _uniform(seed, base, _SALARY_U2)
+    salary = config["salary_mean"] + config["salary_std"] * np.sqrt(-2 * np.log(u1)) * np.cos(2 * np.pi * u2)
+    outliers = _uniform(seed, rows, _OUTLIER) < config["outlier_rate"]
+    values = np.asarray(config["outlier_values"], dtype=np.float64)
+    salary[outliers] = values[_pick(_uniform(seed, rows[outliers], _OUTLIER_VALUE), values)]
+
+    return pd.DataFrame({
+        "id": base,
+        "name": _categorical(_pick(_uniform(seed, base, _NAME), config["names"]), config["names"]),
+        "age": age,
+        "email": _categorical(_pick(_uniform(seed, base, _EMAIL), config["emails"]), config["emails"]),
+        "country": _categorical(_pick(_uniform(seed, base, _COUNTRY), config["countries"]), config["countries"]),
+        "salary": salary,
+    })
+
+
+def chunk_bounds(total, chunk_rows):
+    """Rangos [start, stop) de filas de cada chunk (al menos uno, aunque esté vacío)."""
+    return [(s, min(s + chunk_rows, total)) for s in range(0, total, chunk_rows)] or [(0, 0)]
+
+
+# ========================
+# Escritura por rank
+# ========================
+
+def generate(comm, n_rows, output_file, fmt="csv", shards=False, chunk_rows=DEFAULT_CHUNK_ROWS, seed=DEFAULT_SEED,
+             config=DEFAULT_CONFIG):
+    """
+    Genera el dataset por chunks en todos los ranks de `comm`. CSV en un solo
+    archivo: chunks en round-robin y offsets por ronda (write_csv_rounds).
+    Shards y formatos columnares: un tramo contiguo de chunks por rank, en
+    orden de archivo; el paquete .npy escribe en offsets de fila ya conocidos.
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    start_time = time.time()
+    total = total_rows(n_rows, config)
+    chunks = chunk_bounds(total, chunk_rows)
+    if rank == 0:
+        print(f"Generating {total:,} rows ({n_rows:,} + {total - n_rows:,} duplicates) "
+              f"in {len(chunks):,} chunks on {size} workers -> {output_file} ({fmt})")
+
+    if fmt == "csv" and not shards:
+        mine = chunks[rank::size]
+    else:
+        lo, hi = row_range(len(chunks), rank, size)
+        mine = chunks[lo:hi]
+    batches = (generate_chunk(start, stop, n_rows, seed, config) for start, stop in mine)
+
+    if fmt == "csv":
+        if shards:
+            write_csv_shard_batches(comm, batches, os.path.splitext(output_file)[0])
+        else:
+            write_csv_rounds(comm, batches, output_file)
+    elif fmt == "npy":
+        offset = mine[0][0] if mine else total
+        write_npy_batches(batches, output_file, generate_chunk(0, 0, n_rows, seed, config), total, offset, comm)
+    else:
+        write_arrow_batches(batches, output_file, fmt, comm)
+
+    comm.Barrier()
+    if rank == 0:
+        elapsed = time.time() - start_time
+        print(f"  Generated dataset: {output_file}")
+        print(f"  Total rows: {total:,} in {elapsed:.2f}s ({total / max(elapsed, 1e-9):,.0f} rows/s)")
+        return elapsed
+
+
+def load_config(path):
+    """DEFAULT_CONFIG con las claves de un JSON opcional encima."""
+    config = dict(DEFAULT_CONFIG)
+    if path is not None:
+        with open(path, "r", encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel deterministic dirty-data generator")
+    parser.add_argument("n_rows", type=int, nargs="?", default=10_000_000, help="base rows (before duplicates)")
+    parser.add_argument("output_file", nargs="?", default="dirty_data.csv")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--shards", action="store_true",
+                        help="csv: one file per rank plus a manifest instead of a single file")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--config", default=None,
+                        help="JSON overriding rates and value pools (keys of DEFAULT_CONFIG)")
+    parser.add_argument("--backend", choices=("mpi", "local"), default="local",
+                        help="local: process pool on this node; mpi: run under mpirun")
+    parser.add_argument("--workers", type=int, default=None, help="processes for --backend local (default: CPU count)")
+    args = parser.parse_args()
+
+    config = load_config(args.config)
+    gen_args = (args.n_rows, args.output_file, args.format, args.shards, args.chunk_rows, args.seed, config)
+    if args.backend == "mpi":
+        from mpi4py import MPI
+        generate(MPI.COMM_WORLD, *gen_args)
+    else:
+        run_local(generate, args.workers or os.cpu_count() or 1, *gen_args)
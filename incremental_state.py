@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from partitioned_reader import read_header
+
+STATE_VERSION = 1
+STATE_FILE = "state.json"
+TOTALS_FILE = "totals.npy"
+
+# Cambio relativo máximo de una estadística aplicada (mediana, fences) antes
+# de forzar un recálculo completo
+DEFAULT_MAX_DRIFT = 0.05
+
+# Bytes antes del offset procesado que se verifican para detectar que el
+# archivo no solo creció (fue reescrito o truncado)
+_CHECK_BYTES = 4096
+
+
+def config_hash(cleaning_config, dictionaries, schema):
+    """Hash de todo lo que cambia el resultado; si difiere, el estado guardado no sirve."""
+    blob = json.dumps([cleaning_config, dictionaries, schema], sort_keys=True, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def range_digest(path, start, end):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        h.update(f.read(max(0, end - start)))
+    return h.hexdigest()
+
+
+def complete_end(input_file):
+    """Fin de la última línea completa: una línea a medio agregar queda para la próxima corrida."""
+    size = os.path.getsize(input_file)
+    with open(input_file, "rb") as f:
+        pos = size
+        while pos > 0:
+            step = min(1 << 16, pos)
+            f.seek(pos - step)
+            block = f.read(step)
+            i = block.rfind(b"\n")
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+    return 0
+
+
+def _fingerprint_path(state_dir, rank):
+    return os.path.join(state_dir, f"fingerprints_{rank}.npy")
+
+
+def _replace_npy(path, array):
+    tmp = path + ".tmp.npy"
+    np.save(tmp, array)
+    os.replace(tmp, path)
+
+
+def load_state(state_dir, input_file, output_file, digest):
+    """
+    (estado, motivo). El estado es None si no existe o ya no describe este
+    archivo: otra configuración, otra salida, o el prefijo ya procesado cambió.
+    """
+    path = os.path.join(state_dir, STATE_FILE)
+    if not os.path.exists(path):
+        return None, "no previous state"
+    with open(path, "r", encoding="utf-8") as f:
+        state = json.load(f)
+
+    if state.get("version") != STATE_VERSION or state.get("config_hash") != digest:
+        return None, "cleaning config or schema changed"
+    if os.path.abspath(output_file) != state["output"] or not os.path.exists(output_file) \
+            or os.path.getsize(output_file) != state["output_bytes"]:
+        return None, "output file changed"
+    offset = state["offset"]
+    if os.path.getsize(input_file) < offset \
+            or range_digest(input_file, 0, state["header_bytes"]) != state["header_digest"] \
+            or range_digest(input_file, max(state["header_bytes"], offset - _CHECK_BYTES), offset) != state["tail_digest"]:
+        return None, "input was modified, not appended to"
+    return state, None
+
+
+def load_totals(state_dir):
+    return np.load(os.path.join(state_dir, TOTALS_FILE))
+
+
+def load_seen(comm, state_dir, ranks):
+    """
+    Índice de huellas (ordenado) que le toca a este rank (`huella % size`).
+    Si cambió el número de ranks se redistribuye leyendo todos los shards.
+    """
+    rank, size = comm.Get_rank(), comm.Get_size()
+    if ranks == size:
+        return np.load(_fingerprint_path(state_dir, rank))
+    parts = [np.load(_fingerprint_path(state_dir, r)) for r in range(ranks)]
+    seen = np.concatenate(parts) if parts else np.empty(0, dtype=np.uint64)
+    return np.sort(seen[seen % np.uint64(size) == np.uint64(rank)])
+
+
+def save_state(comm, state_dir, state, totals, seen, previous_ranks=0):
+    """
+    Cada rank guarda su shard del índice de huellas; rank 0 guarda los
+    totales y por último state.json, que es el punto de confirmación: si la
+    corrida se interrumpe antes, la próxima ve el estado anterior completo.
+    """
+    rank = comm.Get_rank()
+    if rank == 0:
+        os.makedirs(state_dir, exist_ok=True)
+    comm.Barrier()
+    _replace_npy(_fingerprint_path(state_dir, rank), np.asarray(seen, dtype=np.uint64))
+    comm.Barrier()
+    if rank == 0:
+        _replace_npy(os.path.join(state_dir, TOTALS_FILE), totals)
+        tmp = os.path.join(state_dir, STATE_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=4)
+        os.replace(tmp, os.path.join(state_dir, STATE_FILE))
+        # Shards sobrantes de una corrida anterior con más ranks
+        for stale in range(comm.Get_size(), previous_ranks):
+            if os.path.exists(_fingerprint_path(state_dir, stale)):
+                os.remove(_fingerprint_path(state_dir, stale))
+
+
+def build_state(input_file, output_file, digest, offset, rows, output_rows, applied_stats, ranks):
+    header_bytes = len(read_header(input_file))
+    return {
+        "version": STATE_VERSION,
+        "input": os.path.abspath(input_file),
+        "output": os.path.abspath(output_file),
+        "config_hash": digest,
+        "header_bytes": header_bytes,
+        "header_digest": range_digest(input_file, 0, header_bytes),
+        "offset": offset,
+        "tail_digest": range_digest(input_file, max(header_bytes, offset - _CHECK_BYTES), offset),
+        "rows": rows,
+        "output_rows": output_rows,
+        "output_bytes": os.path.getsize(output_file),
+        "ranks": ranks,
+        "applied_stats": applied_stats,
+    }
+
+
+def stat_drift(applied, current):
+    """
+    Cambio relativo de cada estadística aplicada respecto de la actual:
+    medianas/medias relativas a su valor y fences relativos al ancho [lo, hi].
+    Una estadística nueva (sin valor aplicado) cuenta como deriva infinita.
+    """
+    drift = {}
+    for key, value in current.items():
+        old = applied.get(key)
+        if old is None:
+            drift[key] = float("inf")
+        elif key.endswith("_bounds"):
+            width = max(abs(old[1] - old[0]), 1e-12)
+            drift[key] = max(abs(value[0] - old[0]), abs(value[1] - old[1])) / width
+        else:
+            drift[key] = abs(value - old) / max(abs(old), 1e-12)
+    return drift
@@ -0,0 +1,240 @@
+import json
+import os
+import pickle
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from local_backend import LocalComm
+
+REPORT_VERSION = 1
+
+# Colectivas que se miden al instrumentar un comunicador (las que existan en su clase)
+_PICKLE_COLLECTIVES = ("allgather", "bcast", "gather", "scatter", "allreduce", "reduce", "exscan", "scan", "alltoall")
+_BUFFER_COLLECTIVES = ("Allreduce", "Iallreduce", "Alltoall", "Alltoallv", "Allgather", "Allgatherv", "Bcast",
+                       "Reduce", "Barrier")
+
+# Registro activo de este proceso; None = instrumentación apagada (span() no cuesta nada)
+_active = None
+
+
+class Recorder:
+    """
+    Tiempos por fase de un rank: segundos, llamadas, bytes enviados/recibidos
+    (colectivas) y filas. Los tramos pueden anidarse y sus tiempos son
+    inclusivos: "dedup" incluye el "mpi.Alltoallv" que corre adentro.
+    """
+
+    def __init__(self, rank):
+        self.rank = rank
+        self.start = time.perf_counter()
+        self.phases = {}
+        self.rows = 0
+        self.notes = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add(self, name, seconds, sent=0, received=0):
+        with self._lock:
+            phase = self.phases.setdefault(name, {"seconds": 0.0, "calls": 0, "bytes_sent": 0, "bytes_received": 0})
+            phase["seconds"] += seconds
+            phase["calls"] += 1
+            phase["bytes_sent"] += sent
+            phase["bytes_received"] += received
+
+
+@contextmanager
+def span(name):
+    """Mide el bloque como fase `name` del rank (sin efecto si la instrumentación está apagada)."""
+    recorder = _active
+    if recorder is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, time.perf_counter() - start)
+
+
+def record_stages(prefix, timings):
+    """Tiempo ocupado de cada etapa de pipeline.run_pipeline como fase "<prefix>.<etapa>"."""
+    if _active is not None:
+        for stage, timer in timings.items():
+            if timer["items"]:
+                _active.add(f"{prefix}.{stage}", timer["busy"])
+
+
+def count_rows(rows):
+    """Filas que procesa este rank (para filas/s)."""
+    if _active is not None:
+        _active.rows += rows
+
+
+def note(**values):
+    """Valores de la corrida (conteos globales, archivos) que van al resumen del reporte."""
+    if _active is not None:
+        _active.notes.update(values)
+
+
+def peak_rss_bytes():
+    # ru_maxrss está en KiB en Linux (en bytes en macOS)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+# ========================
+# Comunicador instrumentado
+# ========================
+
+def _pickled_size(obj):
+    try:
+        return len(pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return 0
+
+
+def _buffer_size(spec):
+    if isinstance(spec, (list, tuple)) and spec:
+        spec = spec[0]
+    return getattr(spec, "nbytes", 0)
+
+
+def _measured(name, method, buffered):
+    def wrapper(self, *args, **kwargs):
+        recorder = _active
+        # Las colectivas de LocalComm se apoyan en otras (allreduce -> allgather): solo cuenta la externa
+        if recorder is None or getattr(recorder._local, "depth", 0):
+            return method(self, *args, **kwargs)
+        recorder._local.depth = 1
+        start = time.perf_counter()
+        try:
+            result = method(self, *args, **kwargs)
+        finally:
+            recorder._local.depth = 0
+        seconds = time.perf_counter() - start
+        if buffered:
+            sent = _buffer_size(args[0]) if args else 0
+            received = _buffer_size(args[1]) if len(args) > 1 else 0
+        else:
+            sent = _pickled_size(args[0]) if args else 0
+            received = _pickled_size(result)
+        recorder.add(f"mpi.{name}", seconds, sent, received)
+        return result
+    wrapper.__name__ = name
+    return wrapper
+
+
+_classes = {}
+
+
+def _instrumented_class(base):
+    if base not in _classes:
+        methods = {}
+        for names, buffered in ((_PICKLE_COLLECTIVES, False), (_BUFFER_COLLECTIVES, True)):
+            for name in names:
+                if hasattr(base, name):
+                    methods[name] = _measured(name, getattr(base, name), buffered)
+        _classes[base] = type(f"Instrumented{base.__name__}", (base,), methods)
+    return _classes[base]
+
+
+def instrument(comm):
+    """
+    Mismo comunicador como subclase de su propia clase (MPI.Intracomm o
+    LocalComm), así sigue sirviendo para MPI.File, ventanas RMA e isinstance.
+    Con la instrumentación activa cada colectiva se registra como fase
+    "mpi.<nombre>" con su tiempo y los bytes enviados/recibidos (buffers:
+    nbytes; objetos: tamaño del pickle).
+    """
+    cls = _instrumented_class(type(comm))
+    if isinstance(comm, LocalComm):
+        out = cls.__new__(cls)
+        out.__dict__.update(comm.__dict__)
+        return out
+    return cls(comm)
+
+
+def enable(comm):
+    """Activa la instrumentación en este proceso y devuelve el comunicador instrumentado."""
+    global _active
+    _active = Recorder(comm.Get_rank())
+    return instrument(comm)
+
+
+# ========================
+# Reporte estructurado
+# ========================
+
+def _phase_summary(parts):
+    phases = {}
+    for name in sorted({name for part in parts for name in part["phases"]}):
+        seconds = [part["phases"].get(name, {}).get("seconds", 0.0) for part in parts]
+        mean = sum(seconds) / len(seconds)
+        phases[name] = {
+            "max": max(seconds),
+            "mean": mean,
+            "min": min(seconds),
+            # Desbalance de carga: 1.0 = todos los ranks tardan lo mismo
+            "imbalance": max(seconds) / mean if mean > 0 else 1.0,
+            "straggler": seconds.index(max(seconds)),
+            "seconds": seconds,
+            "calls": [part["phases"].get(name, {}).get("calls", 0) for part in parts],
+            "bytes_sent": [part["phases"].get(name, {}).get("bytes_sent", 0) for part in parts],
+            "bytes_received": [part["phases"].get(name, {}).get("bytes_received", 0) for part in parts],
+        }
+    return phases
+
+
+def write_report(comm, report_file, **meta):
+    """
+    Reúne en rank 0 lo registrado por cada rank y escribe un único JSON:
+    resumen de la corrida, fases (max/mean/min por rank, desbalance max/mean
+    y rank más lento) y por rank: tiempo total, filas/s, pico de RSS y bytes.
+    Reemplaza al clean_report.txt de texto libre.
+    """
+    global _active
+    recorder = _active
+    elapsed = time.perf_counter() - recorder.start
+    sent = sum(p["bytes_sent"] for n, p in recorder.phases.items() if n.startswith("mpi."))
+    received = sum(p["bytes_received"] for n, p in recorder.phases.items() if n.startswith("mpi."))
+    mine = {
+        "rank": recorder.rank,
+        "host": os.uname().nodename,
+        "elapsed": elapsed,
+        "rows": recorder.rows,
+        "rows_per_s": recorder.rows / elapsed if elapsed > 0 else 0.0,
+        "peak_rss_bytes": peak_rss_bytes(),
+        "bytes_sent": sent,
+        "bytes_received": received,
+        "phases": recorder.phases,
+    }
+    notes = recorder.notes
+    # El gather del reporte ya no se registra
+    _active = None
+    parts = comm.gather(mine, root=0)
+    if comm.Get_rank() != 0:
+        return None
+
+    phases = _phase_summary(parts)
+    report = {
+        "version": REPORT_VERSION,
+        "finished": datetime.now().isoformat(timespec="seconds"),
+        "ranks": len(parts),
+        "elapsed": max(p["elapsed"] for p in parts),
+        "summary": {**meta, **notes},
+        "phases": phases,
+        "per_rank": [{k: v for k, v in p.items() if k != "phases"} for p in parts],
+    }
+    os.makedirs(os.path.dirname(report_file) or ".", exist_ok=True)
+    with open(report_file, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, default=str)
+
+    print(f"\n Run report: {report_file}")
+    print(f"   {'phase':<28} {'max':>9} {'mean':>9} {'imbalance':>10} {'straggler':>10}")
+    for name, phase in sorted(phases.items(), key=lambda kv: -kv[1]["max"])[:12]:
+        print(f"   {name:<28} {phase['max']:>8.3f}s {phase['mean']:>8.3f}s {phase['imbalance']:>9.2f}x "
+              f"{phase['straggler']:>10}")
+    return report
@@ -0,0 +1,255 @@
+import multiprocessing as mp
+import os
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import ExtensionDtype
+
+
+def _sum(a, b):
+    return a + b
+
+
+# ========================
+# Comunicador local (misma interfaz que mpi4py)
+# ========================
+
+class LocalComm:
+    """
+    Comunicador entre procesos de un mismo nodo con la parte de la interfaz de
+    mpi4py que usa el pipeline: colectivas en minúscula (objetos con pickle) y
+    Allreduce / Alltoall / Alltoallv sobre buffers numpy. Cada par de procesos
+    comparte un Pipe; `op` es cualquier función binaria (por defecto, suma).
+    """
+
+    def __init__(self, rank, size, conns):
+        self.rank = rank
+        self.size = size
+        self._conns = conns
+
+    def Get_rank(self):
+        return self.rank
+
+    def Get_size(self):
+        return self.size
+
+    def _send_all(self, outgoing):
+        for peer in sorted(self._conns):
+            self._conns[peer].send(outgoing[peer])
+
+    def _exchange(self, outgoing):
+        """
+        Envía outgoing[peer] a cada proceso y devuelve lo recibido de cada uno.
+        El envío corre en un hilo para que mensajes grandes no bloqueen a ambos extremos.
+        """
+        received = [None] * self.size
+        received[self.rank] = outgoing[self.rank]
+        sender = threading.Thread(target=self._send_all, args=(outgoing,))
+        sender.start()
+        for peer in sorted(self._conns):
+            received[peer] = self._conns[peer].recv()
+        sender.join()
+        return received
+
+    # --- colectivas con objetos ---
+
+    def allgather(self, obj):
+        return self._exchange([obj] * self.size)
+
+    def bcast(self, obj, root=0):
+        return self._exchange([obj if self.rank == root else None] * self.size)[root]
+
+    def gather(self, obj, root=0):
+        received = self._exchange([obj if peer == root else None for peer in range(self.size)])
+        return received if self.rank == root else None
+
+    def allreduce(self, obj, op=None):
+        op = op or _sum
+        parts = self.allgather(obj)
+        result = parts[0]
+        for part in parts[1:]:
+            result = op(result, part)
+        return result
+
+    def reduce(self, obj, op=None, root=0):
+        result = self.allreduce(obj, op)
+        return result if self.rank == root else None
+
+    def exscan(self, obj, op=None):
+        op = op or _sum
+        parts = self.allgather(obj)
+        if self.rank == 0:
+            return None
+        result = parts[0]
+        for part in parts[1:self.rank]:
+            result = op(result, part)
+        return result
+
+    def Barrier(self):
+        self._exchange([None] * self.size)
+
+    # --- colectivas con buffers numpy ---
+
+    def Allreduce(self, sendbuf, recvbuf, op=None):
+        recvbuf[...] = self.allreduce(np.array(sendbuf, copy=True), op)
+
+    def Alltoall(self, sendbuf, recvbuf):
+        recvbuf[:] = self._exchange([sendbuf[peer] for peer in range(self.size)])
+
+    def Alltoallv(self, send, recv):
+        sendbuf, (send_counts, send_displs) = send
+        recvbuf, (recv_counts, recv_displs) = recv
+        outgoing = [sendbuf[send_displs[p]:send_displs[p] + send_counts[p]] for p in range(self.size)]
+        for p, part in enumerate(self._exchange(outgoing)):
+            recvbuf[recv_displs[p]:recv_displs[p] + recv_counts[p]] = part
+
+
+class LocalFile:
+    """Sustituto de MPI.File para LocalComm: cada proceso escribe su tramo con os.pwrite."""
+
+    def __init__(self, comm, fd):
+        self._comm = comm
+        self._fd = fd
+
+    @classmethod
+    def Open(cls, comm, path):
+        if comm.Get_rank() == 0:
+            os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o644))
+        comm.Barrier()
+        return cls(comm, os.open(path, os.O_WRONLY))
+
+    def Set_size(self, size):
+        if self._comm.Get_rank() == 0:
+            os.ftruncate(self._fd, size)
+        self._comm.Barrier()
+
+    def Write_at(self, offset, data):
+        view = memoryview(data)
+        while len(view):
+            n = os.pwrite(self._fd, view, offset)
+            view = view[n:]
+            offset += n
+
+    def Write_at_all(self, offset, data):
+        self.Write_at(offset, data)
+
+    def Close(self):
+        os.close(self._fd)
+        self._comm.Barrier()
+
+
+# ========================
+# Columnas en memoria compartida
+# ========================
+
+class SharedFrame:
+    """
+    Columnas de un DataFrame copiadas una sola vez a multiprocessing.shared_memory.
+    Los workers obtienen vistas sin copia de su rango de filas con view(lo, hi).
+    Numéricas: un bloque; enteras/flotantes nulables: valores + máscara;
+    texto: códigos en memoria compartida + valores únicos (pequeños, por pickle).
+    """
+
+    def __init__(self, df):
+        self.rows = len(df)
+        self.columns = []
+        self._blocks = {}
+        for column in df.columns:
+            series = df[column]
+            dtype = series.dtype
+            if isinstance(dtype, np.dtype) and dtype.kind in "biuf":
+                self.columns.append((column, "plain", None, [self._place(series.to_numpy())]))
+            elif isinstance(dtype, ExtensionDtype) and hasattr(series.array, "_mask"):
+                array = series.array
+                self.columns.append((column, "masked", dtype,
+                                     [self._place(array._data), self._place(array._mask)]))
+            else:
+                if not isinstance(dtype, pd.CategoricalDtype):
+                    series = series.astype("category")
+                self.columns.append((column, "category", series.cat.categories,
+                                     [self._place(series.cat.codes.to_numpy())]))
+
+    def _place(self, array):
+        array = np.ascontiguousarray(array)
+        shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[...] = array
+        self._blocks[shm.name] = shm
+        return shm.name, array.dtype.str
+
+    def __getstate__(self):
+        return {"rows": self.rows, "columns": self.columns}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._blocks = {}
+
+    def _array(self, block, lo, hi):
+        name, dtype = block
+        if name not in self._blocks:
+            self._blocks[name] = shared_memory.SharedMemory(name=name)
+        full = np.ndarray(self.rows, dtype=np.dtype(dtype), buffer=self._blocks[name].buf)
+        return full[lo:hi]
+
+    def view(self, lo, hi):
+        """DataFrame de las filas [lo, hi) sin copiar los datos; el índice es el número de fila global."""
+        data = {}
+        for column, kind, meta, blocks in self.columns:
+            arrays = [self._array(block, lo, hi) for block in blocks]
+            if kind == "plain":
+                data[column] = arrays[0]
+            elif kind == "masked":
+                data[column] = meta.construct_array_type()(arrays[0], arrays[1])
+            else:
+                data[column] = pd.Categorical.from_codes(arrays[0], categories=meta)
+        return pd.DataFrame(data, index=pd.RangeIndex(lo, hi), copy=False)
+
+    def close(self):
+        for shm in self._blocks.values():
+            shm.close()
+
+    def unlink(self):
+        for shm in self._blocks.values():
+            shm.close()
+            shm.unlink()
+
+
+def row_range(rows, rank, size):
+    """Rango [lo, hi) de filas contiguas que le toca a un worker."""
+    return rows * rank // size, rows * (rank + 1) // size
+
+
+# ========================
+# Pool de procesos
+# ========================
+
+def _worker(rank, size, conns, target, args):
+    target(LocalComm(rank, size, conns), *args)
+
+
+def run_local(target, workers, *args):
+    """
+    Ejecuta target(comm, *args) en `workers` procesos conectados por LocalComm.
+    Si un worker falla se terminan los demás (quedarían esperando en una colectiva).
+    """
+    conns = [{} for _ in range(workers)]
+    for i in range(workers):
+        for j in range(i + 1, workers):
+            conns[i][j], conns[j][i] = mp.Pipe(duplex=True)
+
+    processes = [mp.Process(target=_worker, args=(rank, workers, conns[rank], target, args))
+                 for rank in range(workers)]
+    for p in processes:
+        p.start()
+
+    pending = {p.sentinel: (rank, p) for rank, p in enumerate(processes)}
+    while pending:
+        for sentinel in wait(list(pending)):
+            rank, p = pending.pop(sentinel)
+            p.join()
+            if p.exitcode != 0:
+                for _, other in pending.values():
+                    other.terminate()
+                raise RuntimeError(f"local worker {rank} exited with code {p.exitcode}")
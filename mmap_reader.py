@@ -0,0 +1,451 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from pandas.api.types import union_categoricals
+
+from partitioned_reader import read_byte_range, read_header
+
+# Bytes por bloque: acota la memoria temporal de los escaneos (máscaras y offsets)
+DEFAULT_BLOCK_BYTES = 16 << 20
+
+# Mismos marcadores de faltante que pd.read_csv por defecto
+NA_TOKENS = frozenset([
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+])
+
+_COMMA, _NEWLINE, _CR, _QUOTE = ord(","), ord("\n"), ord("\r"), ord('"')
+_DIGIT0, _DOT, _MINUS = ord("0"), ord("."), ord("-")
+
+# Potencias de 10 exactas en float64: m / 10**k es correctamente redondeado si m <= 2**53
+_POW10_EXACT = 10.0 ** np.arange(23)
+_MAX_EXACT = 1 << 53
+
+_STRING_DTYPES = ("category", "str", "string", "object")
+
+
+class _Fallback(Exception):
+    """El rango no cumple el formato fijo (comillas, filas irregulares...): usar pandas."""
+
+
+# ========================
+# Escaneo de delimitadores
+# ========================
+
+def _field_bounds(buf, n_cols):
+    """Matrices (filas x columnas) de inicio y fin de cada campo, a partir de escaneos de bytes."""
+    if len(buf) == 0:
+        empty = np.empty((0, n_cols), dtype=np.int64)
+        return empty, empty
+    if (buf == _QUOTE).any():
+        raise _Fallback("quoted fields")
+
+    newlines = np.flatnonzero(buf == _NEWLINE)
+    if buf[-1] != _NEWLINE:
+        newlines = np.append(newlines, len(buf))
+    commas = np.flatnonzero(buf == _COMMA)
+    n_rows = len(newlines)
+    if len(commas) != n_rows * (n_cols - 1):
+        raise _Fallback("ragged rows")
+
+    # Cada fila debe tener exactamente n_cols - 1 comas entre sus saltos de línea
+    line_starts = np.empty(n_rows, dtype=np.int64)
+    line_starts[0] = 0
+    line_starts[1:] = newlines[:-1] + 1
+    commas = commas.reshape(n_rows, n_cols - 1)
+    if n_cols > 1 and ((commas[:, 0] < line_starts).any() or (commas[:, -1] > newlines).any()):
+        raise _Fallback("ragged rows")
+
+    starts = np.empty((n_rows, n_cols), dtype=np.int64)
+    ends = np.empty((n_rows, n_cols), dtype=np.int64)
+    starts[:, 0] = line_starts
+    starts[:, 1:] = commas + 1
+    ends[:, :-1] = commas
+    # Fin de línea \r\n
+    has_cr = (newlines > starts[:, -1]) & (buf[np.maximum(newlines - 1, 0)] == _CR)
+    ends[:, -1] = newlines - has_cr
+    return starts, ends
+
+
+def _field_matrix(buf, starts, ends):
+    """
+    Bytes de una columna como matriz (filas x ancho máximo), alineados a la
+    izquierda y rellenados con ceros. `buf` lleva relleno al final.
+    """
+    widths = ends - starts
+    width = max(int(widths.max()) if len(widths) else 0, 1)
+    mat = sliding_window_view(buf, width)[starts]
+    mat[np.arange(width) >= widths[:, None]] = 0
+    return mat, widths
+
+
+def _strip_suffix(buf, starts, ends, suffix):
+    """Recorta `suffix` (bytes) del final de los campos que lo tienen (p. ej. 12_dup -> 12)."""
+    k = len(suffix)
+    tail = sliding_window_view(buf, k)[ends - k]
+    has = (ends - starts >= k) & (tail == np.frombuffer(suffix, dtype=np.uint8)).all(1)
+    return ends - k * has
+
+
+# ========================
+# Columnas numéricas
+# ========================
+
+_ASCII_ZEROS = np.uint64(0x3030303030303030)
+_ASCII_DOTS = np.uint64(0x2E2E2E2E2E2E2E2E)
+_HIGH_BITS = np.uint64(0x8080808080808080)
+_LOW_7BITS = np.uint64(0x7F7F7F7F7F7F7F7F)
+# Máscara de los c bytes de menor dirección de una palabra (c = 0..8)
+_LOW_BYTES = np.array([(1 << (8 * c)) - 1 for c in range(9)], dtype=np.uint64)
+_POW10_U64 = 10 ** np.arange(19, dtype=np.uint64)
+# long double x87 (64 bits de mantisa): 10**k exacto hasta k = 27
+_EXTENDED = np.finfo(np.longdouble).nmant >= 63
+_POW10_LONG = np.array([10 ** k for k in range(28)], dtype=np.longdouble)
+
+
+def _eight_digits(words):
+    """True donde los 8 bytes de la palabra son dígitos ASCII."""
+    high = words & np.uint64(0xF0F0F0F0F0F0F0F0)
+    carry = ((words + np.uint64(0x0606060606060606)) & np.uint64(0xF0F0F0F0F0F0F0F0)) >> np.uint64(4)
+    return (high | carry) == np.uint64(0x3333333333333333)
+
+
+def _swar8(words):
+    """8 dígitos ASCII por palabra (el más significativo en la dirección menor) -> entero."""
+    v = words - _ASCII_ZEROS
+    v = v * np.uint64(10) + (v >> np.uint64(8))
+    mask = np.uint64(0x000000FF000000FF)
+    v = ((v & mask) * np.uint64(100 + (1000000 << 32))
+         + ((v >> np.uint64(16)) & mask) * np.uint64(1 + (10000 << 32))) >> np.uint64(32)
+    return v
+
+
+def _parse_decimal(buf, starts, ends):
+    """
+    Parseo vectorizado de [-]dígitos[.dígitos] con SWAR: cada campo se alinea a
+    la derecha en palabras de 8 bytes, el punto se reemplaza por '0' (y se
+    descuenta después) y se convierten 8 dígitos por operación.
+    Devuelve (mantisa uint64, decimales, negativo, tiene punto, ok).
+    """
+    negative = buf[starts] == _MINUS
+    widths = ends - starts - negative
+    n_words = max(-(-int(widths.max()) // 8), 1) if len(widths) else 1
+    width = 8 * n_words
+    words = sliding_window_view(buf, width)[ends - width].view(np.dtype("<u8"))
+
+    mantissa = np.zeros(len(starts), dtype=np.uint64)
+    ok = widths > 0
+    n_dots = np.zeros(len(starts), dtype=np.int64)
+    dot_pos = np.zeros(len(starts), dtype=np.int64)
+    for j in range(n_words):
+        # Bytes anteriores al campo (y el signo) -> '0'
+        low = _LOW_BYTES[np.clip(width - widths - 8 * j, 0, 8)]
+        w = (words[:, j] & ~low) | (_ASCII_ZEROS & low)
+
+        # Punto decimal: detección exacta por byte y reemplazo por '0'
+        x = w ^ _ASCII_DOTS
+        hit = ~(((x & _LOW_7BITS) + _LOW_7BITS) | x) & _HIGH_BITS
+        w ^= (hit >> np.uint64(7)) * np.uint64(0x1E)
+        ok &= _eight_digits(w) & ((hit & (hit - np.uint64(1))) == 0)
+        has = hit != 0
+        n_dots += has
+        dot_pos = np.where(has, 8 * j + (np.frexp(hit.astype(np.float64))[1] - 8) // 8, dot_pos)
+
+        mantissa = mantissa * np.uint64(10 ** 8) + _swar8(w)
+
+    has_dot = n_dots == 1
+    frac = np.where(has_dot, width - 1 - dot_pos, 0)
+    ok &= (n_dots <= 1) & (widths - has_dot <= 18)
+    # Quitar el '0' que ocupó el lugar del punto
+    p = _POW10_U64[np.minimum(frac, 18)]
+    mantissa = np.where(has_dot, mantissa // (p * np.uint64(10)) * p + mantissa % p, mantissa)
+    return mantissa, frac, negative, has_dot, ok
+
+
+def _strtod(buf, starts, ends, rows, out):
+    """Camino lento (strtod de numpy) para las filas no exactas. False si hay texto no numérico."""
+    if len(rows) == 0:
+        return True
+    mat, widths = _field_matrix(buf, starts[rows], ends[rows])
+    try:
+        out[rows] = mat.view(f"S{mat.shape[1]}").ravel().astype(np.float64)
+        return True
+    except ValueError:
+        pass
+    for i, row in enumerate(rows):
+        token = bytes(mat[i, :widths[i]]).decode("utf-8", errors="replace")
+        if token in NA_TOKENS:
+            out[row] = np.nan
+            continue
+        try:
+            out[row] = float(token)
+        except ValueError:
+            return False
+    return True
+
+
+def _extended_quotient(mantissa, frac):
+    """
+    m / 10**frac con long double de 64 bits de mantisa: el cociente se redondea
+    una vez a 64 bits y luego a double. El doble redondeo solo puede diferir del
+    redondeo correcto si el primero cae justo en el punto medio entre dos
+    doubles; esas filas se marcan como no resueltas.
+    """
+    q = mantissa.astype(np.longdouble) / _POW10_LONG[frac]
+    d = q.astype(np.float64)
+    r = q - d.astype(np.longdouble)
+    up = (np.nextafter(d, np.inf) - d).astype(np.longdouble)
+    down = (d - np.nextafter(d, -np.inf)).astype(np.longdouble)
+    return d, (2 * r != up) & (-2 * r != down)
+
+
+def _numbers(buf, starts, ends):
+    """
+    Columna numérica: (float64 con NaN, int64 o None si no todas son enteras).
+    Devuelve None si la columna tiene texto no numérico.
+    """
+    mantissa, frac, negative, has_dot, ok = _parse_decimal(buf, starts, ends)
+    exact = ok & (mantissa <= _MAX_EXACT) & (frac <= 22)
+    values = mantissa / _POW10_EXACT[np.minimum(frac, 22)]
+    if _EXTENDED:
+        rows = np.flatnonzero(ok & ~exact & (frac < len(_POW10_LONG)))
+        values[rows], resolved = _extended_quotient(mantissa[rows], frac[rows])
+        exact[rows[resolved]] = True
+    values[negative] *= -1
+    missing = ends == starts
+    values[missing] = np.nan
+    if not _strtod(buf, starts, ends, np.flatnonzero(~exact & ~missing), values):
+        return None
+    if len(ok) and (ok & ~has_dot).all():
+        ints = mantissa.astype(np.int64)
+        ints[negative] *= -1
+        return values, ints
+    return values, None
+
+
+def _numeric_column(buf, starts, ends, dtype):
+    parsed = _numbers(buf, starts, ends)
+    if parsed is None:
+        if dtype is not None:
+            raise _Fallback("non-numeric value in numeric column")
+        return None
+    values, ints = parsed
+    if dtype is None:
+        return ints if ints is not None else values
+    if ints is not None:
+        return ints if dtype == np.dtype(np.int64) else pd.array(ints).astype(dtype)
+    try:
+        return pd.array(values).astype(dtype)
+    except (TypeError, ValueError):
+        raise _Fallback(f"cannot cast to {dtype}")
+
+
+# ========================
+# Columnas de texto
+# ========================
+
+def _factorize_fields(buf, starts, ends):
+    """
+    Códigos por fila y fila representativa de cada valor distinto: los campos se
+    leen como palabras de 8 bytes (relleno en cero) y se agrupan por un hash
+    uint64, verificado contra las palabras completas.
+    """
+    widths = ends - starts
+    n_words = max(-(-int(widths.max()) // 8), 1) if len(widths) else 1
+    words = sliding_window_view(buf, 8 * n_words)[starts].view(np.dtype("<u8"))
+    h = np.zeros(len(starts), dtype=np.uint64)
+    for j in range(n_words):
+        words[:, j] &= _LOW_BYTES[np.clip(widths - 8 * j, 0, 8)]
+        h = (h ^ words[:, j]) * np.uint64(0x100000001B3)
+        h ^= h >> np.uint64(29)
+    codes, uniques = pd.factorize(h)
+    first = np.empty(len(uniques), dtype=np.int64)
+    first[codes[::-1]] = np.arange(len(starts))[::-1]
+    if not (words == words[first[codes]]).all():
+        # Colisión de hash: ordenar los campos completos
+        keys = np.ascontiguousarray(words).view(f"S{8 * n_words}").ravel()
+        _, first, codes = np.unique(keys, return_index=True, return_inverse=True)
+    return codes.astype(np.int64), first
+
+
+def _string_column(buf, starts, ends, dtype):
+    codes, first = _factorize_fields(buf, starts, ends)
+    try:
+        values = [buf[starts[i]:ends[i]].tobytes().decode("utf-8") for i in first]
+    except UnicodeDecodeError:
+        raise _Fallback("invalid utf-8")
+
+    # Categorías ordenadas (como pd.read_csv) y marcadores de faltante -> código -1
+    order = sorted(range(len(values)), key=values.__getitem__)
+    remap = np.full(len(values) + 1, -1, dtype=np.int64)
+    categories = []
+    for i in order:
+        if values[i] not in NA_TOKENS:
+            remap[i] = len(categories)
+            categories.append(values[i])
+    codes = remap[codes]
+
+    if dtype == "category":
+        return pd.Categorical.from_codes(codes, categories=pd.Index(categories, dtype="str"))
+    return np.append(np.array(categories, dtype=object), np.nan)[codes]
+
+
+def _build_column(buf, starts, ends, spec, override):
+    spec = spec or {}
+    dtype = override or spec.get("dtype")
+    if spec.get("strip_suffix"):
+        ends = _strip_suffix(buf, starts, ends, spec["strip_suffix"].encode())
+
+    if dtype in _STRING_DTYPES:
+        return _string_column(buf, starts, ends, dtype)
+    if dtype is None:
+        column = _numeric_column(buf, starts, ends, None)
+        return _string_column(buf, starts, ends, "str") if column is None else column
+    return _numeric_column(buf, starts, ends, pd.api.types.pandas_dtype(dtype))
+
+
+# ========================
+# Lectura por rangos de bytes
+# ========================
+
+def _column_names(header):
+    if _QUOTE in header:
+        raise _Fallback("quoted header")
+    return header.decode("utf-8").rstrip("\r\n").split(",")
+
+
+def _parse_block(view, names, schema, dtype):
+    """Parsea un bloque de líneas completas (vista uint8 del mmap) a {columna: arreglo}."""
+    starts, ends = _field_bounds(view, len(names))
+    # Relleno a ambos lados para las ventanas alineadas a izquierda y derecha
+    pad = -(-(int((ends - starts).max()) if starts.size else 0) // 8) * 8 + 8
+    buf = np.zeros(pad + len(view) + pad, dtype=np.uint8)
+    buf[pad:pad + len(view)] = view
+    starts += pad
+    ends += pad
+    return {
+        name: _build_column(buf, starts[:, j], ends[:, j], schema.get(name), dtype.get(name))
+        for j, name in enumerate(names)
+    }
+
+
+def _next_line(data, pos, end):
+    """Posición siguiente al primer salto de línea en [pos, end), o `end`."""
+    step = 1 << 12
+    while pos < end:
+        hits = np.flatnonzero(data[pos:min(end, pos + step)] == _NEWLINE)
+        if len(hits):
+            return pos + int(hits[0]) + 1
+        pos += step
+    return end
+
+
+def _block_ranges(data, start, end, block_bytes):
+    """Divide [start, end) en bloques de ~block_bytes alineados a fin de línea."""
+    pos = start
+    while pos < end:
+        stop = end if pos + block_bytes >= end else _next_line(data, pos + block_bytes - 1, end)
+        yield pos, stop
+        pos = stop
+
+
+def _row_ranges(data, start, end, batch_rows):
+    """Divide [start, end) en rangos de exactamente batch_rows líneas (el último puede tener menos)."""
+    window = 1 << 16
+    pos = start
+    while pos < end:
+        while True:
+            hi = min(end, pos + window)
+            newlines = np.flatnonzero(data[pos:hi] == _NEWLINE)
+            if len(newlines) >= batch_rows or hi == end:
+                break
+            window *= 2
+        stop = pos + int(newlines[batch_rows - 1]) + 1 if len(newlines) >= batch_rows else end
+        # La siguiente ventana se ajusta al tamaño observado del lote
+        window = max(1 << 16, (stop - pos) * 9 // 8)
+        yield pos, stop
+        pos = stop
+
+
+def _concat(blocks, names):
+    if len(blocks) == 1:
+        return pd.DataFrame(blocks[0], columns=names)
+    data = {}
+    for name in names:
+        parts = [b[name] for b in blocks]
+        if isinstance(parts[0], pd.Categorical):
+            data[name] = union_categoricals(parts, sort_categories=True)
+        elif isinstance(parts[0], np.ndarray):
+            data[name] = np.concatenate(parts)
+        else:
+            data[name] = pd.concat([pd.Series(p) for p in parts], ignore_index=True)
+    return pd.DataFrame(data, columns=names)
+
+
+def _empty_frame(names, schema, dtype):
+    starts = np.zeros(0, dtype=np.int64) + 8
+    buf = np.zeros(16, dtype=np.uint8)
+    return pd.DataFrame({name: _build_column(buf, starts, starts, schema.get(name), dtype.get(name))
+                         for name in names}, columns=names)
+
+
+def _pandas_range(input_file, start, end, header, schema, dtype):
+    """Camino genérico (pd.read_csv) para rangos que no cumplen el formato fijo."""
+    from schema import apply_schema, read_csv_dtypes
+    return apply_schema(read_byte_range(input_file, start, end, header=header,
+                                        dtype=read_csv_dtypes(schema, dtype)), schema)
+
+
+def read_fixed_range(input_file, start, end, header=None, schema=None, dtype=None,
+                     block_bytes=DEFAULT_BLOCK_BYTES):
+    """
+    Lector rápido para CSV de esquema fijo (sin comillas, una fila por línea).
+
+    Mapea el archivo en memoria, localiza comas y saltos de línea de [start, end)
+    con escaneos vectorizados por bloques y materializa cada columna directo a
+    numpy: las numéricas con un parseo decimal sobre la matriz de bytes, las de
+    texto como códigos + valores únicos. `schema` es la sección "schema" de
+    metadata.json y `dtype` la sobrescribe por columna (p. ej. categóricas del
+    plan). Si el rango no cumple el formato fijo se usa pd.read_csv.
+    """
+    schema = schema or {}
+    dtype = dtype or {}
+    if header is None:
+        header = read_header(input_file)
+    try:
+        names = _column_names(header)
+        if end <= start:
+            return _empty_frame(names, schema, dtype)
+        data = np.memmap(input_file, dtype=np.uint8, mode="r")
+        blocks = [_parse_block(data[lo:hi], names, schema, dtype)
+                  for lo, hi in _block_ranges(data, start, end, block_bytes)]
+        return _concat(blocks, names)
+    except _Fallback:
+        return _pandas_range(input_file, start, end, header, schema, dtype)
+
+
+def iter_fixed_batches(input_file, start, end, batch_rows, header=None, schema=None, dtype=None):
+    """
+    Versión por lotes de read_fixed_range (modo streaming): lotes de exactamente
+    `batch_rows` filas, igual que pd.read_csv(chunksize=...).
+    """
+    schema = schema or {}
+    dtype = dtype or {}
+    if header is None:
+        header = read_header(input_file)
+    if end <= start:
+        return
+    try:
+        names = _column_names(header)
+    except _Fallback:
+        names = None
+
+    data = np.memmap(input_file, dtype=np.uint8, mode="r")
+    for lo, hi in _row_ranges(data, start, end, batch_rows):
+        try:
+            if names is None:
+                raise _Fallback("quoted header")
+            batch = _concat([_parse_block(data[lo:hi], names, schema, dtype)], names)
+        except _Fallback:
+            batch = _pandas_range(input_file, lo, hi, header, schema, dtype)
+        yield batch
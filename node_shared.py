@@ -0,0 +1,145 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from distributed_dedup import global_duplicate_mask
+from local_backend import SharedFrame
+from partitioned_reader import common_dtypes, concat_frames, partition_range, read_byte_range
+
+
+class WindowFrame(SharedFrame):
+    """
+    SharedFrame sobre ventanas MPI.Win.Allocate_shared de un comunicador de
+    nodo: el líder aporta la memoria y los datos, el resto de los ranks del
+    nodo solo obtiene vistas (Shared_query) sin copia ni serialización.
+    Cada _place del líder es colectivo con el bucle de los demás ranks.
+    """
+
+    def __init__(self, node, df=None):
+        self._node = node
+        self._windows = []
+        if node.Get_rank() == 0:
+            super().__init__(df)
+            node.bcast(None, root=0)
+            node.bcast((self.rows, self.columns), root=0)
+        else:
+            self._blocks = {}
+            while node.bcast(None, root=0) is not None:
+                self._allocate(0)
+            self.rows, self.columns = node.bcast(None, root=0)
+        node.Barrier()
+
+    def _allocate(self, nbytes):
+        from mpi4py import MPI
+        self._windows.append(MPI.Win.Allocate_shared(nbytes, 1, comm=self._node))
+        return self._windows[-1]
+
+    def _place(self, array):
+        array = np.ascontiguousarray(array)
+        self._node.bcast(array.nbytes, root=0)
+        buf, _ = self._allocate(max(array.nbytes, 1)).Shared_query(0)
+        np.ndarray(array.shape, dtype=array.dtype, buffer=buf)[...] = array
+        return len(self._windows) - 1, array.dtype.str
+
+    def _array(self, block, lo, hi):
+        index, dtype = block
+        buf, _ = self._windows[index].Shared_query(0)
+        return np.ndarray(self.rows, dtype=np.dtype(dtype), buffer=buf)[lo:hi]
+
+    def free(self):
+        """Libera las ventanas (colectivo en el nodo); las vistas dejan de ser válidas."""
+        for win in self._windows:
+            win.Free()
+        self._windows = []
+
+
+class NodePartition(NamedTuple):
+    """Comunicadores del nodo y filas [lo, hi) del rank dentro del WindowFrame del nodo."""
+    node: object
+    leaders: object
+    frame: WindowFrame
+    lo: int
+    hi: int
+
+
+def node_comms(comm):
+    """
+    (comunicador del nodo, comunicador de líderes). El líder es el rank 0 de
+    cada nodo; en los demás ranks el comunicador de líderes es COMM_NULL.
+    """
+    from mpi4py import MPI
+
+    node = comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+    leaders = comm.Split(0 if node.Get_rank() == 0 else MPI.UNDEFINED, comm.Get_rank())
+    return node, leaders
+
+
+def read_node_shared(comm, input_file, reader=read_byte_range, **read_csv_kwargs):
+    """
+    Como partitioned_reader.read_partition, pero una sola copia por nodo.
+
+    El líder de cada nodo lee los rangos de bytes de todos los ranks de su
+    nodo (en el orden de esos ranks) y deja las columnas en ventanas
+    compartidas; cada rank trabaja sobre la vista de su propio rango. El
+    índice sigue siendo el número de fila global. Devuelve (chunk, NodePartition).
+    """
+    node, leaders = node_comms(comm)
+    members = node.allgather(comm.Get_rank())
+
+    parts, dtypes = [], {}
+    if node.Get_rank() == 0:
+        for member in members:
+            header, start, end = partition_range(input_file, member, comm.Get_size())
+            parts.append(reader(input_file, start, end, header=header, **read_csv_kwargs))
+        for part in parts:
+            for column in part.columns:
+                dtypes.setdefault(column, []).append(part[column].dtype)
+
+    casts = common_dtypes(comm, dtypes)
+    if casts:
+        parts = [part.astype(casts) for part in parts]
+    counts = node.bcast([len(part) for part in parts], root=0)
+
+    frame = WindowFrame(node, concat_frames(parts) if parts else None)
+    del parts
+
+    lo = sum(counts[:node.Get_rank()])
+    hi = lo + counts[node.Get_rank()]
+    offset = comm.exscan(hi - lo) or 0
+    chunk = frame.view(lo, hi)
+    chunk.index = pd.RangeIndex(offset, offset + hi - lo)
+    return chunk, NodePartition(node, leaders, frame, lo, hi)
+
+
+def _shared_array(node, rows, dtype):
+    from mpi4py import MPI
+
+    dtype = np.dtype(dtype)
+    nbytes = max(rows * dtype.itemsize, 1) if node.Get_rank() == 0 else 0
+    win = MPI.Win.Allocate_shared(nbytes, dtype.itemsize, comm=node)
+    buf, _ = win.Shared_query(0)
+    return win, np.ndarray(rows, dtype=dtype, buffer=buf)
+
+
+def node_duplicate_mask(part, fingerprints, row_numbers):
+    """
+    Deduplicación jerárquica: los ranks escriben sus huellas en una ventana
+    del nodo y solo los líderes hacen el shuffle entre nodos
+    (global_duplicate_mask sobre el comunicador de líderes).
+    """
+    node, rows = part.node, part.frame.rows
+    fps_win, fps = _shared_array(node, rows, np.uint64)
+    rows_win, row_ids = _shared_array(node, rows, np.int64)
+    mask_win, mask = _shared_array(node, rows, bool)
+    try:
+        fps[part.lo:part.hi] = fingerprints
+        row_ids[part.lo:part.hi] = row_numbers
+        node.Barrier()
+        if node.Get_rank() == 0:
+            mask[:] = global_duplicate_mask(part.leaders, fps, row_ids)
+        node.Barrier()
+        return mask[part.lo:part.hi].copy()
+    finally:
+        for win in (fps_win, rows_win, mask_win):
+            win.Free()
@@ -0,0 +1,130 @@
+import math
+
+import numpy as np
+
+# Bits de la clave que se resuelven por iteración (256 cubetas por objetivo)
+RADIX_BITS = 8
+# Si quedan pocos candidatos globales, se reúnen y se resuelve directamente
+GATHER_THRESHOLD = 4096
+
+_SIGN = np.uint64(1 << 63)
+
+
+def sortable_keys(values):
+    """Convierte float64 en claves uint64 cuyo orden entero coincide con el orden numérico."""
+    bits = np.ascontiguousarray(values, dtype=np.float64).view(np.uint64)
+    negative = (bits & _SIGN) != 0
+    return np.where(negative, ~bits, bits | _SIGN)
+
+
+def keys_to_values(keys):
+    """Inversa de sortable_keys."""
+    keys = np.asarray(keys, dtype=np.uint64)
+    negative = (keys & _SIGN) == 0
+    bits = np.where(negative, ~keys, keys & ~_SIGN)
+    return bits.view(np.float64)
+
+
+def _finite(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[~np.isnan(values)]
+
+
+def distributed_select(comm, values, ranks, radix_bits=RADIX_BITS, gather_threshold=GATHER_THRESHOLD):
+    """
+    Selección exacta distribuida: devuelve los valores que ocupan las posiciones
+    `ranks` (base 0) del orden global de `values` (unión de todos los ranks).
+
+    Cada iteración construye un histograma de `2**radix_bits` cubetas sobre los
+    siguientes bits de la clave, para todos los objetivos a la vez, y lo combina
+    con un único Allreduce. La comunicación es O(cubetas x iteraciones), nunca O(filas).
+    """
+    keys = sortable_keys(_finite(values))
+    targets = np.asarray(ranks, dtype=np.int64)
+    n_targets = len(targets)
+    n_buckets = 1 << radix_bits
+    digit_mask = np.uint64(n_buckets - 1)
+
+    prefix = np.zeros(n_targets, dtype=np.uint64)
+    below = np.zeros(n_targets, dtype=np.int64)
+    result = np.zeros(n_targets, dtype=np.uint64)
+    active = np.ones(n_targets, dtype=bool)
+    candidates = [keys] * n_targets
+
+    shift = 64
+    while active.any() and shift > 0:
+        shift -= radix_bits
+        s = np.uint64(shift)
+
+        local = np.zeros((n_targets, n_buckets), dtype=np.int64)
+        for t in np.flatnonzero(active):
+            digits = ((candidates[t] >> s) & digit_mask).astype(np.intp)
+            local[t] = np.bincount(digits, minlength=n_buckets)
+        hist = np.empty_like(local)
+        comm.Allreduce(local, hist)
+
+        pending = []
+        for t in np.flatnonzero(active):
+            cum = np.cumsum(hist[t])
+            k = targets[t] - below[t]
+            d = int(np.searchsorted(cum, k, side="right"))
+            if d > 0:
+                below[t] += cum[d - 1]
+            prefix[t] = (prefix[t] << np.uint64(radix_bits)) | np.uint64(d)
+            candidates[t] = candidates[t][((candidates[t] >> s) & digit_mask) == np.uint64(d)]
+
+            if shift == 0:
+                result[t] = prefix[t]
+                active[t] = False
+            elif hist[t, d] <= gather_threshold:
+                pending.append(t)
+
+        # Resolver directamente los objetivos con pocos candidatos
+        if pending:
+            gathered = comm.allgather([candidates[t] for t in pending])
+            for j, t in enumerate(pending):
+                merged = np.sort(np.concatenate([g[j] for g in gathered]))
+                result[t] = merged[targets[t] - below[t]]
+                active[t] = False
+
+    return keys_to_values(result)
+
+
+def _lerp(a, b, t):
+    # Misma interpolación que np.percentile(method="linear")
+    diff = b - a
+    return b - diff * (1 - t) if t >= 0.5 else a + diff * t
+
+
+def distributed_quantiles(comm, values, qs, n=None):
+    """
+    Cuantiles exactos globales (misma definición que np.percentile lineal).
+    Ignora NaN. Devuelve NaN si no hay valores en ningún rank. `n` (total
+    global de valores no nulos) evita un allreduce si ya se conoce.
+    """
+    values = _finite(values)
+    if n is None:
+        n = comm.allreduce(len(values))
+    if n == 0:
+        return [float("nan")] * len(qs)
+
+    positions = [(n - 1) * q for q in qs]
+    needed = sorted({int(math.floor(h)) for h in positions} | {int(math.ceil(h)) for h in positions})
+    selected = dict(zip(needed, distributed_select(comm, values, needed)))
+
+    out = []
+    for h in positions:
+        lo, hi = int(math.floor(h)), int(math.ceil(h))
+        out.append(float(_lerp(selected[lo], selected[hi], h - lo)))
+    return out
+
+
+def distributed_median(comm, values, n=None):
+    """Mediana exacta global."""
+    return distributed_quantiles(comm, values, [0.5], n)[0]
+
+
+def iqr_fences(q1, q3, k=1.5):
+    """Límites de Tukey [Q1 - k*IQR, Q3 + k*IQR]."""
+    iqr = q3 - q1
+    return q1 - k * iqr, q3 + k * iqr
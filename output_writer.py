@@ -0,0 +1,190 @@
+import json
+import os
+
+import numpy as np
+
+from columnar_output import write_columnar
+from local_backend import LocalComm, LocalFile
+
+
+def _open_file(comm, output_file):
+    """MPI.File en modo escritura; con el backend local, su equivalente con os.pwrite."""
+    if isinstance(comm, LocalComm):
+        return LocalFile.Open(comm, output_file)
+    from mpi4py import MPI
+    return MPI.File.Open(comm, output_file, MPI.MODE_WRONLY | MPI.MODE_CREATE)
+
+
+def format_csv(df, header):
+    """Formatea las filas de un chunk como bytes CSV (sin índice)."""
+    return df.to_csv(index=False, header=header).encode("utf-8")
+
+
+def write_csv_collective(comm, df, output_file, append=False):
+    """
+    Escribe un único CSV con MPI-IO sin reunir el resultado en rank 0.
+
+    Cada rank formatea sus filas, calcula su offset con un prefijo exclusivo de
+    las longitudes en bytes y escribe en su posición con una escritura colectiva.
+    Rank 0 aporta el encabezado. Con append=True las filas se agregan al final
+    de un CSV existente (sin encabezado). Devuelve el tamaño total del archivo.
+    """
+    base = 0
+    if append:
+        base = comm.bcast(os.path.getsize(output_file) if comm.Get_rank() == 0 else None, root=0)
+    data = format_csv(df, header=comm.Get_rank() == 0 and not append)
+    offset = base + (comm.exscan(len(data)) or 0)
+    total = base + comm.allreduce(len(data))
+
+    fh = _open_file(comm, output_file)
+    try:
+        fh.Set_size(total)
+        fh.Write_at_all(offset, data)
+    finally:
+        fh.Close()
+    return total
+
+
+def write_csv_ordered(comm, df, row_ranges, output_file):
+    """
+    Como write_csv_collective, pero cada rank puede tener varios tramos no
+    contiguos de filas (planificación dinámica). `row_ranges` son los rangos
+    [lo, hi) de filas globales de cada tramo; los offsets se calculan en orden
+    de fila, así el archivo queda igual que con un reparto estático.
+    """
+    header = format_csv(df.iloc[:0], header=True)
+    rows = df.index.to_numpy()
+    pieces = []
+    for lo, hi in row_ranges:
+        a, b = np.searchsorted(rows, [lo, hi])
+        pieces.append(((lo, hi), format_csv(df.iloc[a:b], header=False)))
+
+    sizes = sorted(p for part in comm.allgather([(key, len(data)) for key, data in pieces]) for p in part)
+    offsets, position = {}, len(header)
+    for key, nbytes in sizes:
+        offsets[key] = position
+        position += nbytes
+
+    fh = _open_file(comm, output_file)
+    try:
+        fh.Set_size(position)
+        if comm.Get_rank() == 0:
+            fh.Write_at(0, header)
+        for key, data in pieces:
+            fh.Write_at(offsets[key], data)
+    finally:
+        fh.Close()
+    return position
+
+
+def write_csv_rounds(comm, batches, output_file):
+    """
+    Escribe un único CSV a partir de lotes que llegan de a uno (memoria
+    acotada). En cada ronda cada rank aporta su siguiente lote (o nada); los
+    offsets salen de las longitudes de la ronda, así el archivo queda en orden
+    ronda -> rank. Rank 0 escribe el encabezado con su primer lote. Devuelve
+    el tamaño total del archivo.
+    """
+    rank = comm.Get_rank()
+    batches = iter(batches)
+    position, header = 0, rank == 0
+    fh = _open_file(comm, output_file)
+    try:
+        while True:
+            batch = next(batches, None)
+            data = b"" if batch is None else format_csv(batch, header=header)
+            if batch is not None:
+                header = False
+            sizes = comm.allgather(-1 if batch is None else len(data))
+            if max(sizes) < 0:
+                break
+            sizes = [max(n, 0) for n in sizes]
+            fh.Write_at_all(position + sum(sizes[:rank]), data)
+            position += sum(sizes)
+        fh.Set_size(position)
+    finally:
+        fh.Close()
+    return position
+
+
+def shard_path(prefix, rank):
+    return f"{prefix}_rank_{rank}.csv"
+
+
+def write_manifest(comm, prefix, path, rows, nbytes):
+    """Reúne (en rank 0) el orden, filas y bytes de cada shard en un manifiesto JSON."""
+    entries = comm.gather({"path": os.path.basename(path), "rows": rows, "bytes": nbytes}, root=0)
+    if comm.Get_rank() == 0:
+        manifest = {
+            "format": "csv",
+            "header": True,
+            "shards": entries,
+            "total_rows": sum(e["rows"] for e in entries),
+        }
+        with open(f"{prefix}_manifest.json", "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=4)
+
+
+def write_csv_shards(comm, df, prefix):
+    """
+    Escribe un CSV por rank (como clean_rank_%d.csv en cleanstream.c) y un
+    manifiesto JSON en rank 0 con el orden, filas y bytes de cada shard.
+    """
+    path = shard_path(prefix, comm.Get_rank())
+    data = format_csv(df, header=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    write_manifest(comm, prefix, path, len(df), len(data))
+    return path
+
+
+def write_csv_shard_batches(comm, batches, prefix):
+    """Como write_csv_shards, pero el shard de cada rank se escribe lote a lote."""
+    path = shard_path(prefix, comm.Get_rank())
+    rows, nbytes = 0, 0
+    with open(path, "wb") as f:
+        for batch in batches:
+            data = format_csv(batch, header=nbytes == 0)
+            f.write(data)
+            rows += len(batch)
+            nbytes += len(data)
+    write_manifest(comm, prefix, path, rows, nbytes)
+    return path
+
+
+def concat_parts_collective(comm, part_path, output_file, block_size=64 << 20):
+    """
+    Copia el archivo parcial de cada rank a su offset del archivo final por
+    bloques de `block_size` bytes (memoria acotada) y borra el parcial.
+    """
+    nbytes = os.path.getsize(part_path)
+    offset = comm.exscan(nbytes) or 0
+    total = comm.allreduce(nbytes)
+
+    fh = _open_file(comm, output_file)
+    try:
+        fh.Set_size(total)
+        with open(part_path, "rb") as f:
+            while True:
+                block = f.read(block_size)
+                if not block:
+                    break
+                fh.Write_at(offset, block)
+                offset += len(block)
+    finally:
+        fh.Close()
+    os.remove(part_path)
+    return total
+
+
+def write_output(comm, df, output_file, mode="collective", fmt="csv"):
+    """
+    Punto de entrada común. CSV: `collective` (un archivo) o `shards` (archivo
+    por rank). Los formatos columnares (parquet, arrow, npy) van a columnar_output.
+    """
+    if fmt != "csv":
+        return write_columnar(df, output_file, fmt, comm)
+    if mode == "shards":
+        prefix, _ = os.path.splitext(output_file)
+        return write_csv_shards(comm, df, prefix)
+    return write_csv_collective(comm, df, output_file)
@@ -0,0 +1,160 @@
+import io
+import os
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype, union_categoricals
+
+from schema import apply_schema
+
+
+def read_header(input_file):
+    """Devuelve la línea de encabezado (bytes, con su salto de línea)."""
+    with open(input_file, "rb") as f:
+        return f.readline()
+
+
+def _snap_to_line(f, pos, data_start):
+    """Mueve una posición al inicio de la siguiente línea completa."""
+    if pos <= data_start:
+        return data_start
+    f.seek(pos - 1)
+    f.readline()
+    return f.tell()
+
+
+def partition_range(input_file, rank, size, data_start=None, data_end=None):
+    """
+    Calcula el rango de bytes [start, end) que le toca a un rank.
+
+    El archivo (sin encabezado) se divide en `size` partes de igual tamaño y
+    cada frontera se ajusta al siguiente salto de línea, igual que los offsets
+    de cleanstream.c. Cada rank lo calcula por su cuenta, sin comunicación.
+    `data_start` / `data_end` (inicios de línea) limitan el reparto a un tramo
+    del archivo, p. ej. lo agregado desde la corrida anterior.
+    """
+    with open(input_file, "rb") as f:
+        header = f.readline()
+        data_start = len(header) if data_start is None else data_start
+        data_end = os.path.getsize(input_file) if data_end is None else data_end
+        span = data_end - data_start
+        lo = data_start + span * rank // size
+        hi = data_start + span * (rank + 1) // size
+        start = _snap_to_line(f, lo, data_start)
+        end = data_end if rank == size - 1 else min(_snap_to_line(f, hi, data_start), data_end)
+    return header, start, max(start, end)
+
+
+def read_byte_range(input_file, start, end, header=None, **read_csv_kwargs):
+    """Parsea solamente las líneas en [start, end) anteponiendo el encabezado."""
+    if header is None:
+        header = read_header(input_file)
+    with open(input_file, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    return pd.read_csv(io.BytesIO(header + data), **read_csv_kwargs)
+
+
+def read_schema_range(input_file, start, end, header=None, schema=None, **read_csv_kwargs):
+    """read_byte_range + apply_schema: lector de rangos con los tipos del schema para read_partition."""
+    return apply_schema(read_byte_range(input_file, start, end, header, **read_csv_kwargs), schema)
+
+
+class _RangeReader(io.RawIOBase):
+    """Archivo de solo lectura que expone el encabezado seguido de [start, end)."""
+
+    def __init__(self, input_file, start, end, header):
+        self._f = open(input_file, "rb")
+        self._f.seek(start)
+        self._remaining = end - start
+        self._prefix = header
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if self._prefix:
+            n = min(len(b), len(self._prefix))
+            b[:n] = self._prefix[:n]
+            self._prefix = self._prefix[n:]
+            return n
+        if self._remaining <= 0:
+            return 0
+        view = memoryview(b)[:min(len(b), self._remaining)]
+        n = self._f.readinto(view)
+        self._remaining -= n
+        return n
+
+    def close(self):
+        self._f.close()
+        super().close()
+
+
+def iter_byte_range_batches(input_file, start, end, batch_rows, header=None, **read_csv_kwargs):
+    """
+    Itera el rango [start, end) en lotes de `batch_rows` filas. La memoria usada
+    depende del tamaño del lote, no del tamaño del rango.
+    """
+    if header is None:
+        header = read_header(input_file)
+    if end <= start:
+        return
+    with io.BufferedReader(_RangeReader(input_file, start, end, header), buffer_size=1 << 20) as f:
+        yield from pd.read_csv(f, chunksize=batch_rows, **read_csv_kwargs)
+
+
+def common_dtypes(comm, dtypes):
+    """
+    Unifica los tipos numéricos inferidos por cada rank/lote (p. ej. int64 en un
+    rank sin faltantes y float64 en otro). `dtypes` es {columna: [dtype, ...]}.
+    Devuelve {columna: dtype} solo para columnas numéricas que necesitan cast.
+    """
+    merged = {}
+    for part in comm.allgather({c: [str(d) for d in ds] for c, ds in dtypes.items()}):
+        for column, names in part.items():
+            merged.setdefault(column, set()).update(names)
+
+    out = {}
+    for column, names in merged.items():
+        kinds = [pd.api.types.pandas_dtype(n) for n in names]
+        if len(kinds) > 1 and all(isinstance(k, np.dtype) and is_numeric_dtype(k) for k in kinds):
+            out[column] = np.result_type(*kinds)
+    return out
+
+
+def concat_frames(parts):
+    """Concatena rangos leídos por separado en orden; une las categorías de las columnas categóricas."""
+    if len(parts) == 1:
+        return parts[0].reset_index(drop=True)
+    data = {}
+    for column in parts[0].columns:
+        columns = [p[column] for p in parts]
+        if isinstance(columns[0].dtype, pd.CategoricalDtype):
+            data[column] = union_categoricals(columns, sort_categories=True)
+        else:
+            data[column] = pd.concat(columns, ignore_index=True)
+    return pd.DataFrame(data, columns=parts[0].columns)
+
+
+def read_partition(comm, input_file, reader=read_byte_range, **read_csv_kwargs):
+    """
+    Cada rank lee y parsea solo su porción del archivo con `reader` (por
+    defecto pd.read_csv sobre el rango; ver mmap_reader.read_fixed_range).
+
+    El índice del DataFrame resultante es el número de fila global (prefijo
+    exclusivo de los conteos locales), de modo que la deduplicación puede
+    resolver la primera aparición igual que antes.
+    """
+    rank = comm.Get_rank()
+    size = comm.Get_size()
+    header, start, end = partition_range(input_file, rank, size)
+    df = reader(input_file, start, end, header=header, **read_csv_kwargs)
+
+    casts = common_dtypes(comm, {c: [df[c].dtype] for c in df.columns})
+    if casts:
+        df = df.astype(casts)
+
+    offset = comm.exscan(len(df))
+    offset = offset or 0
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    return df
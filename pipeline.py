@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+
+# Lotes en vuelo entre etapas (2 = doble buffer)
+DEFAULT_DEPTH = 2
+
+_DONE = object()
+
+_VERDICT = {"read": "I/O-bound: read + parse", "clean": "CPU-bound", "write": "I/O-bound: write"}
+
+
+class StageTimer:
+    """Tiempo ocupado (trabajando) y ocioso (esperando a otra etapa) de una etapa del pipeline."""
+
+    def __init__(self):
+        self.busy = 0.0
+        self.idle = 0.0
+        self.items = 0
+
+    def as_dict(self):
+        return {"busy": self.busy, "idle": self.idle, "items": self.items}
+
+
+def _put(q, item, stop, timer):
+    start = time.perf_counter()
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.1)
+            break
+        except queue.Full:
+            continue
+    timer.idle += time.perf_counter() - start
+
+
+def _get(q, stop, timer):
+    start = time.perf_counter()
+    while not stop.is_set():
+        try:
+            item = q.get(timeout=0.1)
+            break
+        except queue.Empty:
+            continue
+    else:
+        item = _DONE
+    timer.idle += time.perf_counter() - start
+    return item
+
+
+def _run_stage(name, errors, stop, body):
+    try:
+        body()
+    except BaseException as e:
+        errors.append((name, e))
+        stop.set()
+
+
+def _timed(timer, process, batch, sink, write_timer):
+    start = time.perf_counter()
+    result = process(batch)
+    timer.busy += time.perf_counter() - start
+    timer.items += 1
+    if sink is not None:
+        start = time.perf_counter()
+        sink(result)
+        write_timer.busy += time.perf_counter() - start
+        write_timer.items += 1
+
+
+def run_pipeline(source, process, sink=None, depth=DEFAULT_DEPTH):
+    """
+    Ejecuta read -> clean -> write por lotes: `source` es un iterable de lotes,
+    `process(lote)` corre en el hilo principal y `sink(resultado)` recibe su
+    salida. Con depth > 0 un hilo lector precarga el lote N+1 y un hilo
+    escritor vacía el N-1 mientras se limpia el N, con colas de `depth`
+    lotes entre etapas; el orden de los lotes se conserva. Con depth == 0 todo
+    corre en secuencia (mismas mediciones, sin solapamiento).
+
+    Devuelve {"read"|"clean"|"write": {"busy", "idle", "items"}}.
+    """
+    timers = {"read": StageTimer(), "clean": StageTimer(), "write": StageTimer()}
+
+    if depth <= 0:
+        batches = iter(source)
+        while True:
+            start = time.perf_counter()
+            batch = next(batches, _DONE)
+            timers["read"].busy += time.perf_counter() - start
+            if batch is _DONE:
+                break
+            timers["read"].items += 1
+            _timed(timers["clean"], process, batch, sink, timers["write"])
+        return {name: timer.as_dict() for name, timer in timers.items()}
+
+    stop = threading.Event()
+    errors = []
+    inbox = queue.Queue(maxsize=depth)
+    outbox = queue.Queue(maxsize=depth)
+
+    def read():
+        timer = timers["read"]
+        batches = iter(source)
+        try:
+            while not stop.is_set():
+                start = time.perf_counter()
+                batch = next(batches, _DONE)
+                timer.busy += time.perf_counter() - start
+                if batch is _DONE:
+                    break
+                timer.items += 1
+                _put(inbox, batch, stop, timer)
+        finally:
+            _put(inbox, _DONE, stop, timer)
+
+    def write():
+        timer = timers["write"]
+        while True:
+            result = _get(outbox, stop, timer)
+            if result is _DONE:
+                break
+            start = time.perf_counter()
+            sink(result)
+            timer.busy += time.perf_counter() - start
+            timer.items += 1
+
+    threads = [threading.Thread(target=_run_stage, args=("read", errors, stop, read), daemon=True)]
+    if sink is not None:
+        threads.append(threading.Thread(target=_run_stage, args=("write", errors, stop, write), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    timer = timers["clean"]
+    try:
+        while True:
+            batch = _get(inbox, stop, timer)
+            if batch is _DONE:
+                break
+            start = time.perf_counter()
+            result = process(batch)
+            timer.busy += time.perf_counter() - start
+            timer.items += 1
+            if sink is not None:
+                _put(outbox, result, stop, timer)
+    except BaseException as e:
+        errors.append(("clean", e))
+        stop.set()
+    finally:
+        if sink is not None:
+            _put(outbox, _DONE, stop, timer)
+        for thread in threads:
+            thread.join()
+
+    if errors:
+        raise errors[0][1]
+    return {name: timer.as_dict() for name, timer in timers.items()}
+
+
+def report_stages(comm, timings, label="pipeline"):
+    """
+    Reúne en rank 0 los tiempos por etapa de cada rank e imprime ocupado/ocioso
+    (mín/máx entre ranks). La etapa con más tiempo ocupado es el cuello de botella.
+    """
+    parts = comm.gather(timings, root=0)
+    if comm.Get_rank() != 0:
+        return None
+
+    print(f"\n Stage times ({label}, {len(parts)} ranks)")
+    print(f"   {'stage':<8} {'batches':>8} {'busy min':>10} {'busy max':>10} {'idle min':>10} {'idle max':>10}")
+    summary = {}
+    for stage in timings:
+        busy = [p[stage]["busy"] for p in parts]
+        idle = [p[stage]["idle"] for p in parts]
+        items = sum(p[stage]["items"] for p in parts)
+        if items == 0:
+            continue
+        summary[stage] = {"busy": busy, "idle": idle, "items": items}
+        print(f"   {stage:<8} {items:>8,} {min(busy):>9.2f}s {max(busy):>9.2f}s {min(idle):>9.2f}s {max(idle):>9.2f}s")
+
+    if not summary:
+        return summary
+    bottleneck = max(summary, key=lambda s: max(summary[s]["busy"]))
+    print(f"   bottleneck: {bottleneck} ({_VERDICT[bottleneck]})")
+    return summary
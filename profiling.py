@@ -0,0 +1,205 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# sample: muestreo de pilas cada `interval` segundos (bajo overhead, pilas
+# completas para flamegraph); cprofile: determinista, con conteo de llamadas
+PROFILERS = ("sample", "cprofile")
+DEFAULT_INTERVAL = 0.005
+
+# Una función "diverge" si su tiempo propio en el rank más lento supera en
+# este factor al promedio entre ranks
+DIVERGENCE = 1.5
+
+
+def _label(filename, lineno, name):
+    if filename == "~":
+        return name
+    return f"{name} ({os.path.basename(filename)}:{lineno})"
+
+
+class Sampler:
+    """
+    Perfilador por muestreo: un hilo toma las pilas de todos los demás hilos
+    del proceso cada `interval` segundos (sys._current_frames). Cuenta cada
+    pila completa (para collapsed stacks) y de ahí el tiempo propio (hoja) y
+    acumulado (cualquier nivel) por función.
+    """
+
+    kind = "sample"
+
+    def __init__(self, interval=DEFAULT_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        me = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(_label(code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.append(names.get(ident, "thread"))
+                self.stacks[tuple(reversed(stack))] += 1
+
+    def stop(self):
+        """Detiene el muestreo y devuelve el perfil de este rank (dict serializable)."""
+        self._stop.set()
+        self._thread.join()
+        functions = {}
+        for stack, count in self.stacks.items():
+            seconds = count * self.interval
+            for label in set(stack[1:]):
+                functions.setdefault(label, [0.0, 0.0, 0])[1] += seconds
+            functions.setdefault(stack[-1], [0.0, 0.0, 0])[0] += seconds
+        return {
+            "kind": self.kind,
+            "seconds": time.perf_counter() - self.start_time,
+            "functions": functions,
+            "stacks": {";".join(stack): count for stack, count in self.stacks.items()},
+        }
+
+
+class DeterministicProfiler:
+    """cProfile del rank completo: tiempo propio, acumulado y llamadas exactas por función."""
+
+    kind = "cprofile"
+
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.profile.enable()
+        return self
+
+    def stop(self):
+        self.profile.disable()
+        self.profile.create_stats()
+        functions = {}
+        for (filename, lineno, name), (_, calls, tt, ct, _) in self.profile.stats.items():
+            functions[_label(filename, lineno, name)] = [tt, ct, calls]
+        return {
+            "kind": self.kind,
+            "seconds": time.perf_counter() - self.start_time,
+            "functions": functions,
+            "raw": self.profile.stats,
+        }
+
+
+class _RawStats:
+    """Estadísticas de cProfile ya reunidas, en la forma que acepta pstats.Stats."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+def start_profiler(kind="sample", interval=DEFAULT_INTERVAL):
+    if kind == "sample":
+        return Sampler(interval).start()
+    if kind == "cprofile":
+        return DeterministicProfiler().start()
+    raise ValueError(f"unknown profiler: {kind}")
+
+
+# ========================
+# Reporte combinado en rank 0
+# ========================
+
+def merge_profiles(parts):
+    """
+    {función: {self, total, calls, per_rank (tiempo propio), divergence}}
+    con divergence = máximo / promedio del tiempo propio entre ranks.
+    """
+    size = len(parts)
+    merged = {}
+    for rank, part in enumerate(parts):
+        for label, (own, total, calls) in part["functions"].items():
+            entry = merged.setdefault(label, {"self": 0.0, "total": 0.0, "calls": 0, "per_rank": [0.0] * size})
+            entry["self"] += own
+            entry["total"] += total
+            entry["calls"] += calls
+            entry["per_rank"][rank] = own
+    for entry in merged.values():
+        mean = sum(entry["per_rank"]) / size
+        entry["divergence"] = max(entry["per_rank"]) / mean if mean > 0 else 1.0
+    return merged
+
+
+def format_hotspots(merged, parts, top=30):
+    total_self = sum(e["self"] for e in merged.values()) or 1.0
+    kind = parts[0]["kind"]
+    lines = [f"Merged hotspots ({kind}, {len(parts)} ranks, self time summed over ranks)",
+             f"{'self':>9} {'%':>6} {'total':>9} {'calls':>10} {'rank min':>9} {'rank max':>9} {'div':>6}  function"]
+    ranked = sorted(merged.items(), key=lambda kv: -kv[1]["self"])[:top]
+    for label, e in ranked:
+        calls = f"{e['calls']:,}" if kind == "cprofile" else "-"
+        flag = "  <-- diverges" if e["divergence"] > DIVERGENCE and e["self"] / total_self >= 0.01 else ""
+        lines.append(f"{e['self']:>8.3f}s {e['self'] / total_self:>6.1%} {e['total']:>8.3f}s {calls:>10} "
+                     f"{min(e['per_rank']):>8.3f}s {max(e['per_rank']):>8.3f}s {e['divergence']:>5.2f}x  {label}{flag}")
+
+    diverging = [(label, e) for label, e in ranked if e["divergence"] > DIVERGENCE and e["self"] / total_self >= 0.01]
+    if diverging:
+        lines.append("")
+        lines.append("Per-rank self time of diverging functions:")
+        for label, e in diverging:
+            per_rank = " ".join(f"r{r}={s:.3f}s" for r, s in enumerate(e["per_rank"]))
+            lines.append(f"  {label}: {per_rank}")
+    return "\n".join(lines)
+
+
+def write_profile(comm, profile, prefix="profile", top=30):
+    """
+    Reúne el perfil de cada rank en rank 0 y escribe:
+    `<prefix>_hotspots.txt` (tabla combinada con divergencia por rank) y
+    `<prefix>.collapsed` (muestreo: "rankN;hilo;f1;f2 muestras", legible por
+    flamegraph.pl / speedscope) o `<prefix>.pstats` (cprofile, combinado con
+    pstats para snakeviz o gprof2dot).
+    """
+    parts = comm.gather(profile, root=0)
+    if comm.Get_rank() != 0:
+        return None
+
+    merged = merge_profiles(parts)
+    table = format_hotspots(merged, parts, top)
+    print("\n" + table)
+    os.makedirs(os.path.dirname(prefix) or ".", exist_ok=True)
+    with open(f"{prefix}_hotspots.txt", "w", encoding="utf-8") as f:
+        f.write(table + "\n")
+
+    if parts[0]["kind"] == "sample":
+        path = f"{prefix}.collapsed"
+        with open(path, "w", encoding="utf-8") as f:
+            for rank, part in enumerate(parts):
+                for stack, count in sorted(part["stacks"].items()):
+                    f.write(f"rank{rank};{stack} {count}\n")
+    else:
+        path = f"{prefix}.pstats"
+        stats = None
+        for part in parts:
+            raw = _RawStats(part["raw"])
+            stats = pstats.Stats(raw) if stats is None else stats.add(raw)
+        stats.dump_stats(path)
+    print(f"\n Profile: {prefix}_hotspots.txt, {path}")
+    return merged
@@ -0,0 +1,145 @@
+import math
+
+import numpy as np
+
+# Número máximo de niveles: con capacidad k soporta hasta k * 2**MAX_LEVELS valores.
+# Es fijo (no depende de las filas) porque el buffer se guarda en --state-dir y
+# se vuelve a mezclar en corridas posteriores: el layout no puede cambiar.
+MAX_LEVELS = 32
+DEFAULT_ERROR = 0.001
+
+# Encabezado del buffer: [k, niveles, n, conteos por nivel...]
+_HEADER = 3
+
+
+def capacity_for_error(error=DEFAULT_ERROR):
+    """
+    Capacidad k = ceil(2 / error) por nivel (mínimo 16).
+
+    No es la garantía de KLL (capacidades geométricas): con capacidad uniforme
+    cada nivel ocupado suma en el peor caso ~n/k de error de rango, así que el
+    error relativo está acotado por H * error / 2, con H ≈ log2(n / k) niveles
+    ocupados (~0.65% a 10M filas con error=0.001). Los desplazamientos
+    alternados lo dejan en la práctica cerca de `error` o menos (~0.04% medido
+    en Q1/Q3 con 5M filas), pero los fences pueden diferir del cálculo exacto y
+    recortar distinto las celdas que caen justo en el borde.
+    """
+    return max(16, int(math.ceil(2.0 / error)))
+
+
+def empty_sketch(error=DEFAULT_ERROR, levels=MAX_LEVELS):
+    """
+    Sketch de cuantiles de tamaño fijo (compactores tipo KLL con capacidad uniforme).
+
+    Todo el estado vive en un único arreglo float64 de longitud constante:
+    [k, niveles, n, conteos[niveles], items[niveles * k]], para poder combinarlo
+    con un Allreduce y una operación MPI propia sin serializar objetos.
+
+    Costo: (3 + niveles * (k + 1)) float64 por columna con sketch, sin importar
+    las filas: ~512 KB con error=0.001 y MAX_LEVELS. Ese es el tamaño en memoria,
+    en el buffer de FusedStats (un Allreduce por corrida) y en --state-dir; cada
+    lote mezcla su sketch local ordenando hasta niveles * k valores.
+    """
+    k = capacity_for_error(error)
+    sketch = np.zeros(_HEADER + levels + levels * k, dtype=np.float64)
+    sketch[0] = k
+    sketch[1] = levels
+    return sketch
+
+
+def _layout(sketch):
+    k = int(sketch[0])
+    levels = int(sketch[1])
+    return k, levels
+
+
+def _level(sketch, h):
+    k, levels = _layout(sketch)
+    count = int(sketch[_HEADER + h])
+    start = _HEADER + levels + h * k
+    return sketch[start:start + count]
+
+
+def _offset(h, n):
+    # Desplazamiento pseudoaleatorio pero determinista y simétrico: el resultado
+    # no depende del orden en que MPI combine los operandos.
+    x = (int(n) * 0x9E3779B97F4A7C15 + h * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x ^= x >> 31
+    return x & 1
+
+
+def _store(sketch, levels_items, n):
+    k, levels = _layout(sketch)
+    sketch[2] = n
+    sketch[_HEADER:_HEADER + levels] = 0
+    for h, items in enumerate(levels_items):
+        start = _HEADER + levels + h * k
+        sketch[_HEADER + h] = len(items)
+        sketch[start:start + len(items)] = items
+
+
+def _compact(items_by_level, k, levels, n):
+    """Compacta niveles (ordenados) que superan la capacidad k, de abajo hacia arriba."""
+    out = []
+    carry = np.empty(0, dtype=np.float64)
+    for h in range(levels):
+        items = items_by_level[h] if h < len(items_by_level) else np.empty(0, dtype=np.float64)
+        if len(carry):
+            items = np.sort(np.concatenate([items, carry]))
+        carry = np.empty(0, dtype=np.float64)
+        if len(items) > k:
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            body = items[:len(items) - len(keep)]
+            carry = body[_offset(h, n)::2]
+            items = keep
+        out.append(items)
+    if len(carry):
+        raise OverflowError("Quantile sketch overflow: increase MAX_LEVELS or error")
+    return out
+
+
+def build_sketch(values, error=DEFAULT_ERROR):
+    """Construye el sketch de una columna local (NaN se ignoran)."""
+    sketch = empty_sketch(error)
+    k, levels = _layout(sketch)
+    values = np.asarray(values, dtype=np.float64)
+    values = np.sort(values[~np.isnan(values)])
+    _store(sketch, _compact([values], k, levels, len(values)), len(values))
+    return sketch
+
+
+def merge_sketches(a, b, out=None):
+    """Combina dos sketches con el mismo layout. `out` puede ser `b` (in-place)."""
+    k, levels = _layout(a)
+    n = a[2] + b[2]
+    merged = [np.sort(np.concatenate([_level(a, h), _level(b, h)])) for h in range(levels)]
+    merged = _compact(merged, k, levels, n)
+    if out is None:
+        out = np.zeros_like(a)
+        out[0], out[1] = k, levels
+    _store(out, merged, n)
+    return out
+
+
+def sketch_quantiles_from(sketch, qs):
+    """Consulta cuantiles sobre un sketch ya combinado (ítems ponderados por 2**nivel)."""
+    k, levels = _layout(sketch)
+    if sketch[2] == 0:
+        return [float("nan")] * len(qs)
+    items = []
+    weights = []
+    for h in range(levels):
+        level = _level(sketch, h)
+        items.append(level)
+        weights.append(np.full(len(level), 2.0 ** h))
+    items = np.concatenate(items)
+    weights = np.concatenate(weights)
+    order = np.argsort(items, kind="stable")
+    items = items[order]
+    cum = np.cumsum(weights[order])
+    total = cum[-1]
+    out = []
+    for q in qs:
+        pos = int(np.searchsorted(cum, q * (total - 1), side="right"))
+        out.append(float(items[min(pos, len(items) - 1)]))
+    return out
@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_integer_dtype
+
+# Filas de referencia para la proyección de memoria ("¿cabe 10M+ por nodo?")
+PROJECTED_ROWS = 10_000_000
+
+
+def read_csv_dtypes(schema, overrides=None):
+    """
+    Tipos para pd.read_csv a partir de la sección "schema" de metadata.json.
+
+    Las columnas con "strip_suffix" se leen como texto y se convierten luego
+    en apply_schema; `overrides` (p. ej. categóricas del plan) tiene prioridad.
+    """
+    dtypes = {}
+    for column, spec in (schema or {}).items():
+        dtypes[column] = "str" if spec.get("strip_suffix") else spec["dtype"]
+    dtypes.update(overrides or {})
+    return dtypes
+
+
+def apply_schema(df, schema):
+    """
+    Conversiones que read_csv no puede hacer solo: quita el sufijo declarado
+    (p. ej. "12_dup" -> 12) y parsea la columna al tipo numérico del schema.
+    """
+    for column, spec in (schema or {}).items():
+        suffix = spec.get("strip_suffix")
+        if not suffix or column not in df.columns:
+            continue
+        values = df[column].astype("str").str.strip().str.removesuffix(suffix)
+        df[column] = pd.to_numeric(values).astype(spec["dtype"])
+    return df
+
+
+def impute_value(series, value):
+    """Valor de imputación compatible con el tipo: se redondea en columnas enteras (UInt8, int64...)."""
+    if is_integer_dtype(series.dtype):
+        return np.rint(value)
+    return value
+
+
+def column_memory(df):
+    """{columna: (dtype, bytes)} de un DataFrame (incluye categorías y strings)."""
+    usage = df.memory_usage(deep=True, index=False)
+    return {column: (str(df[column].dtype), int(usage[column])) for column in df.columns}
+
+
+def _format_bytes(n):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
+
+
+def report_memory(comm, usage, rows, label="partition", projected_rows=PROJECTED_ROWS):
+    """
+    Reúne en rank 0 el uso de memoria por columna de cada rank e imprime una
+    tabla: bytes por rank (mín/máx), bytes por fila y la proyección a
+    `projected_rows` filas por nodo. `usage` viene de column_memory().
+    """
+    parts = comm.gather((rows, usage), root=0)
+    if comm.Get_rank() != 0:
+        return None
+
+    total_rows = sum(r for r, _ in parts)
+    columns = list(dict.fromkeys(c for _, u in parts for c in u))
+    print(f"\n Memory per column ({label}, {len(parts)} ranks, {total_rows:,} rows)")
+    print(f"   {'column':<12} {'dtype':<10} {'min/rank':>12} {'max/rank':>12} {'B/row':>8} "
+          f"{f'@{projected_rows:,} rows':>18}")
+
+    summary = {}
+    total_per_row = 0.0
+    for column in columns:
+        sizes = [u[column][1] for _, u in parts if column in u]
+        dtype = next(u[column][0] for _, u in parts if column in u)
+        per_row = sum(sizes) / total_rows if total_rows else 0.0
+        total_per_row += per_row
+        summary[column] = {"dtype": dtype, "min": min(sizes), "max": max(sizes), "bytes_per_row": per_row}
+        print(f"   {column:<12} {dtype:<10} {_format_bytes(min(sizes)):>12} {_format_bytes(max(sizes)):>12} "
+              f"{per_row:>8.1f} {_format_bytes(per_row * projected_rows):>18}")
+
+    rank_totals = [sum(b for _, b in u.values()) for _, u in parts]
+    print(f"   {'total':<12} {'':<10} {_format_bytes(min(rank_totals)):>12} {_format_bytes(max(rank_totals)):>12} "
+          f"{total_per_row:>8.1f} {_format_bytes(total_per_row * projected_rows):>18}")
+    return summary
@@ -0,0 +1,52 @@
+from accumulators import FusedStats
+from order_stats import iqr_fences
+from quantile_sketch import sketch_quantiles_from
+
+
+class StreamingStats:
+    """
+    Estado de la pasada 1 del modo streaming: se actualiza lote a lote y ocupa
+    memoria constante (conteos, sumas y un sketch de cuantiles por columna).
+
+    Como la columna completa nunca está en memoria, la mediana y los fences IQR
+    salen del sketch (error de rango aproximado, ver capacity_for_error). Todo el
+    estado va en un FusedStats: finalize() hace una sola colectiva.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.state = FusedStats.from_config(config, exact_quantiles=False)
+
+    def update(self, df):
+        self.state.update(df)
+
+    def finalize(self, comm):
+        """Combina el estado de todos los ranks y devuelve (stats, faltantes por columna)."""
+        return stats_from_totals(self.config, self.state.allreduce(comm))
+
+
+def stats_from_totals(config, totals):
+    """
+    (stats, faltantes por columna) a partir de un FusedStats global: medias
+    de suma/conteo y medianas o fences de los sketches. Las reglas que usan
+    cuantiles exactos (sin sketch en `totals`) quedan para order_stats.
+    """
+    stats = {}
+    nulls = {}
+    for column, rules in config.items():
+        nulls[column] = int(totals.value(column, "nulls", 0))
+        if totals.value(column, "count", 0) == 0:
+            continue
+        sketch = totals.value(column, "sketch")
+
+        ctype = rules.get("type")
+        if ctype == "missing_impute":
+            strategy = rules.get("strategy", "median")
+            if strategy == "median" and sketch is not None:
+                stats[f"{column}_median"] = sketch_quantiles_from(sketch, [0.5])[0]
+            elif strategy == "mean":
+                stats[f"{column}_mean"] = totals.value(column, "sum") / totals.value(column, "count")
+        elif ctype == "outlier_capping" and sketch is not None:
+            q1, q3 = sketch_quantiles_from(sketch, [0.25, 0.75])
+            stats[f"{column}_bounds"] = iqr_fences(q1, q3, rules.get("cap_value", 1.5))
+    return stats, nulls
@@ -0,0 +1,110 @@
+import os
+import time
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from partitioned_reader import common_dtypes, concat_frames, partition_range, read_byte_range, read_header
+
+# Tamaño objetivo de cada tarea (rango de bytes) del modo dinámico
+DEFAULT_TASK_BYTES = 4 << 20
+
+SCHEDULES = ("static", "dynamic")
+
+
+class TaskCounter:
+    """
+    Contador atómico en una ventana RMA de rank 0: cada rank obtiene la
+    siguiente tarea con Fetch_and_op (sin un rank maestro dedicado).
+    """
+
+    def __init__(self, comm):
+        from mpi4py import MPI
+
+        self._mpi = MPI
+        self._value = np.zeros(1, dtype=np.int64)
+        self._one = np.ones(1, dtype=np.int64)
+        self._win = MPI.Win.Create(self._value if comm.Get_rank() == 0 else None, disp_unit=8, comm=comm)
+
+    def next(self):
+        task = np.empty(1, dtype=np.int64)
+        self._win.Lock(0, self._mpi.LOCK_SHARED)
+        self._win.Fetch_and_op(self._one, task, 0, 0, self._mpi.SUM)
+        self._win.Unlock(0)
+        return int(task[0])
+
+    def free(self):
+        self._win.Free()
+
+
+class TaskLayout(NamedTuple):
+    """Tareas que procesó este rank y su rango de filas globales [lo, hi) en orden de archivo."""
+    tasks: tuple
+    row_ranges: tuple
+    total_tasks: int
+
+
+def task_count(input_file, task_bytes=DEFAULT_TASK_BYTES):
+    """Número de tareas para cortar los datos (sin encabezado) en rangos de ~task_bytes."""
+    data_bytes = os.path.getsize(input_file) - len(read_header(input_file))
+    return max(1, -(-data_bytes // task_bytes))
+
+
+def read_dynamic(comm, input_file, reader=read_byte_range, task_bytes=DEFAULT_TASK_BYTES, **read_csv_kwargs):
+    """
+    Lectura con planificación dinámica: el archivo se corta en muchas tareas
+    pequeñas (rangos de bytes, ver partition_range) y cada rank toma la
+    siguiente en cuanto termina la anterior. Un rank lento o con filas más
+    caras procesa menos tareas.
+
+    El orden final no depende de quién tomó cada tarea: los conteos de filas
+    por tarea se reúnen y el índice es el número de fila global en orden de
+    archivo. Devuelve (chunk, TaskLayout).
+    """
+    total_tasks = task_count(input_file, task_bytes)
+    counter = TaskCounter(comm)
+    tasks, parts = [], []
+    busy = 0.0
+    try:
+        while (task := counter.next()) < total_tasks:
+            start_time = time.perf_counter()
+            header, start, end = partition_range(input_file, task, total_tasks)
+            parts.append(reader(input_file, start, end, header=header, **read_csv_kwargs))
+            tasks.append(task)
+            busy += time.perf_counter() - start_time
+    finally:
+        counter.free()
+
+    if not parts:
+        # Sin tareas: un rango vacío da las columnas (y tipos) esperados
+        header, start, _ = partition_range(input_file, 0, 1)
+        parts.append(reader(input_file, start, start, header=header, **read_csv_kwargs))
+
+    dtypes = {}
+    for part in parts:
+        for column in part.columns:
+            dtypes.setdefault(column, []).append(part[column].dtype)
+    casts = common_dtypes(comm, dtypes)
+    if casts:
+        parts = [part.astype(casts) for part in parts]
+
+    # Fila global inicial de cada tarea: prefijo de los conteos en orden de tarea
+    rows = np.zeros(total_tasks, dtype=np.int64)
+    for task, part in zip(tasks, parts):
+        rows[task] = len(part)
+    comm.Allreduce(rows.copy(), rows)
+    first = np.concatenate(([0], np.cumsum(rows)[:-1]))
+
+    chunk = concat_frames(parts)
+    chunk.index = pd.Index(np.concatenate([first[t] + np.arange(rows[t]) for t in tasks])
+                           if tasks else np.empty(0, dtype=np.int64))
+
+    report = comm.gather((len(tasks), busy), root=0)
+    if comm.Get_rank() == 0:
+        counts = [n for n, _ in report]
+        busy = [t for _, t in report]
+        print(f"   {total_tasks} tasks of ~{task_bytes / (1 << 20):.1f} MiB; tasks per rank min/max "
+              f"{min(counts)}/{max(counts)}, read time min/max {min(busy):.2f}s/{max(busy):.2f}s")
+    row_ranges = tuple((int(first[t]), int(first[t] + rows[t])) for t in tasks)
+    return chunk, TaskLayout(tuple(tasks), row_ranges, total_tasks)